@@ -0,0 +1,88 @@
+import numpy as np
+from functools import lru_cache
+from eth_utils import to_checksum_address
+
+# --- Compact address keys ---
+# Addresses are parsed once into fixed-width 20-byte keys (NumPy 'S20') and every join,
+# dedupe and group-by runs on those keys. Hex strings are produced only at output time.
+ADDRESS_DTYPE = np.dtype('S20')
+ADDRESS_SIZE = 20
+
+
+def parse_address(address) -> bytes:
+    """Parses a '0x'-prefixed hex address (any case) or raw 20 bytes into a 20-byte key."""
+    if isinstance(address, (bytes, bytearray, memoryview)):
+        key = bytes(address)
+    else:
+        key = bytes.fromhex(address[2:] if address[:2] in ('0x', '0X') else address)
+    if len(key) != ADDRESS_SIZE:
+        raise ValueError(f"Expected a 20-byte address, got {len(key)} bytes: {address!r}")
+    return key
+
+
+def address_keys(addresses) -> np.ndarray:
+    """
+    Parses a column of hex addresses (or raw 20-byte values) into an 'S20' key array.
+    All hex digits are decoded with a single bytes.fromhex call over the joined column.
+    """
+    values = list(addresses)
+    if values and all(isinstance(v, str) and len(v) == 42 for v in values):
+        raw = bytes.fromhex(''.join(v[2:] for v in values))
+        return np.frombuffer(raw, dtype=ADDRESS_DTYPE).copy()
+    return np.array([parse_address(v) for v in values], dtype=ADDRESS_DTYPE)
+
+
+def _pad(key: bytes) -> bytes:
+    # NumPy drops trailing NUL bytes when an 'S20' element is read back as bytes
+    return key.ljust(ADDRESS_SIZE, b'\x00')
+
+
+@lru_cache(maxsize=None)
+def checksum_address(key: bytes) -> str:
+    """EIP-55 checksums a 20-byte key. Cached, so each distinct address costs one keccak."""
+    return to_checksum_address(_pad(key))
+
+
+def hex_address(key: bytes) -> str:
+    """Formats a 20-byte key as a lowercase '0x' hex address."""
+    return '0x' + _pad(key).hex()
+
+
+def hex_addresses(keys: np.ndarray) -> list:
+    """Formats an 'S20' key array as lowercase '0x' hex addresses with one hex() call."""
+    digits = np.ascontiguousarray(keys, dtype=ADDRESS_DTYPE).tobytes().hex()
+    return ['0x' + digits[i:i + 40] for i in range(0, len(digits), 40)]
+
+
+def checksum_addresses(keys: np.ndarray) -> list:
+    return [checksum_address(key) for key in keys]
+
+
+def count_addresses(keys: np.ndarray, weights=None) -> (np.ndarray, np.ndarray): # type: ignore
+    """Groups keys and sums `weights` per key (counts occurrences if no weights are given)."""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=weights, minlength=len(unique_keys))
+    if weights is None or np.issubdtype(np.asarray(weights).dtype, np.integer):
+        totals = totals.astype(np.int64)
+    return unique_keys, totals
+
+
+def build_lookup(keys: np.ndarray, values) -> (np.ndarray, np.ndarray): # type: ignore
+    """
+    Builds a sorted (keys, values) lookup table, keeping the first value seen for
+    duplicate keys (the same rule as drop_duplicates(keep='first')).
+    """
+    unique_keys, first_index = np.unique(keys, return_index=True)
+    return unique_keys, np.asarray(values, dtype=object)[first_index]
+
+
+def lookup(keys: np.ndarray, table: tuple, default=None) -> np.ndarray:
+    """Vectorized binary-search lookup of `keys` in a table from `build_lookup`."""
+    table_keys, table_values = table
+    result = np.full(len(keys), default, dtype=object)
+    if len(table_keys) == 0:
+        return result
+    positions = np.searchsorted(table_keys, keys).clip(max=len(table_keys) - 1)
+    found = table_keys[positions] == keys
+    result[found] = table_values[positions[found]]
+    return result
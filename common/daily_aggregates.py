@@ -0,0 +1,175 @@
+import os
+import sys
+import glob
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import hyperloglog as hll  # noqa: E402
+from common.addresses import ADDRESS_DTYPE, address_keys, hex_addresses  # noqa: E402
+from common.tables import ADDRESS_TYPE  # noqa: E402
+
+# --- Incremental daily aggregates ---
+# Per-day partial aggregates of Safe execTransaction destinations, one Parquet file per day:
+#   destination_contract     20-byte address
+#   interaction_count        successful execTransaction calls that day
+#   first/last_interaction_date
+#   safe_sketch              HyperLogLog sketch of the calling Safes (common/hyperloglog.py)
+# Counts add up, dates take min/max and sketches union, so any window of days (7d, 30d,
+# all-time) is answered from the stored partials without re-reading transactions. A refresh
+# only fetches days after the last complete one; a day that was still in progress when it was
+# fetched is marked incomplete and fetched again next time.
+# Every Dune query drops the zero address, so it is dropped when partials are built.
+DEFAULT_STORE_DIR = '../data/daily_aggregates'
+ZERO_ADDRESS = bytes(20)
+PARTIAL_SCHEMA = pa.schema([
+    ('destination_contract', ADDRESS_TYPE),
+    ('interaction_count', pa.int64()),
+    ('first_interaction_date', pa.date32()),
+    ('last_interaction_date', pa.date32()),
+    ('safe_sketch', pa.list_(pa.uint32())),
+])
+RESULT_COLUMNS = ['destination_contract', 'interaction_count', 'unique_safe_wallets',
+                  'first_interaction_date', 'last_interaction_date']
+
+
+def day_range(start: date, end: date) -> list:
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def build_partials(df: pd.DataFrame) -> dict:
+    """
+    Aggregates rows of (block_date, destination_contract, safe_wallet[, interactions]) into one
+    partial table per day. Addresses may be '0x' hex or raw bytes. Returns {day: pa.Table}.
+    """
+    if df.empty:
+        return {}
+    destinations = address_keys(df['destination_contract'])
+    keep = destinations != np.array(ZERO_ADDRESS, dtype=ADDRESS_DTYPE)
+    destinations = destinations[keep]
+    safes = address_keys(df['safe_wallet'])[keep]
+    days = pd.to_datetime(df['block_date']).to_numpy(dtype='datetime64[D]')[keep]
+    interactions = df['interactions'].to_numpy(dtype=np.int64)[keep] if 'interactions' in df else np.ones(len(days), np.int64)
+
+    day_codes, day_values = pd.factorize(days, sort=True)
+    destination_codes, destination_values = pd.factorize(destinations.astype(object), sort=True)
+    groups, group_index = np.unique(day_codes.astype(np.int64) * len(destination_values) + destination_codes,
+                                    return_inverse=True)
+    group_index = group_index.reshape(-1)
+    counts = np.bincount(group_index, weights=interactions, minlength=len(groups)).astype(np.int64)
+    offsets, packed = hll.sketch_groups(group_index, hll.hash_values(safes), len(groups))
+
+    group_days = groups // len(destination_values)
+    group_destinations = np.array(list(destination_values), dtype=ADDRESS_DTYPE)[groups % len(destination_values)]
+    partials = {}
+    for day_code, day_value in enumerate(day_values):
+        start, end = np.searchsorted(group_days, [day_code, day_code + 1])
+        day = pd.Timestamp(day_value).date()
+        keys = np.ascontiguousarray(group_destinations[start:end])
+        dates = pa.array([day] * (end - start), type=pa.date32())
+        sketch_offsets = pa.array(offsets[start:end + 1] - offsets[start], type=pa.int32())
+        partials[day] = pa.Table.from_arrays([
+            pa.FixedSizeBinaryArray.from_buffers(ADDRESS_TYPE, len(keys), [None, pa.py_buffer(keys.tobytes())]),
+            pa.array(counts[start:end], type=pa.int64()),
+            dates,
+            dates,
+            pa.ListArray.from_arrays(sketch_offsets, pa.array(packed[offsets[start]:offsets[end]], type=pa.uint32())),
+        ], schema=PARTIAL_SCHEMA)
+    return partials
+
+
+class DailyAggregateStore:
+    """
+    Directory of per-day partial aggregates.
+
+    Usage:
+        store = DailyAggregateStore('../data/daily_aggregates')
+        start = store.refresh_start(default_start)
+        store.add_rows(rows_df, start, end, complete_before=today)
+        top = store.window(start=today - timedelta(days=30)).head(100)
+    """
+    def __init__(self, root: str = DEFAULT_STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, day: date) -> str:
+        return os.path.join(self.root, f'{day.isoformat()}.parquet')
+
+    def days(self) -> list:
+        return sorted(date.fromisoformat(os.path.basename(path)[:-len('.parquet')])
+                      for path in glob.glob(os.path.join(self.root, '????-??-??.parquet')))
+
+    def is_complete(self, day: date) -> bool:
+        metadata = pq.read_schema(self._path(day)).metadata or {}
+        return json.loads(metadata.get(b'daily_aggregates', b'{}')).get('complete', False)
+
+    def refresh_start(self, default_start: date) -> date:
+        """The first day a refresh has to fetch: the day after the last complete day."""
+        complete = [day for day in self.days() if self.is_complete(day)]
+        return complete[-1] + timedelta(days=1) if complete else default_start
+
+    def write_day(self, day: date, table: pa.Table, complete: bool):
+        metadata = {b'daily_aggregates': json.dumps({'day': day.isoformat(), 'complete': complete}).encode()}
+        path = self._path(day)
+        pq.write_table(table.replace_schema_metadata(metadata), path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def add_rows(self, df: pd.DataFrame, start: date, end: date, complete_before: date) -> int:
+        """
+        Replaces the partials of every day from `start` to `end` with aggregates of `df` (days
+        without rows get an empty partial). Days before `complete_before` are marked complete.
+        Returns the number of days written.
+        """
+        partials = build_partials(df)
+        days = day_range(start, end)
+        for day in days:
+            self.write_day(day, partials.get(day, PARTIAL_SCHEMA.empty_table()), day < complete_before)
+        return len(days)
+
+    def read(self, start: date = None, end: date = None) -> pa.Table:
+        """All stored partials of days in [start, end] (either bound may be None) in one table."""
+        days = [day for day in self.days() if (start is None or day >= start) and (end is None or day <= end)]
+        tables = [pq.read_table(self._path(day), schema=PARTIAL_SCHEMA) for day in days]
+        return pa.concat_tables(tables) if tables else PARTIAL_SCHEMA.empty_table()
+
+    def window(self, start: date = None, end: date = None, exclude=()) -> pd.DataFrame:
+        """
+        Merges the partials of days in [start, end] per destination, leaving out addresses in
+        `exclude`. Returns the Dune query columns, ordered by interaction_count descending.
+        unique_safe_wallets is a HyperLogLog estimate.
+        """
+        table = self.read(start, end)
+        addresses = table.column('destination_contract').combine_chunks()
+        keys = np.frombuffer(addresses.buffers()[1], dtype=ADDRESS_DTYPE, count=addresses.offset + len(addresses))[
+            addresses.offset:] if len(table) else np.zeros(0, ADDRESS_DTYPE)
+        if len(exclude):
+            keep = ~np.isin(keys, address_keys(list(exclude)))
+            table, keys = table.filter(pa.array(keep)), keys[keep]
+        if len(table) == 0:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+
+        destinations, owners = np.unique(keys, return_inverse=True)
+        owners = owners.reshape(-1)
+        sketches = table.column('safe_sketch').combine_chunks()
+        offsets, packed = hll.merge(owners, sketches.offsets.to_numpy(), sketches.values.to_numpy(), len(destinations))
+        first = table.column('first_interaction_date').to_numpy().astype('datetime64[D]')
+        last = table.column('last_interaction_date').to_numpy().astype('datetime64[D]')
+        first_dates = np.full(len(destinations), np.datetime64('9999-12-31'), dtype='datetime64[D]')
+        last_dates = np.full(len(destinations), np.datetime64('0001-01-01'), dtype='datetime64[D]')
+        np.minimum.at(first_dates, owners, first)
+        np.maximum.at(last_dates, owners, last)
+
+        result = pd.DataFrame({
+            # Dune's TO_HEX is uppercase
+            'destination_contract': ['0x' + address[2:].upper() for address in hex_addresses(destinations)],
+            'interaction_count': np.bincount(owners, weights=table.column('interaction_count').to_numpy(),
+                                             minlength=len(destinations)).astype(np.int64),
+            'unique_safe_wallets': hll.estimate(offsets, packed),
+            'first_interaction_date': first_dates.astype(str),
+            'last_interaction_date': last_dates.astype(str),
+        })
+        return result.sort_values('interaction_count', ascending=False, kind='stable').reset_index(drop=True)
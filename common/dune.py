@@ -0,0 +1,382 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import asyncio
+import aiohttp
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dataclasses import dataclass, field
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.ratelimit import get_controller  # noqa: E402
+from common.dune_cache import DEFAULT_CACHE_DIR, DuneResultCache, age_in_hours  # noqa: E402
+
+# --- Dune query orchestration ---
+# All queries are submitted up front and polled concurrently, so a batch of queries takes as
+# long as the slowest one instead of the sum. Each result is downloaded as soon as its own
+# execution finishes. Requests draw from the shared 'dune' rate controller.
+# Large results can be saved as Parquet instead of CSV: pages are fetched concurrently by
+# limit/offset and each page is written to its own part file as it arrives, so the full
+# result is never held in memory. An interrupted download resumes from the missing pages.
+# A job with a max age first reads the metadata of the query's latest execution. If that result
+# is recent enough it is reused instead of executing the query again, and it is only downloaded
+# when the local result cache (common/dune_cache.py) does not already hold that execution.
+DEFAULT_BASE_URL = 'https://api.dune.com/api/v1'
+DEFAULT_PERFORMANCE = 'medium'
+MAX_RETRIES = 5
+POLL_INITIAL_SECONDS = 1.0
+POLL_BACKOFF_FACTOR = 1.5
+POLL_MAX_SECONDS = 15.0
+DEFAULT_TIMEOUT_SECONDS = 30 * 60     # give up on an execution after this long
+CSV_NEXT_URI_HEADER = 'x-dune-next-uri'
+DEFAULT_PAGE_SIZE = 10_000            # rows per results page in Parquet downloads
+DEFAULT_PAGE_CONCURRENCY = 4          # pages fetched at once
+MAX_AGE_ENV = 'DUNE_MAX_AGE_HOURS'    # overrides every job's max age; 0 forces fresh executions
+BASE_URL_ENV = 'DUNE_BASE_URL'        # e.g. a local fake_dune.py server
+
+# Dune column types with a native Arrow equivalent; everything else (varbinary as hex,
+# timestamps, uint256, ...) is stored as a string, the same text the CSV export contains
+ARROW_TYPES = {
+    'bigint': pa.int64(), 'integer': pa.int64(), 'smallint': pa.int64(), 'tinyint': pa.int64(),
+    'double': pa.float64(), 'real': pa.float64(), 'boolean': pa.bool_(),
+}
+
+COMPLETED_STATE = 'QUERY_STATE_COMPLETED'
+FAILED_STATES = {'QUERY_STATE_FAILED', 'QUERY_STATE_CANCELLED', 'QUERY_STATE_EXPIRED'}
+
+
+class DuneError(Exception):
+    """Raised when an execution fails or a Dune API request keeps failing."""
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status    # HTTP status of the failed request, if there was one
+
+
+@dataclass
+class DuneJob:
+    """
+    One query to run and where to save its result. With `max_age_hours` the query's latest
+    stored result is reused when it is at most that old; `latest=True` reuses it at any age.
+    Otherwise a new execution is started. With `format='parquet'` the result is downloaded
+    in concurrent pages and an interrupted download is resumed.
+    """
+    name: str
+    query_id: int
+    output_path: str
+    parameters: dict = field(default_factory=dict)
+    latest: bool = False
+    format: str = 'csv'           # 'csv' or 'parquet'
+    max_age_hours: float = None
+
+
+def job_max_age(job: DuneJob):
+    """How old a stored result of `job` may be to reuse it (None = always execute)."""
+    override = os.environ.get(MAX_AGE_ENV)
+    if override:
+        return float(override)
+    if job.max_age_hours is not None:
+        return job.max_age_hours
+    return float('inf') if job.latest else None
+
+
+class AsyncDuneClient:
+    """
+    Minimal async client for the Dune API over one pooled aiohttp session.
+
+    Usage:
+        async with AsyncDuneClient(api_key) as dune:
+            execution_id = await dune.execute(query_id)
+            await dune.wait(execution_id)
+            await dune.download_csv(execution_id, '../data/result.csv')
+    """
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL, performance: str = DEFAULT_PERFORMANCE,
+                 requests_per_second: float = None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.performance = performance
+        self.rate_controller = get_controller('dune', requests_per_second)
+        self._session = None
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(headers={'X-Dune-API-Key': self.api_key},
+                                              timeout=aiohttp.ClientTimeout(total=None, sock_read=300))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    async def _request(self, method: str, url: str, handle, **kwargs):
+        """Sends one request with rate control and retries; `handle(response)` reads the body."""
+        url = url if url.startswith('http') else self.base_url + url
+        for attempt in range(MAX_RETRIES + 1):
+            await self.rate_controller.acquire_async()
+            started = time.monotonic()
+            try:
+                async with self._session.request(method, url, **kwargs) as response:
+                    if response.status == 429 or response.status >= 500:
+                        if response.status == 429:
+                            retry_after = response.headers.get('Retry-After')
+                            self.rate_controller.on_throttle(
+                                float(retry_after) if retry_after and retry_after.isdigit() else None, started)
+                        if attempt < MAX_RETRIES:
+                            await asyncio.sleep(min(POLL_MAX_SECONDS, 2 ** attempt) * (0.5 + random.random()))
+                            continue
+                    if response.status >= 400:
+                        raise DuneError(f"{method} {url} failed with HTTP {response.status}: "
+                                        f"{(await response.text())[:200]}", response.status)
+                    result = await handle(response)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == MAX_RETRIES:
+                    raise DuneError(f"{method} {url} failed: {e}") from e
+                await asyncio.sleep(min(POLL_MAX_SECONDS, 2 ** attempt) * (0.5 + random.random()))
+                continue
+            self.rate_controller.on_success(time.monotonic() - started, started)
+            return result
+        raise DuneError(f"{method} {url} still failing after {MAX_RETRIES} retries")
+
+    async def _json(self, method: str, route: str, **kwargs) -> dict:
+        async def handle(response):
+            return await response.json(content_type=None)
+        return await self._request(method, route, handle, **kwargs)
+
+    async def execute(self, query_id: int, parameters: dict = None) -> str:
+        """Starts an execution of `query_id`. Returns its execution id."""
+        body = {'performance': self.performance}
+        if parameters:
+            body['query_parameters'] = parameters
+        data = await self._json('POST', f'/query/{query_id}/execute', json=body)
+        return data['execution_id']
+
+    async def status(self, execution_id: str) -> dict:
+        return await self._json('GET', f'/execution/{execution_id}/status')
+
+    async def wait(self, execution_id: str, timeout: float = DEFAULT_TIMEOUT_SECONDS) -> dict:
+        """Polls until the execution completes, backing off between polls. Returns the final status."""
+        deadline = time.monotonic() + timeout
+        delay = POLL_INITIAL_SECONDS
+        while True:
+            status = await self.status(execution_id)
+            state = status.get('state')
+            if state == COMPLETED_STATE:
+                return status
+            if state in FAILED_STATES:
+                raise DuneError(f"Execution {execution_id} ended in {state}: {status.get('error')}")
+            if time.monotonic() + delay > deadline:
+                raise DuneError(f"Execution {execution_id} still {state} after {timeout:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(POLL_MAX_SECONDS, delay * POLL_BACKOFF_FACTOR)
+
+    async def download_csv(self, execution_id: str = None, output_path: str = None, query_id: int = None) -> int:
+        """
+        Writes a result as CSV to `output_path` page by page, following Dune's pagination. Downloads
+        the execution's result, or the latest stored result of `query_id`. Returns the number of rows.
+        """
+        url = f'/query/{query_id}/results/csv' if execution_id is None else f'/execution/{execution_id}/results/csv'
+
+        async def handle(response):
+            # A page is read whole before it is written, so a retried request cannot duplicate rows
+            return await response.read(), response.headers.get(CSV_NEXT_URI_HEADER)
+
+        tmp_path = output_path + '.tmp'
+        rows = 0
+        with open(tmp_path, 'wb') as f:
+            first_page = True
+            while url:
+                page, url = await self._request('GET', url, handle)
+                if not first_page:
+                    page = page.split(b'\n', 1)[1] if b'\n' in page else b''   # repeated header line
+                if page and not page.endswith(b'\n'):
+                    page += b'\n'
+                f.write(page)
+                rows += page.count(b'\n') - (1 if first_page else 0)
+                first_page = False
+        os.replace(tmp_path, output_path)
+        return max(0, rows)
+
+    async def results_page(self, execution_id: str, limit: int, offset: int) -> dict:
+        return await self._json('GET', f'/execution/{execution_id}/results', params={'limit': limit, 'offset': offset})
+
+    async def latest_result(self, query_id: int, parameters: dict = None):
+        """
+        Metadata of the query's most recent finished execution with these parameters (its
+        execution id, state and execution_ended_at, plus at most one row), or None if there is none.
+        """
+        params = {'limit': 1}
+        params.update({f'params.{name}': value for name, value in (parameters or {}).items()})
+        try:
+            data = await self._json('GET', f'/query/{query_id}/results', params=params)
+        except DuneError as e:
+            if e.status in (400, 404):
+                return None
+            raise
+        if data.get('state') != COMPLETED_STATE:
+            return None
+        return data
+
+    async def download_parquet(self, execution_id: str, output_path: str, page_size: int = DEFAULT_PAGE_SIZE,
+                               max_concurrency: int = DEFAULT_PAGE_CONCURRENCY) -> int:
+        """
+        Downloads an execution's result to `output_path` as Parquet, one row group per page.
+        Pages are fetched concurrently and saved as part files next to the output; pages already
+        saved by an interrupted download of the same execution are not fetched again.
+        Returns the number of rows.
+        """
+        parts_dir = output_path + '.parts'
+        manifest = load_manifest(output_path)
+        if manifest is None or manifest['execution_id'] != execution_id or manifest['page_size'] != page_size:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+            os.makedirs(parts_dir)
+            first_page = await self.results_page(execution_id, page_size, 0)
+            metadata = first_page['result']['metadata']
+            manifest = {'execution_id': execution_id, 'page_size': page_size,
+                        'total_rows': metadata['total_row_count'], 'columns': metadata['column_names'],
+                        'types': metadata.get('column_types') or ['varchar'] * len(metadata['column_names'])}
+            with open(os.path.join(parts_dir, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f)
+            _write_part(parts_dir, 0, first_page['result']['rows'], _arrow_schema(manifest))
+
+        schema = _arrow_schema(manifest)
+        pages = range(max(1, math.ceil(manifest['total_rows'] / page_size)))
+        missing = [page for page in pages if not os.path.exists(_part_path(parts_dir, page))]
+        if len(missing) < len(pages) - 1:
+            print(f"  -> Resuming download of execution {execution_id}: {len(pages) - len(missing)}/{len(pages)} pages saved.")
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(page: int):
+            async with semaphore:
+                data = await self.results_page(execution_id, page_size, page * page_size)
+            await asyncio.to_thread(_write_part, parts_dir, page, data['result']['rows'], schema)
+
+        # Let every page finish before reporting a failure, so the pages that did arrive are kept
+        errors = [error for error in await asyncio.gather(*(fetch(page) for page in missing), return_exceptions=True)
+                  if isinstance(error, BaseException)]
+        if errors:
+            raise errors[0]
+
+        # Concatenate the parts in page order, one part in memory at a time
+        tmp_path = output_path + '.tmp'
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for page in pages:
+                writer.write_table(pq.read_table(_part_path(parts_dir, page), schema=schema))
+        os.replace(tmp_path, output_path)
+        shutil.rmtree(parts_dir)
+        return manifest['total_rows']
+
+
+def load_manifest(output_path: str):
+    """The manifest of an unfinished Parquet download to `output_path`, or None."""
+    try:
+        with open(os.path.join(output_path + '.parts', 'manifest.json')) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _arrow_schema(manifest: dict) -> pa.Schema:
+    return pa.schema([(name, ARROW_TYPES.get(dune_type, pa.string()))
+                      for name, dune_type in zip(manifest['columns'], manifest['types'])])
+
+
+def _part_path(parts_dir: str, page: int) -> str:
+    return os.path.join(parts_dir, f'page-{page:06d}.parquet')
+
+
+def _write_part(parts_dir: str, page: int, rows: list, schema: pa.Schema):
+    columns = {}
+    for column in schema:
+        values = [row.get(column.name) for row in rows]
+        if column.type == pa.string():
+            values = [value if value is None or isinstance(value, str) else json.dumps(value) if isinstance(value, (list, dict))
+                      else str(value) for value in values]
+        columns[column.name] = pa.array(values, type=column.type)
+    path = _part_path(parts_dir, page)
+    pq.write_table(pa.table(columns, schema=schema), path + '.tmp')
+    os.replace(path + '.tmp', path)   # a part file exists only once its page is complete
+
+
+async def run_job(dune: AsyncDuneClient, job: DuneJob, execution_id: str, submitted: bool,
+                  cache: DuneResultCache = None, ended_at: str = None) -> int:
+    """
+    Waits for a job's execution if it was just submitted, then saves its result: restored from
+    `cache` when that execution was downloaded before, downloaded otherwise. Returns the row count.
+    """
+    if submitted:
+        ended_at = (await dune.wait(execution_id)).get('execution_ended_at')
+    entry = cache.get(job.query_id, job.parameters, execution_id, job.format) if cache is not None else None
+    if entry is not None:
+        rows = cache.restore(entry, job.output_path)
+        print(f"  -> '{job.name}': execution {execution_id} unchanged since the last download, "
+              f"restored {rows} rows to {job.output_path}")
+        return rows
+
+    if job.format == 'parquet':
+        rows = await dune.download_parquet(execution_id, job.output_path)
+    else:
+        rows = await dune.download_csv(execution_id, job.output_path)
+    if cache is not None:
+        cache.put(job.query_id, job.parameters, execution_id, job.format, job.output_path, rows, ended_at)
+    print(f"  -> '{job.name}': saved {rows} rows to {job.output_path}")
+    return rows
+
+
+async def run_jobs_async(dune: AsyncDuneClient, jobs: list, cache: DuneResultCache = None) -> dict:
+    """
+    Submits every job at once, then polls them concurrently and downloads each result as
+    soon as its execution completes. A job whose latest stored result is within its max age is
+    not executed, and a Parquet job with an unfinished download resumes the execution it started.
+    Returns {job name: row count or the exception raised}.
+    """
+    async def submit(job):
+        """Returns (execution_id, submitted, ended_at) for the result this job will save."""
+        manifest = load_manifest(job.output_path) if job.format == 'parquet' else None
+        if manifest is not None:
+            print(f"Resuming '{job.name}' from execution {manifest['execution_id']}.")
+            return manifest['execution_id'], False, None
+        max_age = job_max_age(job)
+        if max_age is not None:
+            latest = await dune.latest_result(job.query_id, job.parameters)
+            if latest is not None:
+                age = age_in_hours(latest.get('execution_ended_at'))
+                if age <= max_age:
+                    print(f"Using the latest result of '{job.name}' (execution {latest['execution_id']}, {age:.1f}h old).")
+                    return latest['execution_id'], False, latest.get('execution_ended_at')
+                print(f"The latest result of '{job.name}' is {age:.1f}h old (max {max_age:g}h), re-executing.")
+        execution_id = await dune.execute(job.query_id, job.parameters)
+        print(f"Submitted '{job.name}' (query {job.query_id}) as execution {execution_id}.")
+        return execution_id, True, None
+
+    submissions = await asyncio.gather(*(submit(job) for job in jobs), return_exceptions=True)
+
+    async def run(job, submission):
+        if isinstance(submission, BaseException):
+            raise submission
+        execution_id, submitted, ended_at = submission
+        return await run_job(dune, job, execution_id, submitted, cache, ended_at)
+
+    outcomes = await asyncio.gather(*(run(job, submission) for job, submission in zip(jobs, submissions)),
+                                    return_exceptions=True)
+    return {job.name: outcome for job, outcome in zip(jobs, outcomes)}
+
+
+def run_jobs(api_key: str, jobs: list, base_url: str = None, cache_dir: str = DEFAULT_CACHE_DIR) -> dict:
+    """
+    Synchronous entry point for scripts: runs `jobs` with `run_jobs_async`, caching downloaded
+    results in `cache_dir`, and reports failures.
+    """
+    base_url = base_url or os.environ.get(BASE_URL_ENV, DEFAULT_BASE_URL)
+
+    async def main():
+        async with AsyncDuneClient(api_key, base_url) as dune:
+            with DuneResultCache(cache_dir) as cache:
+                return await run_jobs_async(dune, jobs, cache)
+
+    outcomes = asyncio.run(main())
+    for name, outcome in outcomes.items():
+        if isinstance(outcome, BaseException):
+            print(f"An error occurred in '{name}': {outcome}")
+    return outcomes
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+from datetime import datetime, timezone
+
+# --- Dune result cache ---
+# Downloaded results are kept under `DEFAULT_CACHE_DIR`, keyed by query id, parameters and
+# execution id. An execution's result never changes, so when Dune's latest execution of a query
+# is one we already downloaded, the saved copy is restored instead of downloading it again.
+# Only the newest result per query, parameters and format is kept.
+DEFAULT_CACHE_DIR = '../data/dune_cache'
+INDEX_FILENAME = 'index.sqlite'
+
+
+def parameters_key(parameters: dict) -> str:
+    """A stable short hash of query parameters ('' when there are none)."""
+    if not parameters:
+        return ''
+    encoded = json.dumps(parameters, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+
+def parse_time(value: str):
+    """Parses a Dune timestamp such as '2024-01-12T21:34:37.464387123Z' (None if missing)."""
+    if not value:
+        return None
+    value = value.replace('Z', '+00:00')
+    if '.' in value:
+        # Dune may report nanoseconds; datetime takes at most six fraction digits
+        head, tail = value.split('.', 1)
+        digits = len(tail) - len(tail.lstrip('0123456789'))
+        value = f"{head}.{tail[:min(digits, 6)]}{tail[digits:]}"
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def age_in_hours(ended_at: str) -> float:
+    """Hours since a Dune timestamp, or infinity when it is missing."""
+    ended = parse_time(ended_at)
+    if ended is None:
+        return float('inf')
+    return (datetime.now(timezone.utc) - ended).total_seconds() / 3600
+
+
+class DuneResultCache:
+    """
+    Local copies of downloaded Dune results, indexed in SQLite.
+
+    Usage:
+        with DuneResultCache() as cache:
+            entry = cache.get(query_id, parameters, execution_id, 'csv')
+            if entry is None:
+                ...download to output_path...
+                cache.put(query_id, parameters, execution_id, 'csv', output_path, rows, ended_at)
+            else:
+                cache.restore(entry, output_path)
+    """
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, INDEX_FILENAME))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "query_id TEXT NOT NULL, parameters_key TEXT NOT NULL, execution_id TEXT NOT NULL, format TEXT NOT NULL, "
+            "filename TEXT NOT NULL, rows INTEGER NOT NULL, ended_at TEXT, fetched_at REAL NOT NULL, "
+            "PRIMARY KEY (query_id, parameters_key, execution_id, format))"
+        )
+        self._conn.commit()
+
+    def get(self, query_id, parameters: dict, execution_id: str, fmt: str):
+        """The cached entry for this execution's result as a dict, or None if it is missing."""
+        row = self._conn.execute(
+            "SELECT filename, rows, ended_at, fetched_at FROM results "
+            "WHERE query_id = ? AND parameters_key = ? AND execution_id = ? AND format = ?",
+            (str(query_id), parameters_key(parameters), execution_id, fmt)
+        ).fetchone()
+        if row is None or not os.path.exists(os.path.join(self.cache_dir, row[0])):
+            return None
+        return {'execution_id': execution_id, 'path': os.path.join(self.cache_dir, row[0]),
+                'rows': row[1], 'ended_at': row[2], 'fetched_at': row[3]}
+
+    def put(self, query_id, parameters: dict, execution_id: str, fmt: str, source_path: str, rows: int,
+            ended_at: str = None):
+        """Saves a copy of a downloaded result and drops older results of the same query."""
+        key = parameters_key(parameters)
+        filename = f"{query_id}-{key or 'default'}-{execution_id}.{fmt}"
+        path = os.path.join(self.cache_dir, filename)
+        shutil.copyfile(source_path, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+        stale = self._conn.execute(
+            "SELECT filename FROM results WHERE query_id = ? AND parameters_key = ? AND format = ? AND execution_id != ?",
+            (str(query_id), key, fmt, execution_id)
+        ).fetchall()
+        self._conn.execute(
+            "DELETE FROM results WHERE query_id = ? AND parameters_key = ? AND format = ? AND execution_id != ?",
+            (str(query_id), key, fmt, execution_id)
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO results (query_id, parameters_key, execution_id, format, filename, rows, ended_at, "
+            "fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (str(query_id), key, execution_id, fmt, filename, rows, ended_at, time.time())
+        )
+        self._conn.commit()
+        for (stale_filename,) in stale:
+            stale_path = os.path.join(self.cache_dir, stale_filename)
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+
+    def restore(self, entry: dict, output_path: str) -> int:
+        """Copies a cached result to `output_path`. Returns its row count."""
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        shutil.copyfile(entry['path'], output_path + '.tmp')
+        os.replace(output_path + '.tmp', output_path)
+        return entry['rows']
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,204 @@
+import asyncio
+import argparse
+import itertools
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from aiohttp import web
+
+# --- Local fake of the Dune API ---
+# Serves the endpoints common/dune.py uses, so query orchestration and the result cache can be
+# exercised offline (tests/test_dune_cache.py runs the cache scenarios against it):
+#   POST /query/{id}/execute, GET /execution/{id}/status, GET /execution/{id}/results[/csv],
+#   GET /query/{id}/results[/csv] (latest finished execution, optionally per `params.<name>`)
+# Results are deterministic: `rows` rows of (address, interactions), where interactions
+# include the execution's serial number so every execution returns different data.
+# `calls` counts requests by kind for checking reuse: 'execute', 'latest' (metadata reads) and
+# 'download' (result downloads; only the first page of a download is counted).
+API_PREFIX = '/api/v1'
+DEFAULT_PORT = 8790
+DEFAULT_ROWS = 25
+DEFAULT_DURATION_SECONDS = 1.0
+PAGE_SIZE = 10
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class FakeDune:
+    """
+    In-memory Dune executions behind an aiohttp app.
+
+    Usage:
+        fake = FakeDune({1234: 25})
+        fake.seed_result(1234, age_hours=2)
+        runner = await fake.start(port=8790)   # base URL: http://127.0.0.1:8790/api/v1
+        ...
+        await runner.cleanup()
+    """
+    def __init__(self, queries: dict, duration: float = DEFAULT_DURATION_SECONDS, page_size: int = PAGE_SIZE):
+        self.queries = {int(query_id): rows for query_id, rows in queries.items()}   # {query_id: row count}
+        self.duration = duration
+        self.page_size = page_size
+        self.executions = {}     # {execution_id: dict}
+        self.calls = Counter()
+        self.base_url = None
+        self._serials = itertools.count(1)
+
+    def _add_execution(self, query_id: int, parameters: dict, submitted: datetime, duration: float) -> dict:
+        serial = next(self._serials)
+        execution = {'execution_id': f'01FAKE{serial:020d}', 'query_id': query_id, 'serial': serial,
+                     'parameters': {name: str(value) for name, value in (parameters or {}).items()},
+                     'submitted_at': submitted, 'ended_at': submitted + timedelta(seconds=duration)}
+        self.executions[execution['execution_id']] = execution
+        return execution
+
+    def seed_result(self, query_id: int, age_hours: float, parameters: dict = None) -> str:
+        """Adds a finished execution that ended `age_hours` ago. Returns its execution id."""
+        ended = datetime.now(timezone.utc) - timedelta(hours=age_hours)
+        return self._add_execution(int(query_id), parameters, ended - timedelta(seconds=self.duration),
+                                   self.duration)['execution_id']
+
+    @staticmethod
+    def _finished(execution: dict) -> bool:
+        return execution['ended_at'] <= datetime.now(timezone.utc)
+
+    def _rows(self, execution: dict) -> list:
+        return [{'address': f'0x{i:040x}', 'interactions': i + execution['serial']}
+                for i in range(self.queries[execution['query_id']])]
+
+    def _payload(self, execution: dict, limit: int, offset: int) -> dict:
+        rows = self._rows(execution)
+        return {
+            'execution_id': execution['execution_id'], 'query_id': execution['query_id'],
+            'state': 'QUERY_STATE_COMPLETED', 'is_execution_finished': True,
+            'submitted_at': _timestamp(execution['submitted_at']),
+            'execution_ended_at': _timestamp(execution['ended_at']),
+            'result': {'rows': rows[offset:offset + limit],
+                       'metadata': {'column_names': ['address', 'interactions'], 'column_types': ['varbinary', 'bigint'],
+                                    'row_count': len(rows[offset:offset + limit]), 'total_row_count': len(rows)}},
+        }
+
+    def _csv(self, execution: dict, limit: int, offset: int) -> bytes:
+        lines = ['address,interactions'] + [f"{row['address']},{row['interactions']}"
+                                            for row in self._rows(execution)[offset:offset + limit]]
+        return ('\n'.join(lines) + '\n').encode()
+
+    def _latest(self, request: web.Request):
+        query_id = int(request.match_info['query_id'])
+        parameters = {key[len('params.'):]: value for key, value in request.query.items() if key.startswith('params.')}
+        finished = [execution for execution in self.executions.values()
+                    if execution['query_id'] == query_id and execution['parameters'] == parameters
+                    and self._finished(execution)]
+        if not finished:
+            raise web.HTTPNotFound(text='{"error": "No execution found for the query"}', content_type='application/json')
+        return max(finished, key=lambda execution: execution['ended_at'])
+
+    def _execution(self, request: web.Request) -> dict:
+        execution = self.executions.get(request.match_info['execution_id'])
+        if execution is None:
+            raise web.HTTPNotFound(text='{"error": "Execution not found"}', content_type='application/json')
+        return execution
+
+    def _page(self, request: web.Request) -> (int, int): # type: ignore
+        return int(request.query.get('limit', self.page_size)), int(request.query.get('offset', 0))
+
+    async def execute(self, request: web.Request) -> web.Response:
+        query_id = int(request.match_info['query_id'])
+        if query_id not in self.queries:
+            raise web.HTTPNotFound(text='{"error": "Query not found"}', content_type='application/json')
+        body = await request.json() if request.can_read_body else {}
+        self.calls['execute'] += 1
+        execution = self._add_execution(query_id, body.get('query_parameters'), datetime.now(timezone.utc), self.duration)
+        return web.json_response({'execution_id': execution['execution_id'], 'state': 'QUERY_STATE_PENDING'})
+
+    async def status(self, request: web.Request) -> web.Response:
+        execution = self._execution(request)
+        finished = self._finished(execution)
+        return web.json_response({
+            'execution_id': execution['execution_id'], 'query_id': execution['query_id'],
+            'state': 'QUERY_STATE_COMPLETED' if finished else 'QUERY_STATE_EXECUTING',
+            'execution_ended_at': _timestamp(execution['ended_at']) if finished else None,
+        })
+
+    def _count_download(self, offset: int):
+        if offset == 0:
+            self.calls['download'] += 1
+
+    async def execution_results(self, request: web.Request) -> web.Response:
+        limit, offset = self._page(request)
+        self._count_download(offset)
+        return web.json_response(self._payload(self._execution(request), limit, offset))
+
+    async def execution_results_csv(self, request: web.Request) -> web.Response:
+        execution = self._execution(request)
+        limit, offset = self._page(request)
+        self._count_download(offset)
+        headers = {}
+        if offset + limit < self.queries[execution['query_id']]:
+            headers['x-dune-next-uri'] = (f"{self.base_url}/execution/{execution['execution_id']}/results/csv"
+                                          f"?limit={limit}&offset={offset + limit}")
+        return web.Response(body=self._csv(execution, limit, offset), headers=headers, content_type='text/csv')
+
+    async def latest_results(self, request: web.Request) -> web.Response:
+        self.calls['latest'] += 1
+        return web.json_response(self._payload(self._latest(request), *self._page(request)))
+
+    async def latest_results_csv(self, request: web.Request) -> web.Response:
+        execution = self._latest(request)
+        limit, offset = self._page(request)
+        self._count_download(offset)
+        return web.Response(body=self._csv(execution, limit, offset), content_type='text/csv')
+
+    @web.middleware
+    async def require_api_key(self, request: web.Request, handler):
+        if not request.headers.get('X-Dune-API-Key'):
+            raise web.HTTPUnauthorized(text='{"error": "invalid API Key"}', content_type='application/json')
+        return await handler(request)
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.require_api_key])
+        app.router.add_post(API_PREFIX + '/query/{query_id}/execute', self.execute)
+        app.router.add_get(API_PREFIX + '/execution/{execution_id}/status', self.status)
+        app.router.add_get(API_PREFIX + '/execution/{execution_id}/results', self.execution_results)
+        app.router.add_get(API_PREFIX + '/execution/{execution_id}/results/csv', self.execution_results_csv)
+        app.router.add_get(API_PREFIX + '/query/{query_id}/results', self.latest_results)
+        app.router.add_get(API_PREFIX + '/query/{query_id}/results/csv', self.latest_results_csv)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT) -> web.AppRunner:
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]   # resolves port 0
+        self.base_url = f'http://{host}:{port}{API_PREFIX}'
+        return runner
+
+
+async def serve(fake: FakeDune, port: int):
+    runner = await fake.start(port=port)
+    print(f"Fake Dune API listening on {fake.base_url} (set DUNE_BASE_URL to use it). Ctrl+C to stop.")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    # Usage: python fake_dune.py --query 1234:500:6 [--query ...]   (id:rows[:age of a seeded result in hours])
+    parser = argparse.ArgumentParser(description="Local fake of the Dune API.")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--query', action='append', default=[], help="QUERY_ID[:ROWS[:SEED_AGE_HOURS]]")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION_SECONDS, help="Seconds per execution.")
+    args = parser.parse_args()
+
+    specs = [spec.split(':') for spec in args.query]
+    server = FakeDune({int(spec[0]): int(spec[1]) if len(spec) > 1 else DEFAULT_ROWS for spec in specs}, args.duration)
+    for spec in specs:
+        if len(spec) > 2:
+            server.seed_result(int(spec[0]), float(spec[2]))
+    try:
+        asyncio.run(serve(server, args.port))
+    except KeyboardInterrupt:
+        pass
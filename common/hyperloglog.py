@@ -0,0 +1,100 @@
+import hashlib
+import numpy as np
+
+# --- Mergeable distinct counts ---
+# HyperLogLog sketches for COUNT(DISTINCT ...) over stored partial aggregates. A sketch is kept
+# sparse: only non-empty registers are stored, each packed into a uint32 as
+# (register index << RANK_BITS) | rank, sorted by index. Most (day, contract) pairs see a handful
+# of Safes, so a sketch costs a few bytes per distinct value rather than 2^PRECISION bytes.
+# Union is a per-register max, so sketches from any set of days merge into the sketch of the
+# combined window. With PRECISION = 14 the standard error is about 0.8%; below roughly
+# 2.5 * REGISTERS the linear-counting estimate is used, which is near exact for small counts.
+# Functions work on many sketches at once, laid out like an Arrow list column: `offsets`
+# (n + 1 positions) into one flat array of packed registers.
+PRECISION = 14
+REGISTERS = 1 << PRECISION
+RANK_BITS = 6
+_RANK_MASK = (1 << RANK_BITS) - 1
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+
+def hash_values(values: np.ndarray) -> np.ndarray:
+    """64-bit hashes of `values` (e.g. 20-byte address keys). Each distinct value is hashed once."""
+    unique, inverse = np.unique(values, return_inverse=True)
+    hashes = np.fromiter((int.from_bytes(hashlib.blake2b(bytes(value), digest_size=8).digest(), 'little')
+                          for value in unique), dtype=np.uint64, count=len(unique))
+    return hashes[inverse.reshape(-1)]
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Exact bit length of uint64 values (a binary search; float log2 rounds near powers of two)."""
+    values = values.copy()
+    lengths = np.zeros(len(values), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= np.uint64(1 << shift)
+        values[high] >>= np.uint64(shift)
+        lengths[high] += shift
+    return lengths + (values > 0)
+
+
+def registers(hashes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """The register index and rank (position of the first 1 bit after the index bits) of each hash."""
+    hashes = hashes.astype(np.uint64)
+    index = (hashes >> np.uint64(64 - PRECISION)).astype(np.uint32)
+    remainder = hashes & np.uint64((1 << (64 - PRECISION)) - 1)
+    rank = (64 - PRECISION + 1 - _bit_length(remainder).astype(np.int64)).astype(np.uint32)
+    return index, rank
+
+
+def unpack(packed: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    return packed >> np.uint32(RANK_BITS), packed & np.uint32(_RANK_MASK)
+
+
+def max_registers(groups: np.ndarray, index: np.ndarray, rank: np.ndarray, n_groups: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Builds one sketch per group from (group, register index, rank) triples, keeping the highest
+    rank per register. Returns (offsets, packed registers).
+    """
+    if len(groups) == 0:
+        return np.zeros(n_groups + 1, dtype=np.int64), np.zeros(0, dtype=np.uint32)
+    keys = (groups.astype(np.int64) << PRECISION) | index.astype(np.int64)
+    order = np.lexsort((rank, keys))
+    keys, rank = keys[order], rank[order]
+    last = np.ones(len(keys), dtype=bool)
+    last[:-1] = keys[1:] != keys[:-1]     # the highest rank sorts last within a register
+    keys, rank = keys[last], rank[last]
+    packed = ((keys & (REGISTERS - 1)).astype(np.uint32) << np.uint32(RANK_BITS)) | rank.astype(np.uint32)
+    offsets = np.zeros(n_groups + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys >> PRECISION, minlength=n_groups), out=offsets[1:])
+    return offsets, packed
+
+
+def sketch_groups(groups: np.ndarray, hashes: np.ndarray, n_groups: int) -> tuple[np.ndarray, np.ndarray]:
+    """Sketches the hashed values of each group. Returns (offsets, packed registers)."""
+    index, rank = registers(hashes)
+    return max_registers(groups, index, rank, n_groups)
+
+
+def merge(into: np.ndarray, offsets: np.ndarray, packed: np.ndarray, n_groups: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Unions sketches: sketch i (packed[offsets[i]:offsets[i + 1]]) is merged into group `into[i]`.
+    Returns (offsets, packed registers) of the `n_groups` merged sketches.
+    """
+    owners = np.repeat(into, np.diff(offsets))
+    index, rank = unpack(packed[offsets[0]:offsets[-1]])
+    return max_registers(owners, index, rank, n_groups)
+
+
+def estimate(offsets: np.ndarray, packed: np.ndarray) -> np.ndarray:
+    """Estimated distinct count of each sketch, rounded to int64."""
+    n_sketches = len(offsets) - 1
+    filled = np.diff(offsets)
+    _, rank = unpack(packed[offsets[0]:offsets[-1]])
+    owners = np.repeat(np.arange(n_sketches), filled)
+    harmonic = np.bincount(owners, weights=np.exp2(-rank.astype(np.float64)), minlength=n_sketches)
+    harmonic += REGISTERS - filled             # empty registers count 2^-0 each
+    raw = _ALPHA * REGISTERS * REGISTERS / harmonic
+    empty = REGISTERS - filled
+    linear = REGISTERS * np.log(REGISTERS / np.maximum(empty, 1))
+    result = np.where((raw <= 2.5 * REGISTERS) & (empty > 0), linear, raw)
+    return np.rint(result).astype(np.int64)
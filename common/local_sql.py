@@ -0,0 +1,197 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import duckdb
+
+# --- Offline DuneSQL engine ---
+# Runs the repo's Dune queries with DuckDB against a local Parquet snapshot of
+# safe_ethereum.transactions (the raw export of part2/safe_transactions.sql), so exclusion lists
+# and date windows can be iterated on in seconds without a round trip to Dune.
+# The snapshot is loaded once into a DuckDB database next to it, with varbinary columns as BLOBs,
+# and reloaded only when the snapshot files change. DuneSQL is translated where DuckDB differs:
+#   BYTEARRAY_SUBSTRING / BYTEARRAY_LENGTH   macros over DuckDB's blob functions
+#   0xABCD varbinary literals                 unhex('ABCD') (DuckDB would read `0 AS xABCD`)
+#   NOW() / CURRENT_DATE / CURRENT_TIMESTAMP  pinned to the snapshot's as-of time
+#   {{name}} query parameters                 substituted with the given values
+# from_hex, TO_HEX, CONCAT and INTERVAL '30' DAY behave the same in both. Results are exported in
+# Dune's text forms ('0x' hex for varbinary, 'YYYY-MM-DD HH:MM:SS.mmm UTC' for timestamps), so
+# they match the CSV/Parquet files the Dune scripts write.
+DEFAULT_SNAPSHOT_PATH = '../data/safe_transactions.parquet'
+SNAPSHOT_TABLE = 'safe_ethereum.transactions'
+
+# Column types of safe_ethereum.transactions where the snapshot stores text
+SNAPSHOT_TYPES = {
+    'address': 'varbinary', 'tx_hash': 'varbinary', 'input': 'varbinary', 'to': 'varbinary',
+    'block_date': 'date', 'block_time': 'timestamp',
+}
+# The raw export keeps only successful execTransaction calls, so these columns are implied
+IMPLIED_COLUMNS = {'method': "'execTransaction'", 'success': 'true'}
+
+DUNE_MACROS = [
+    "CREATE OR REPLACE MACRO bytearray_substring(b, start, length) AS array_slice(b, start, start + length - 1)",
+    "CREATE OR REPLACE MACRO bytearray_length(b) AS octet_length(b)",
+]
+
+# String literals and comments are copied as-is; rewrites apply to the code between them
+_SQL_TOKENS = re.compile(r"('(?:[^']|'')*'|--[^\n]*|/\*.*?\*/)", re.S)
+_HEX_LITERAL = re.compile(r"(?<![\w.])0x([0-9a-fA-F]+)\b")
+_NOW = re.compile(r"\b(?:NOW\(\s*\)|CURRENT_TIMESTAMP)", re.I)
+_CURRENT_DATE = re.compile(r"\bCURRENT_DATE\b", re.I)
+_PARAMETER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+def translate_sql(sql: str, as_of: str = None, parameters: dict = None) -> str:
+    """
+    Rewrites a DuneSQL query for DuckDB. With `as_of` ('YYYY-MM-DD HH:MM:SS' UTC), NOW(),
+    CURRENT_TIMESTAMP and CURRENT_DATE refer to that moment instead of the wall clock.
+    `parameters` fill Dune's {{name}} placeholders (as text, like the Dune editor does).
+    """
+    if parameters:
+        sql = _PARAMETER.sub(lambda match: str(parameters[match.group(1)]), sql)
+    parts = _SQL_TOKENS.split(sql.strip().rstrip(';'))
+    for i in range(0, len(parts), 2):    # even parts are code, odd parts literals/comments
+        code = _HEX_LITERAL.sub(lambda match: f"unhex('{match.group(1)}')", parts[i])
+        if as_of is not None:
+            code = _NOW.sub(f"TIMESTAMPTZ '{as_of}+00'", code)
+            code = _CURRENT_DATE.sub(f"CAST(TIMESTAMPTZ '{as_of}+00' AS DATE)", code)
+        parts[i] = code
+    return ''.join(parts)
+
+
+def snapshot_files(snapshot_path: str) -> list:
+    """The Parquet files of a snapshot: one file or a glob such as '../data/snapshot/*.parquet'."""
+    files = sorted(glob.glob(snapshot_path))
+    if not files:
+        raise FileNotFoundError(f"No snapshot found at '{snapshot_path}'. Export one with part2/safe_transactions.sql.")
+    return files
+
+
+def snapshot_fingerprint(files: list) -> str:
+    # Snapshots run to gigabytes, so size and mtime stand in for a content hash
+    return json.dumps([[os.path.abspath(path), os.path.getsize(path), os.stat(path).st_mtime_ns] for path in files])
+
+
+def _column_expression(name: str, parquet_type: str) -> str:
+    column = f'"{name}"'
+    target = SNAPSHOT_TYPES.get(name)
+    if parquet_type != 'VARCHAR' or target is None:
+        return column
+    if target == 'varbinary':
+        return f"unhex(substr({column}, 3))"
+    if target == 'date':
+        return f"CAST({column} AS DATE)"
+    return f"CAST(regexp_replace({column}, ' UTC$', '') || '+00' AS TIMESTAMPTZ)"
+
+
+class LocalDune:
+    """
+    DuckDB database holding a snapshot of safe_ethereum.transactions, for running Dune queries offline.
+
+    Usage:
+        with LocalDune('../data/safe_transactions.parquet') as local:
+            rows = local.export(open('../all_contracts.sql').read(), '../data/all_contracts.csv')
+    """
+    def __init__(self, snapshot_path: str = DEFAULT_SNAPSHOT_PATH, database_path: str = None, as_of: str = None):
+        self.snapshot_path = snapshot_path
+        self._files = snapshot_files(snapshot_path)
+        self.database_path = database_path or os.path.splitext(snapshot_path.replace('*', 'all'))[0] + '.duckdb'
+        self._conn = duckdb.connect(self.database_path)
+        self._conn.execute("SET TimeZone = 'UTC'")
+        for macro in DUNE_MACROS:
+            self._conn.execute(macro)
+        self._ensure_snapshot()
+        self.as_of = as_of or self._snapshot_as_of()
+
+    def _ensure_snapshot(self):
+        files = self._files
+        fingerprint = snapshot_fingerprint(files)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS snapshot_meta (fingerprint VARCHAR, loaded_at DOUBLE)")
+        loaded = self._conn.execute("SELECT fingerprint FROM snapshot_meta").fetchone()
+        if loaded is not None and loaded[0] == fingerprint:
+            return
+
+        started = time.monotonic()
+        print(f"Loading snapshot {self.snapshot_path} into {self.database_path}...")
+        columns = self._conn.execute("DESCRIBE SELECT * FROM read_parquet(?)", [files]).fetchall()
+        present = {name for name, *_ in columns}
+        expressions = [f'{_column_expression(name, parquet_type)} AS "{name}"' for name, parquet_type, *_ in columns]
+        expressions += [f'{value} AS {name}' for name, value in IMPLIED_COLUMNS.items() if name not in present]
+        if 'block_time' not in present and 'block_date' in present:
+            expressions.append(f"CAST({_column_expression('block_date', 'VARCHAR')} AS TIMESTAMPTZ) AS block_time")
+
+        self._conn.execute("CREATE SCHEMA IF NOT EXISTS safe_ethereum")
+        self._conn.execute(f"CREATE OR REPLACE TABLE {SNAPSHOT_TABLE} AS "
+                           f"SELECT {', '.join(expressions)} FROM read_parquet(?)", [files])
+        self._conn.execute("DELETE FROM snapshot_meta")
+        self._conn.execute("INSERT INTO snapshot_meta VALUES (?, ?)", [fingerprint, time.time()])
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {SNAPSHOT_TABLE}").fetchone()[0]
+        print(f"  -> Loaded {count} transactions in {time.monotonic() - started:.1f}s.")
+
+    def _snapshot_as_of(self) -> str:
+        """The latest block_time in the snapshot, so '30 days' windows end where the export ended."""
+        latest = self._conn.execute(f"SELECT MAX(block_time) FROM {SNAPSHOT_TABLE}").fetchone()[0]
+        return latest.strftime('%Y-%m-%d %H:%M:%S') if latest is not None else None
+
+    def query(self, sql: str, parameters: dict = None) -> duckdb.DuckDBPyRelation:
+        """Runs a DuneSQL query against the snapshot and returns the DuckDB relation."""
+        return self._conn.sql(translate_sql(sql, self.as_of, parameters))
+
+    @staticmethod
+    def _dune_text(relation: duckdb.DuckDBPyRelation) -> str:
+        """A SELECT list rendering the relation's columns the way Dune exports them."""
+        expressions = []
+        for name, column_type in zip(relation.columns, relation.types):
+            column, column_type = f'"{name}"', str(column_type)
+            if column_type == 'BLOB':
+                column = f"'0x' || lower(hex({column}))"
+            elif column_type in ('TIMESTAMP', 'TIMESTAMP WITH TIME ZONE'):
+                column = f"strftime({column}, '%Y-%m-%d %H:%M:%S.%g UTC')"
+            elif column_type == 'DATE':
+                column = f"CAST({column} AS VARCHAR)"
+            expressions.append(f'{column} AS "{name}"')
+        return ', '.join(expressions)
+
+    def _dune_sql(self, sql: str, parameters: dict = None) -> str:
+        translated = translate_sql(sql, self.as_of, parameters)
+        select_list = self._dune_text(self._conn.sql(translated))   # binds the query without running it
+        return f"SELECT {select_list} FROM ({translated}) AS query"
+
+    def dune_result(self, sql: str, parameters: dict = None) -> duckdb.DuckDBPyRelation:
+        """Like `query`, with columns in the text forms Dune exports them in."""
+        return self._conn.sql(self._dune_sql(sql, parameters))
+
+    def export(self, sql: str, output_path: str) -> int:
+        """Runs a query and writes its result to `output_path` (.csv or .parquet). Returns the row count."""
+        self._conn.execute(f"CREATE OR REPLACE TEMP TABLE result AS {self._dune_sql(sql)}")
+        options = '(FORMAT parquet)' if output_path.endswith('.parquet') else '(FORMAT csv, HEADER)'
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        tmp_path = output_path + '.tmp'
+        self._conn.execute(f"COPY result TO '{tmp_path}' {options}")
+        os.replace(tmp_path, output_path)
+        return self._conn.execute("SELECT COUNT(*) FROM result").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+    # Usage: python local_sql.py <query.sql> [output.csv|output.parquet] [snapshot]
+    query_path = sys.argv[1]
+    with open(query_path) as f:
+        query_sql = f.read()
+    snapshot = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_SNAPSHOT_PATH
+    with LocalDune(snapshot) as local_dune:
+        print(f"Running {query_path} against {snapshot} as of {local_dune.as_of} UTC...")
+        if len(sys.argv) > 2:
+            print(f"Saved {local_dune.export(query_sql, sys.argv[2])} rows to {sys.argv[2]}")
+        else:
+            print(local_dune.dune_result(query_sql).df().to_string(index=False))
@@ -0,0 +1,192 @@
+import os
+import re
+import time
+import asyncio
+import threading
+
+# --- Shared adaptive rate control ---
+# Every outbound API (Etherscan, JSON-RPC, Dune) draws from a named RateController. The
+# controller is a token bucket whose rate adapts AIMD-style: it creeps up towards the
+# endpoint's budget on success and halves on 429 / rate-limit responses or slow replies.
+# It is safe to share between threads and asyncio tasks: tokens are taken under a short
+# lock and callers sleep outside it, so no waiter ever holds the lock while sleeping.
+# The bucket holds at most one token: requests are evenly spaced rather than bursting, since
+# APIs such as Etherscan count calls per sliding second and reject a burst on top of the rate.
+# Budgets and latency targets are looked up by name, then by the name's base ('etherscan' for
+# the per-key 'etherscan[0]'). Precedence: RATE_LIMIT_<NAME> / RATE_LATENCY_<NAME> environment
+# variables, then the values a caller passes (e.g. a --rps flag), then these defaults.
+DEFAULT_BUDGETS = {
+    'etherscan': 5.0,   # Etherscan free plan: 5 calls/second
+    'rpc': 25.0,        # JSON-RPC HTTP requests (a batch counts as one)
+    'dune': 1.0,
+}
+# Seconds a reply may take before the endpoint counts as overloaded. Dune has none: its
+# result pages take as long as they are large, so only 429s slow it down.
+DEFAULT_LATENCY_TARGETS = {
+    'etherscan': 3.0,   # one getsourcecode call
+    'rpc': 5.0,         # one batch of up to 100 calls
+}
+INCREASE_FRACTION = 0.05      # additive increase per success, as a fraction of the budget
+DECREASE_FACTOR = 0.5         # multiplicative decrease on a 429 / rate-limit response
+SLOW_DECREASE_FACTOR = 0.9    # gentler decrease when replies are slower than `latency_target`
+MIN_RATE_FRACTION = 0.05
+
+
+class RateController:
+    """
+    Adaptive token bucket for one endpoint. `budget` is the most requests per second the
+    endpoint allows; the controller never exceeds it and backs off below it when throttled.
+
+    Usage:
+        controller = get_controller('etherscan')
+        await controller.acquire_async()     # or controller.acquire() from threads
+        ... send the request ...
+        controller.on_success(latency)       # or controller.on_throttle(retry_after)
+    """
+    def __init__(self, name: str, budget: float, latency_target: float = None):
+        self.name = name
+        self.budget = float(budget)
+        self.rate = self.budget
+        self.min_rate = self.budget * MIN_RATE_FRACTION
+        self.latency_target = latency_target
+        self._tokens = 1.0
+        self._last_refill_time = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease_time = 0.0
+        self._lock = threading.Lock()
+        # Counters
+        self.granted = 0
+        self.waited_seconds = 0.0
+        self.throttled = 0
+        self.slow = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(1.0, self._tokens + (now - self._last_refill_time) * self.rate)
+        self._last_refill_time = now
+
+    def _wait_time(self, now: float) -> float:
+        if self._blocked_until > now:
+            return self._blocked_until - now
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def try_acquire(self) -> float:
+        """Takes a token if one is available (returns 0), else returns how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait_time = self._wait_time(now)
+            if wait_time == 0:
+                self._tokens -= 1
+                self.granted += 1
+            return wait_time
+
+    def available_in(self) -> float:
+        """How long a caller would wait for a token right now, without taking one."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return self._wait_time(now)
+
+    # Waiters re-check after sleeping rather than reserving a slot up front, so a rate
+    # decrease or a Retry-After pause also applies to callers that are already waiting.
+    def acquire(self):
+        while (wait_time := self.try_acquire()) > 0:
+            self.record_wait(wait_time)
+            time.sleep(wait_time)
+
+    async def acquire_async(self):
+        while (wait_time := self.try_acquire()) > 0:
+            self.record_wait(wait_time)
+            await asyncio.sleep(wait_time)
+
+    def record_wait(self, wait_time: float):
+        with self._lock:
+            self.waited_seconds += wait_time
+
+    def set_budget(self, budget: float):
+        with self._lock:
+            self.budget = float(budget)
+            self.rate = min(self.rate, self.budget)
+            self.min_rate = self.budget * MIN_RATE_FRACTION
+
+    def on_success(self, latency: float = None, sent_at: float = None):
+        with self._lock:
+            if self.latency_target and latency is not None and latency > self.latency_target:
+                self.slow += 1
+                self._decrease(SLOW_DECREASE_FACTOR, sent_at)
+            else:
+                self.rate = min(self.budget, self.rate + self.budget * INCREASE_FRACTION)
+
+    def on_throttle(self, retry_after: float = None, sent_at: float = None):
+        """
+        Records a 429 / rate-limit response; honours Retry-After by pausing all callers.
+        `sent_at` (time.monotonic() when the request was sent) lets the controller ignore
+        responses to requests that were already in flight when it last slowed down.
+        """
+        with self._lock:
+            self.throttled += 1
+            self._decrease(DECREASE_FACTOR, sent_at)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+    def _decrease(self, factor: float, sent_at: float = None):
+        # Requests already in flight when the limit was hit all fail together; they count
+        # as one signal, so only requests sent after the last decrease can decrease again.
+        now = time.monotonic()
+        if sent_at is None:
+            sent_at = now - 1 / self.rate
+        if sent_at >= self._last_decrease_time:
+            self.rate = max(self.min_rate, self.rate * factor)
+            self._last_decrease_time = now
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'granted': self.granted, 'waited_seconds': round(self.waited_seconds, 3),
+                    'throttled': self.throttled, 'slow': self.slow,
+                    'rate': round(self.rate, 3), 'budget': self.budget}
+
+
+_controllers = {}
+_registry_lock = threading.Lock()
+
+
+def _setting(name: str, prefix: str, given: float, defaults: dict, fallback: float = None) -> (float, bool): # type: ignore
+    """
+    Resolves one setting of controller `name`: the environment, then `given`, then `defaults`.
+    Returns (value, pinned), where `pinned` means it came from the environment.
+    """
+    base = name.split('[')[0]
+    for env_name in dict.fromkeys((re.sub(r'\W+', '_', name).strip('_'), base)):
+        value = os.environ.get(f'{prefix}_{env_name.upper()}')
+        if value:
+            return float(value), True
+    if given is not None:
+        return float(given), False
+    return defaults.get(name, defaults.get(base, fallback)), False
+
+
+def get_controller(name: str, budget: float = None, latency_target: float = None) -> RateController:
+    """
+    Returns the process-wide controller for `name`, creating it on first use. The budget is
+    RATE_LIMIT_<NAME> from the environment, else `budget`, else DEFAULT_BUDGETS; the latency
+    target is RATE_LATENCY_<NAME>, else `latency_target`, else DEFAULT_LATENCY_TARGETS.
+    Callers sharing a controller that pass different budgets get the lowest of them.
+    """
+    with _registry_lock:
+        budget, pinned = _setting(name, 'RATE_LIMIT', budget, DEFAULT_BUDGETS, 10.0)
+        controller = _controllers.get(name)
+        if controller is None:
+            latency_target, _ = _setting(name, 'RATE_LATENCY', latency_target, DEFAULT_LATENCY_TARGETS)
+            controller = _controllers[name] = RateController(name, budget, latency_target)
+        elif not pinned and budget < controller.budget:
+            controller.set_budget(budget)
+        return controller
+
+
+def report() -> str:
+    """One line of counters per controller used in this process."""
+    with _registry_lock:
+        controllers = list(_controllers.values())
+    return '\n'.join(
+        f"[{c.name}] " + ', '.join(f"{key}={value}" for key, value in c.stats().items()) for c in controllers
+    )
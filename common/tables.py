@@ -0,0 +1,170 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.addresses import ADDRESS_DTYPE, address_keys, hex_addresses  # noqa: E402
+
+# --- Typed columnar intermediates ---
+# Pipeline tables are stored as Parquet with an explicit schema instead of untyped CSV.
+# Paths are given without an extension: `read_table` prefers `<stem>.parquet` and falls back
+# to `<stem>.csv`, so CSVs from older runs still work as inputs.
+ADDRESS_TYPE = pa.binary(20)
+LABEL_TYPE = pa.dictionary(pa.int32(), pa.string())
+
+SCHEMA = {
+    'address': ADDRESS_TYPE,
+    'destination_contract': ADDRESS_TYPE,
+    'amount_of_times_interacted_with': pa.int64(),
+    'interaction_count': pa.int64(),
+    'unique_safe_wallets': pa.int64(),
+    'first_interaction_date': pa.date32(),
+    'last_interaction_date': pa.date32(),
+    'custom_label': LABEL_TYPE,
+    'custom_label_source': LABEL_TYPE,
+    'filtered_reason': LABEL_TYPE,
+    'label': LABEL_TYPE,
+    'contract_type': LABEL_TYPE,
+    'token_symbol': pa.string(),
+    'token_name': pa.string(),
+    'token_decimals': pa.int64(),
+    'token_symbol_source': LABEL_TYPE,
+}
+
+
+def _to_arrow(column: pd.Series, arrow_type) -> pa.Array:
+    if arrow_type == ADDRESS_TYPE:
+        keys = address_keys(column)
+        return pa.FixedSizeBinaryArray.from_buffers(ADDRESS_TYPE, len(keys), [None, pa.py_buffer(keys.tobytes())])
+    if arrow_type == pa.date32():
+        return pa.array(pd.to_datetime(column).dt.date, type=arrow_type, from_pandas=True)
+    if arrow_type == LABEL_TYPE:
+        return pa.array(column.astype(object), type=pa.string(), from_pandas=True).dictionary_encode()
+    return pa.array(column, type=arrow_type, from_pandas=True)
+
+
+def _address_column(array: pa.ChunkedArray) -> list:
+    array = array.combine_chunks()
+    keys = np.frombuffer(array.buffers()[1], dtype=ADDRESS_DTYPE, count=array.offset + len(array))[array.offset:]
+    return hex_addresses(keys)
+
+
+def write_table(df: pd.DataFrame, stem: str, export_csv: bool = False) -> str:
+    """
+    Writes `df` to `<stem>.parquet` using the pipeline schema for known columns.
+    Addresses are stored as 20-byte binary, counts as int64, dates as date32 and
+    labels/types as dictionary-encoded strings. Returns the written path.
+    """
+    os.makedirs(os.path.dirname(stem) or '.', exist_ok=True)
+    arrays = [_to_arrow(df[name], SCHEMA[name]) if name in SCHEMA else pa.array(df[name], from_pandas=True)
+              for name in df.columns]
+    path = stem + '.parquet'
+    pq.write_table(pa.Table.from_arrays(arrays, names=[str(name) for name in df.columns]), path)
+    if export_csv:
+        export_table_csv(stem, df)
+    return path
+
+
+def read_table(stem: str, columns: list = None) -> pd.DataFrame:
+    """
+    Reads `<stem>.parquet` (or `<stem>.csv` if no Parquet file exists), loading only `columns`.
+    Binary address columns come back as lowercase '0x' hex strings, and dictionary-encoded
+    labels as plain object strings (not pandas categoricals), like the CSV path returns them.
+    """
+    parquet_path = stem + '.parquet'
+    if not os.path.exists(parquet_path):
+        return pd.read_csv(stem + '.csv', usecols=columns)
+
+    table = pq.read_table(parquet_path, columns=columns)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    df = table.to_pandas()
+    for name in table.column_names:
+        if table.schema.field(name).type == ADDRESS_TYPE:
+            df[name] = _address_column(table.column(name))
+    return df
+
+
+class TableWriter:
+    """
+    Writes a table incrementally: each `write(df)` appends one Parquet row group to
+    `<stem>.parquet` (and rows to `<stem>.csv` if `export_csv`). The schema is fixed by the
+    first batch. Files are written under a temporary name and moved into place on close,
+    so readers never see a half-written table; leaving the block on an exception discards them.
+
+    Usage:
+        with TableWriter('../data/final_combined_4', export_csv=True) as writer:
+            for batch in batches:
+                writer.write(batch)
+    """
+    def __init__(self, stem: str, export_csv: bool = False):
+        self.stem = stem
+        self.export_csv = export_csv
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+        self._columns = None
+        os.makedirs(os.path.dirname(stem) or '.', exist_ok=True)
+
+    def write(self, df: pd.DataFrame):
+        if self._writer is None:
+            self._columns = list(df.columns)
+        df = df[self._columns]
+        arrays = [_to_arrow(df[name], SCHEMA[name]) if name in SCHEMA else pa.array(df[name], from_pandas=True)
+                  for name in self._columns]
+        table = pa.Table.from_arrays(arrays, names=[str(name) for name in self._columns])
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = pq.ParquetWriter(self.stem + '.parquet.tmp', self._schema)
+        self._writer.write_table(table.cast(self._schema))
+        if self.export_csv:
+            df.to_csv(self.stem + '.csv.tmp', mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        os.replace(self.stem + '.parquet.tmp', self.stem + '.parquet')
+        if self.export_csv:
+            os.replace(self.stem + '.csv.tmp', self.stem + '.csv')
+
+    def discard(self):
+        if self._writer is not None:
+            self._writer.close()
+        for path in (self.stem + '.parquet.tmp', self.stem + '.csv.tmp'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def table_exists(stem: str) -> bool:
+    return os.path.exists(stem + '.parquet') or os.path.exists(stem + '.csv')
+
+
+def export_table_csv(stem: str, df: pd.DataFrame = None) -> str:
+    """Exports a pipeline table to `<stem>.csv` for humans. Returns the written path."""
+    if df is None:
+        df = read_table(stem)
+    path = stem + '.csv'
+    df.to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    # Usage: python tables.py ../data/final_combined_2 [...]  -> writes ../data/final_combined_2.csv
+    for table_stem in sys.argv[1:]:
+        table_stem = table_stem[:-len('.parquet')] if table_stem.endswith('.parquet') else table_stem
+        print(f"Exported {export_table_csv(table_stem)}")
@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import sqlite3
+from eth_utils import keccak, function_signature_to_4byte_selector
+
+# --- Bytecode classifier ---
+# Classifies contracts from their runtime bytecode, so unverified contracts get a type too.
+# The function dispatcher compares the calldata selector against each selector the contract
+# implements, pushed as an immediate (PUSH4, or a shorter PUSH when it has leading zero bytes).
+DEFAULT_CACHE_PATH = '../data/bytecode_cache.sqlite'
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'bytecode.json')
+
+PUSH1, PUSH4, PUSH32, EQ = 0x60, 0x63, 0x7f, 0x14
+CBOR_MAP_HEADERS = (0xa1, 0xa2, 0xa3, 0xa4)
+
+
+def _selectors(*signatures) -> frozenset:
+    return frozenset(function_signature_to_4byte_selector(signature) for signature in signatures)
+
+
+# Checked in order; the first interface whose selectors are all present wins.
+INTERFACES = [
+    ("ERC20 Token", _selectors(
+        "totalSupply()", "balanceOf(address)", "transfer(address,uint256)",
+        "transferFrom(address,address,uint256)", "approve(address,uint256)", "allowance(address,address)")),
+    ("ERC721 Token", _selectors(
+        "balanceOf(address)", "ownerOf(uint256)", "safeTransferFrom(address,address,uint256)",
+        "transferFrom(address,address,uint256)", "setApprovalForAll(address,bool)",
+        "getApproved(uint256)", "isApprovedForAll(address,address)")),
+    ("ERC1155 Token", _selectors(
+        "balanceOf(address,uint256)", "balanceOfBatch(address[],uint256[])",
+        "setApprovalForAll(address,bool)", "safeTransferFrom(address,address,uint256,uint256,bytes)",
+        "safeBatchTransferFrom(address,address,uint256[],uint256[],bytes)")),
+    ("Safe Wallet", _selectors(
+        "execTransaction(address,uint256,bytes,uint8,uint256,uint256,uint256,address,address,bytes)",
+        "getOwners()", "getThreshold()")),
+    ("DEX Router", _selectors(  # Uniswap V2-style routers
+        "swapExactTokensForTokens(uint256,uint256,address[],address,uint256)",
+        "addLiquidity(address,address,uint256,uint256,uint256,uint256,address,uint256)")),
+    ("DEX Router", _selectors(  # Uniswap V3 SwapRouter
+        "exactInputSingle((address,address,uint24,address,uint256,uint256,uint256,uint160))",
+        "exactInput((bytes,address,uint256,uint256,uint256))")),
+    ("DEX Router", _selectors(  # Uniswap Universal Router
+        "execute(bytes,bytes[],uint256)", "execute(bytes,bytes[])")),
+]
+
+
+def strip_metadata(code: bytes) -> bytes:
+    """Drops the trailing CBOR metadata solc appends, so its bytes are not read as opcodes."""
+    if len(code) < 2:
+        return code
+    metadata_length = int.from_bytes(code[-2:], 'big')
+    start = len(code) - 2 - metadata_length
+    if start >= 0 and code[start] in CBOR_MAP_HEADERS:
+        return code[:start]
+    return code
+
+
+def extract_selectors(code: bytes) -> set:
+    """
+    Returns the 4-byte selectors pushed by the code: every PUSH4 immediate plus shorter
+    immediates that are compared with EQ straight away. PUSH data is skipped while
+    walking, so constants and data never read as opcodes.
+    """
+    code = strip_metadata(code)
+    selectors = set()
+    i, n = 0, len(code)
+    while i < n:
+        op = code[i]
+        if PUSH1 <= op <= PUSH32:
+            size = op - PUSH1 + 1
+            if op == PUSH4:
+                selectors.add(bytes(code[i + 1:i + 5]).ljust(4, b'\x00'))
+            elif size < 4 and i + 1 + size < n and code[i + 1 + size] == EQ:
+                selectors.add(bytes(code[i + 1:i + 1 + size]).rjust(4, b'\x00'))
+            i += size
+        i += 1
+    return selectors
+
+
+def classify_selectors(selectors: set) -> str:
+    for contract_type, required in INTERFACES:
+        if required <= selectors:
+            return contract_type
+    return "Other Contract"
+
+
+def classify_code(code: bytes) -> str:
+    """Classifies runtime bytecode. Addresses without code are externally owned accounts."""
+    if not code:
+        return "EOA"
+    return classify_selectors(extract_selectors(code))
+
+
+class CodeClassCache:
+    """
+    SQLite cache of classifications keyed by the keccak hash of the runtime bytecode, so
+    identical deployments (clones, factory pairs, tokens from one template) are scanned once.
+    """
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS code_class (code_hash BLOB PRIMARY KEY, contract_type TEXT NOT NULL)")
+        self._conn.commit()
+
+    def classify(self, code: bytes) -> str:
+        if not code:
+            return classify_code(code)
+        code_hash = keccak(code)
+        row = self._conn.execute("SELECT contract_type FROM code_class WHERE code_hash = ?", (code_hash,)).fetchone()
+        if row is not None:
+            return row[0]
+        contract_type = classify_code(code)
+        self._conn.execute("INSERT OR REPLACE INTO code_class VALUES (?, ?)", (code_hash, contract_type))
+        self._conn.commit()
+        return contract_type
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+async def classify_addresses(rpc, addresses: list, cache: CodeClassCache = None) -> list:
+    """
+    Fetches the runtime bytecode of `addresses` in JSON-RPC batches and classifies each one.
+    Returns one type per address, or None where the code could not be fetched.
+    """
+    codes = await rpc.get_code(addresses)
+    classify = cache.classify if cache is not None else classify_code
+    return [None if code is None else classify(code) for code in codes]
+
+
+def check_fixtures(path: str = FIXTURES_PATH) -> bool:
+    """Classifies the offline bytecode fixtures and reports any that do not match their expected type."""
+    with open(path) as f:
+        fixtures = json.load(f)
+    ok = True
+    for name, fixture in fixtures.items():
+        got = classify_code(bytes.fromhex(fixture['code'].removeprefix('0x')))
+        status = "ok" if got == fixture['expected'] else "MISMATCH"
+        ok &= got == fixture['expected']
+        print(f"{status:8} {name}: expected {fixture['expected']!r}, got {got!r}")
+    return ok
+
+
+if __name__ == "__main__":
+    # Usage: python bytecode.py [fixtures.json]
+    sys.exit(0 if check_fixtures(*sys.argv[1:]) else 1)
@@ -0,0 +1,42 @@
+from eth_utils import keccak
+
+# --- Code-hash groups ---
+# Byte-identical deployments (EIP-1167 clones of one implementation, per-user vaults, factory
+# products) share a contract name and type, so each group is looked up once and the result is
+# fanned out to every member. Proxies share their proxy bytecode whatever they point to, so the
+# group key also includes the resolved implementation.
+
+
+def code_group_keys(addresses: list, codes: list, implementations: dict = None) -> dict:
+    """
+    Returns {address: group key}. Addresses without code or whose code could not be fetched
+    get no key and are looked up on their own.
+    """
+    implementations = implementations or {}
+    keys = {}
+    for address, code in zip(addresses, codes):
+        if code:
+            keys[address] = (keccak(code), implementations.get(address.lower()))
+    return keys
+
+
+def group_addresses(addresses: list, keys: dict) -> dict:
+    """
+    Groups addresses by key. Returns {representative: [members]}, where the representative is
+    the first address of each group (in input order) and members include the representative.
+    """
+    groups, representative_of = {}, {}
+    for address in addresses:
+        key = keys.get(address)
+        if key is None:
+            groups[address] = [address]
+            continue
+        representative = representative_of.setdefault(key, address)
+        groups.setdefault(representative, []).append(address)
+    return groups
+
+
+async def group_by_code(rpc, addresses: list, implementations: dict = None) -> dict:
+    """Fetches runtime code in JSON-RPC batches and groups `addresses` as in `group_addresses`."""
+    codes = await rpc.get_code(addresses)
+    return group_addresses(addresses, code_group_keys(addresses, codes, implementations))
@@ -1,17 +1,24 @@
-import pandas as pd
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.addresses import address_keys  # noqa: E402
+from common.tables import read_table, write_table  # noqa: E402
+from label_index import LabelIndex, ensure_index  # noqa: E402
+from prefilter import FILTER_COLUMN, static_filter_reasons, filter_counts  # noqa: E402
+
 load_dotenv()
 
 
 # --- CONFIGURATION ---
 
 # Define the paths to your input and output files
-MAIN_FILE_PATH = '../data/final_combined.csv'
+MAIN_FILE_PATH = '../data/final_combined'
 ACCOUNTS_LABELS_PATH = '../eth_labels/accounts.csv'
 TOKENS_LABELS_PATH = '../eth_labels/tokens.csv'
-OUTPUT_FILE_PATH = '../data/final_combined_1.csv'
+LABEL_INDEX_PATH = '../data/eth_labels.idx'
+OUTPUT_FILE_PATH = '../data/final_combined_1'
 
 # --- SCRIPT ---
 
@@ -21,50 +28,35 @@ def main():
     """
     print("Starting the data enrichment process...")
 
-    # 1. Load all three CSV files into pandas DataFrames
+    # 1. Load the main table and make sure the label index matches the label files.
+    # The index is rebuilt only when accounts.csv or tokens.csv has changed.
     try:
-        main_df = pd.read_csv(MAIN_FILE_PATH)
-        accounts_df = pd.read_csv(ACCOUNTS_LABELS_PATH)
-        tokens_df = pd.read_csv(TOKENS_LABELS_PATH)
-        print("Successfully loaded all input CSV files.")
+        main_df = read_table(MAIN_FILE_PATH)
+        index_path = ensure_index([ACCOUNTS_LABELS_PATH, TOKENS_LABELS_PATH], LABEL_INDEX_PATH)
+        print("Successfully loaded all input files.")
     except FileNotFoundError as e:
         print(f"Error: Could not find a file. Please check your paths. Details: {e}")
-        return
-
-    # 2. Normalize addresses to lowercase for reliable matching
-    main_df['lookup_address'] = main_df['address'].str.lower()
-    accounts_df['address'] = accounts_df['address'].str.lower()
-    tokens_df['address'] = tokens_df['address'].str.lower()
-
-    # --- FIX: Handle duplicate addresses in the lookup files ---
-    # Keep only the first occurrence of each address to ensure a unique index.
-    accounts_df.drop_duplicates(subset=['address'], keep='first', inplace=True)
-    tokens_df.drop_duplicates(subset=['address'], keep='first', inplace=True)
-    print("Removed duplicate addresses from lookup files.")
-
-    # 3. Create efficient lookup maps (dictionaries) from the label files
-    accounts_map = accounts_df.set_index('address')['label']
-    tokens_map = tokens_df.set_index('address')['label']
-    print("Created lookup maps from accounts and tokens files.")
-
-    # 4. Map the labels to your main DataFrame based on the lookup address
-    labels_from_accounts = main_df['lookup_address'].map(accounts_map)
-    labels_from_tokens = main_df['lookup_address'].map(tokens_map)
-    
-    # 5. Apply the priority rule using .combine_first()
-    main_df['custom_label'] = labels_from_accounts.combine_first(labels_from_tokens)
-    print("Applied priority logic to create the 'custom_label' column.")
-
-    # 6. Clean up the temporary 'lookup_address' column
-    main_df.drop(columns=['lookup_address'], inplace=True)
-    
-    # 7. Save the final enriched DataFrame to a new CSV file
-    output_dir = os.path.dirname(OUTPUT_FILE_PATH)
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        
-    main_df.to_csv(OUTPUT_FILE_PATH, index=False)
-    print(f"\nProcess complete! Final data saved to '{OUTPUT_FILE_PATH}'.")
+        sys.exit(1)
+
+    # 2. Parse addresses once into 20-byte keys for reliable matching
+    main_keys = address_keys(main_df['address'])
+
+    # 3. Look up the labels with binary searches on the memory-mapped index.
+    # The priority rule (accounts over tokens) was applied when the index was built.
+    with LabelIndex(index_path) as label_index:
+        labels, sources = label_index.lookup(main_keys)
+    main_df['custom_label'] = labels
+    main_df['custom_label_source'] = sources
+    print("Applied priority logic to create the 'custom_label' and 'custom_label_source' columns.")
+
+    # 4. Mark addresses the final report drops anyway (Safe infrastructure),
+    # so the Etherscan and RPC stages can skip them
+    main_df[FILTER_COLUMN] = static_filter_reasons(main_keys)
+    print(f"Pre-filtered rows: {filter_counts(main_df[FILTER_COLUMN]) or 'none'}.")
+
+    # 5. Save the final enriched DataFrame to a new typed table
+    output_path = write_table(main_df, OUTPUT_FILE_PATH)
+    print(f"\nProcess complete! Final data saved to '{output_path}'.")
 
 
 if __name__ == "__main__":
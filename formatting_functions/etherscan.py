@@ -1,18 +1,45 @@
-import pandas as pd
-import requests
-import time
 import os
+import sys
 import json
+import asyncio
+import argparse
+import aiohttp
+import pandas as pd
 from dotenv import load_dotenv
+from etherscan_client import (
+    AsyncEtherscanClient,
+    RetriesExhaustedError,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_REQUESTS_PER_SECOND,
+)
+from etherscan_cache import SourceCodeCache, DEFAULT_CACHE_PATH
+from rpc import JSONRPCClient, RPCError
+from bytecode import CodeClassCache, classify_addresses
+from proxies import resolve_implementations
+from code_groups import code_group_keys, group_addresses
+from prefilter import FILTER_COLUMN, EOA, SAFE_INFRASTRUCTURE, eoa_addresses, filtered_info, filter_counts, \
+    load_safe_infrastructure
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.tables import read_table, write_table  # noqa: E402
+from common.ratelimit import report  # noqa: E402
 
 load_dotenv()
 
 # --- Configuration ---
-API_KEY = os.getenv('ETHERSCAN_API_KEY')
-INPUT_CSV = '../data/final_combined_1.csv'
-OUTPUT_CSV = '../data/final_combined_2.csv'
+# Several keys can be given as a comma-separated ETHERSCAN_API_KEYS; requests are spread over all of them
+API_KEYS = [key.strip() for key in (os.getenv('ETHERSCAN_API_KEYS') or os.getenv('ETHERSCAN_API_KEY') or '').split(',')
+            if key.strip()]
+ETHEREUM_RPC_URL = os.getenv('ETHEREUM_RPC_URL')
+INPUT_TABLE = '../data/final_combined_1'
+OUTPUT_TABLE = '../data/final_combined_2'
 API_URL = 'https://api.etherscan.io/api'
-MAX_ROWS_TO_PROCESS = 100
+JOURNAL_PATH = OUTPUT_TABLE + '.journal.jsonl'
+JOURNAL_FLUSH_EVERY = 50
+# Results that are retried on --resume instead of being taken from the journal
+TRANSIENT_TYPES = {"API Request Error"}
+# Types re-classified from runtime bytecode when an RPC endpoint is available
+UNVERIFIED_TYPES = {"Not a Verified Contract", "Proxy to Unverified Implementation"}
 
 # --- ERC20 Standard Definition ---
 ERC20_REQUIRED_FUNCTIONS = {
@@ -37,18 +64,20 @@ def check_abi_for_erc20(abi_string: str) -> str:
     except json.JSONDecodeError:
         return "ABI Parse Error"
 
-def get_contract_info(address: str) -> dict:
+async def get_contract_info(client: AsyncEtherscanClient, address: str, implementation: str = None) -> dict:
     """
     Fetches contract name and type, resolving proxies to check the implementation contract.
+    When the implementation is already known from on-chain slot reads, both lookups run concurrently.
     """
     info = {"label": "N/A", "type": "N/A"}
     
     try:
-        # Initial API call for the given address
-        params = {'module': 'contract', 'action': 'getsourcecode', 'address': address, 'apikey': API_KEY}
-        response = requests.get(API_URL, params=params)
-        response.raise_for_status()
-        data = response.json()
+        # Initial API call for the given address (and its known implementation)
+        if implementation:
+            data, imp_data = await asyncio.gather(client.get_source_code(address),
+                                                  client.get_source_code(implementation))
+        else:
+            data, imp_data = await client.get_source_code(address), None
 
         if data['status'] == '0':
             info['label'] = data.get('result', 'API Error: No result')
@@ -57,19 +86,14 @@ def get_contract_info(address: str) -> dict:
 
         result = data['result'][0]
         info['label'] = result.get('ContractName') or "Label not found"
-        implementation_address = result.get('Implementation')
+        implementation_address = implementation or result.get('Implementation')
 
-        # Check if it's a proxy by looking for the 'Implementation' field
+        # Check if it's a proxy: resolved on-chain, or flagged by Etherscan's 'Implementation' field
         if implementation_address:
-            print(f"  -> Proxy detected. Implementation: {implementation_address}")
-            # This is a proxy. We need to fetch the ABI of the implementation contract.
-            time.sleep(0.25) # Add a small delay before the second API call
-            
-            # 3. Make a SECOND API call for the implementation contract
-            imp_params = {'module': 'contract', 'action': 'getsourcecode', 'address': implementation_address, 'apikey': API_KEY}
-            imp_response = requests.get(API_URL, params=imp_params)
-            imp_response.raise_for_status()
-            imp_data = imp_response.json()
+            print(f"  -> Proxy detected for {address}. Implementation: {implementation_address}")
+            # This is a proxy. Unless it was resolved on-chain, make a SECOND API call for the implementation's ABI.
+            if imp_data is None:
+                imp_data = await client.get_source_code(implementation_address)
             
             if imp_data['status'] == '1':
                 implementation_abi = imp_data['result'][0]['ABI']
@@ -77,62 +101,235 @@ def get_contract_info(address: str) -> dict:
             else:
                 info['type'] = "Proxy to Unverified Implementation"
         else:
-            # 4. Not a proxy, just check its own ABI
+            # Not a proxy, just check its own ABI
             own_abi = result.get('ABI')
             info['type'] = check_abi_for_erc20(own_abi)
 
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError, RetriesExhaustedError) as e:
         print(f"  -> API Request Error for {address}: {e}")
         info['label'] = "API Request Error"
         info['type'] = "API Request Error"
-    except (KeyError, IndexError) as e:
+    except (KeyError, IndexError, TypeError) as e:
         print(f"  -> Response Parse Error for {address}: {e}")
         info['label'] = "Response Parse Error"
         info['type'] = "Response Parse Error"
         
     return info
 
+
+class ResultJournal:
+    """
+    Append-only JSON-lines journal of per-address results, flushed to disk every `flush_every`
+    results. A crashed run is resumed by loading the journal and skipping recorded addresses.
+    A non-empty journal is only started over with `overwrite`, since it may hold hours of paid lookups.
+    """
+    def __init__(self, path: str, resume: bool = False, flush_every: int = JOURNAL_FLUSH_EVERY,
+                 overwrite: bool = False):
+        if not resume and not overwrite and os.path.exists(path) and os.path.getsize(path) > 0:
+            raise FileExistsError(f"The journal '{path}' of an interrupted run already exists.")
+        self.path = path
+        self.flush_every = flush_every
+        self.results = self.load(path) if resume else {}
+        if resume and os.path.exists(path):
+            _truncate_torn_line(path)
+        self._buffer = []
+        self._file = open(path, 'a' if resume else 'w')
+
+    @staticmethod
+    def load(path: str) -> dict:
+        results = {}
+        if not os.path.exists(path):
+            return results
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn final line from a crash
+                results[entry['address']] = {"label": entry['label'], "type": entry['type']}
+        return {address: info for address, info in results.items() if info['type'] not in TRANSIENT_TYPES}
+
+    def record(self, address: str, info: dict):
+        self.results[address] = info
+        self._buffer.append(json.dumps({"address": address, **info}) + '\n')
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.writelines(self._buffer)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._buffer.clear()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _truncate_torn_line(path: str):
+    """Drops a partially written last line so appended entries start on a fresh line."""
+    with open(path, 'rb+') as f:
+        data = f.read()
+        f.truncate(data.rfind(b'\n') + 1)
+
+
+async def process_addresses(addresses: list, requests_per_second: float, max_concurrency: int,
+                            journal: ResultJournal, cache: SourceCodeCache = None, implementations: dict = None,
+                            groups: dict = None):
+    """
+    Classifies all addresses concurrently through one pooled client and records each
+    result in `journal` as soon as it completes. `implementations` maps lowercase proxy
+    addresses to implementations resolved on-chain. `groups` maps a representative address
+    to all addresses with the same code; only representatives are looked up and their
+    result is recorded for every member.
+    """
+    implementations = implementations or {}
+    groups = groups or {address: [address] for address in addresses}
+    addresses = list(groups)
+    total = len(addresses)
+    completed = 0
+
+    async with AsyncEtherscanClient(API_KEYS, API_URL, requests_per_second, max_concurrency, cache) as client:
+        async def process(address: str):
+            nonlocal completed
+            info = await get_contract_info(client, address, implementations.get(address.lower()))
+            for member in groups[address]:
+                journal.record(member, info)
+            completed += 1
+            shared = f" (shared with {len(groups[address]) - 1} identical contracts)" if len(groups[address]) > 1 else ""
+            print(f"({completed}/{total}) {address} -> Label: {info['label']}, Type: {info['type']}{shared}")
+
+        await asyncio.gather(*(process(address) for address in addresses))
+        if cache is not None:
+            print(f"Served {client.cache_hits} lookups from the cache at '{cache.path}'.")
+
+
+async def inspect_onchain(rpc_url: str, addresses: list, pending: list) -> (dict, dict, set): # type: ignore
+    """
+    Fetches the runtime code of `pending` once: EOAs (no code) are set aside, proxy implementations
+    are resolved for the other `addresses` and the remaining `pending` are grouped by code hash.
+    Returns (implementations, groups, eoas).
+    """
+    async with JSONRPCClient(rpc_url) as rpc:
+        codes = await rpc.get_code(pending)
+        eoas = eoa_addresses(pending, codes)
+        implementations = await resolve_implementations(rpc, [address for address in addresses if address not in eoas])
+    contracts = [(address, code) for address, code in zip(pending, codes) if address not in eoas]
+    remaining = [address for address, _ in contracts]
+    groups = group_addresses(remaining, code_group_keys(remaining, [code for _, code in contracts], implementations))
+    return implementations, groups, eoas
+
+
+async def classify_unverified(rpc_url: str, addresses: list, implementations: dict) -> dict:
+    """
+    Classifies unverified contracts from their runtime bytecode (the implementation's, for proxies).
+    Returns {address: type} for the addresses whose bytecode matched a known interface or has no code.
+    """
+    targets = [implementations.get(address.lower(), address) for address in addresses]
+    async with JSONRPCClient(rpc_url) as rpc:
+        with CodeClassCache() as cache:
+            types = await classify_addresses(rpc, targets, cache)
+    return {address: contract_type for address, contract_type in zip(addresses, types)
+            if contract_type not in (None, "Other Contract")}
+
+
 def main():
-    if not API_KEY:
-        print("Error: ETHERSCAN_API_KEY environment variable not set.")
-        return
+    parser = argparse.ArgumentParser(description="Label contracts and detect ERC20 tokens via the Etherscan API.")
+    parser.add_argument('--rps', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                        help="Requests per second allowed per key by your Etherscan plan.")
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help=f"Maximum number of requests in flight (default: {DEFAULT_MAX_CONCURRENCY} per key).")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="Path of the getsourcecode cache.")
+    parser.add_argument('--no-cache', action='store_true', help="Always query Etherscan.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip addresses already recorded in the journal of an interrupted run.")
+    parser.add_argument('--force', action='store_true',
+                        help="Discard the journal of an interrupted run and start over.")
+    parser.add_argument('--rpc-url', default=ETHEREUM_RPC_URL,
+                        help="JSON-RPC endpoint used to resolve proxies and classify unverified contracts from bytecode.")
+    parser.add_argument('--limit', type=int, default=None, help="Only process the first N rows.")
+    args = parser.parse_args()
+
+    if not API_KEYS:
+        print("Error: ETHERSCAN_API_KEY (or ETHERSCAN_API_KEYS) environment variable not set.")
+        sys.exit(1)
     try:
-        df = pd.read_csv(INPUT_CSV)
+        df = read_table(INPUT_TABLE)
     except FileNotFoundError:
-        print(f"Error: The input file '{INPUT_CSV}' was not found.")
-        return
-
-    labels = []
-    contract_types = []
-    total = len(df)
-    print(f"Found {total} addresses to process. Starting...")
-    has_destination_contract = 'destination_contract' in df.columns
-
-    for index, row in df.iterrows():
-        if index >= MAX_ROWS_TO_PROCESS:
-            print(f"Reached the maximum number of rows to process: {MAX_ROWS_TO_PROCESS}")
-            break
-
-        address = row['address']
-        if has_destination_contract:
-            address = row['destination_contract']
-        print(f"({index + 1}/{total}) Processing: {address}")
-        
-        # This function now handles the proxy logic internally
-        info = get_contract_info(address)
-        
-        labels.append(info['label'])
-        contract_types.append(info['type'])
-        
-        print(f"  -> Label: {info['label']}, Type: {info['type']}")
-        
-        time.sleep(0.25) # Main rate-limiting delay for Etherscan Free API
-        processed_df = df.iloc[:len(labels)].copy()
-        processed_df['label'] = labels
-        processed_df['contract_type'] = contract_types
-        processed_df.to_csv(OUTPUT_CSV, index=False)
+        print(f"Error: The input table '{INPUT_TABLE}' was not found.")
+        sys.exit(1)
+
+    address_column = 'destination_contract' if 'destination_contract' in df.columns else 'address'
+    if args.limit is not None:
+        df = df.iloc[:args.limit].copy()
+
+    # Rows marked by custom_label.py's pre-filter are dropped from the report, so they are never looked up
+    reasons = df[FILTER_COLUMN].astype(object) if FILTER_COLUMN in df.columns else pd.Series(None, index=df.index, dtype=object)
+    filtered = {address: reason for address, reason in zip(df[address_column], reasons) if pd.notna(reason)}
+    safe_contracts = load_safe_infrastructure()
+
+    try:
+        journal = ResultJournal(JOURNAL_PATH, resume=args.resume, overwrite=args.force)
+    except FileExistsError as e:
+        print(f"Error: {e} Re-run with --resume to continue it, or --force to discard it.")
+        sys.exit(1)
+
+    with journal:
+        addresses = [address for address in dict.fromkeys(df[address_column]) if address not in filtered]
+        pending = [address for address in addresses if address not in journal.results]
+        print(f"Found {len(df)} addresses, {len(filtered)} pre-filtered, {len(pending)} still to process. Starting...")
+
+        implementations, groups = {}, None
+        if args.rpc_url:
+            try:
+                implementations, groups, eoas = asyncio.run(inspect_onchain(args.rpc_url, addresses, pending))
+                for address in eoas:
+                    journal.record(address, filtered_info(EOA))
+                pending = [address for address in pending if address not in eoas]
+                print(f"Skipped {len(eoas)} EOAs; resolved {len(implementations)} proxies on-chain; "
+                      f"{len(pending)} addresses share {len(groups)} distinct contracts.")
+            except RPCError as e:
+                print(f"  -> On-chain proxy resolution skipped: {e}")
+
+        if args.no_cache:
+            asyncio.run(process_addresses(pending, args.rps, args.concurrency, journal, None, implementations, groups))
+        else:
+            with SourceCodeCache(args.cache) as cache:
+                asyncio.run(process_addresses(pending, args.rps, args.concurrency, journal, cache, implementations, groups))
+        results = journal.results
+
+    unverified = [address for address, info in results.items() if info['type'] in UNVERIFIED_TYPES]
+    if unverified and args.rpc_url:
+        print(f"Classifying {len(unverified)} unverified contracts from bytecode...")
+        try:
+            classified = asyncio.run(classify_unverified(args.rpc_url, unverified, implementations))
+            for address, contract_type in classified.items():
+                results[address] = {**results[address], "type": contract_type}
+        except RPCError as e:
+            print(f"  -> Bytecode classification skipped: {e}")
+
+    for address, reason in filtered.items():
+        results[address] = filtered_info(reason)
+        if reason == SAFE_INFRASTRUCTURE:
+            results[address]['label'] = safe_contracts.get(address.lower()) or "N/A"
+
+    # Compact the journal into the output table
+    df['label'] = [results[address]['label'] for address in df[address_column]]
+    df['contract_type'] = [results[address]['type'] for address in df[address_column]]
+    df[FILTER_COLUMN] = reasons.where(reasons.notna(), pd.Series(EOA, index=df.index).where(df['contract_type'] == "EOA"))
+    print(f"Pre-filtered rows: {filter_counts(df[FILTER_COLUMN]) or 'none'}.")
+    write_table(df, OUTPUT_TABLE)
+    os.remove(JOURNAL_PATH)
     
-    print(f"\nProcessing complete! Data saved to '{OUTPUT_CSV}'.")
+    print(f"\nProcessing complete! Data saved to '{OUTPUT_TABLE}.parquet'.")
+    print(report())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,75 @@
+import json
+import time
+import sqlite3
+
+# --- Cache policy ---
+# Verified source/ABI never changes, so verified responses are kept forever. Unverified
+# contracts can be verified later and error responses are usually transient, so those expire.
+DEFAULT_CACHE_PATH = '../data/etherscan_cache.sqlite'
+UNVERIFIED_TTL_SECONDS = 7 * 24 * 3600
+ERROR_TTL_SECONDS = 3600
+UNVERIFIED_ABI = 'Contract source code not verified'
+
+
+def response_ttl(data: dict):
+    """Returns how long a getsourcecode response stays valid in seconds (None = forever)."""
+    if data.get('status') != '1':
+        return ERROR_TTL_SECONDS
+    try:
+        abi = data['result'][0].get('ABI')
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return ERROR_TTL_SECONDS
+    if not abi or abi == UNVERIFIED_ABI:
+        return UNVERIFIED_TTL_SECONDS
+    return None
+
+
+class SourceCodeCache:
+    """
+    Persistent SQLite cache of raw Etherscan `getsourcecode` responses keyed by lowercase address.
+    Proxy implementations are cached under their own address, so an implementation shared by
+    many proxies is fetched once across all runs.
+    """
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS source_code ("
+            "address TEXT PRIMARY KEY, response TEXT NOT NULL, fetched_at REAL NOT NULL, expires_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, address: str):
+        """Returns the cached response for `address`, or None if it is missing or expired."""
+        row = self._conn.execute(
+            "SELECT response, expires_at FROM source_code WHERE address = ?", (address.lower(),)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return json.loads(row[0])
+
+    def put(self, address: str, data: dict):
+        now = time.time()
+        ttl = response_ttl(data)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO source_code (address, response, fetched_at, expires_at) VALUES (?, ?, ?, ?)",
+            (address.lower(), json.dumps(data), now, None if ttl is None else now + ttl)
+        )
+        self._conn.commit()
+
+    def purge_expired(self) -> int:
+        cursor = self._conn.execute(
+            "DELETE FROM source_code WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+        )
+        self._conn.commit()
+        return cursor.rowcount
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
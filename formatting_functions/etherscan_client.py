@@ -0,0 +1,205 @@
+import os
+import sys
+import asyncio
+import random
+import time
+import datetime
+import aiohttp
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.ratelimit import get_controller  # noqa: E402
+
+# --- Defaults (Etherscan free plan: 5 calls/second) ---
+DEFAULT_REQUESTS_PER_SECOND = 5
+DEFAULT_MAX_CONCURRENCY = 8           # per key
+DEFAULT_DAILY_QUOTA = 100_000         # calls per key per day (free plan)
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 1.0
+RATE_LIMIT_MESSAGES = ("max rate limit reached", "rate limit")
+DAILY_LIMIT_MESSAGES = ("daily rate limit", "daily limit")
+INVALID_KEY_MESSAGES = ("invalid api key", "missing/invalid api key")
+
+
+class RetriesExhaustedError(Exception):
+    """Raised when a request is still rate limited or failing after all retries."""
+
+
+class ApiKey:
+    """One Etherscan key: its own rate controller, its daily call count and whether it is usable."""
+    def __init__(self, index: int, value: str, requests_per_second: float, daily_quota: int):
+        self.value = value
+        self.rate_controller = get_controller(f'etherscan[{index}]', requests_per_second)
+        self.daily_quota = daily_quota
+        self.calls_today = 0
+        self.day = datetime.date.today()
+        self.disabled_until = None   # datetime.date, or date.max for a permanently invalid key
+
+    def usable(self) -> bool:
+        today = datetime.date.today()
+        if today != self.day:
+            self.day, self.calls_today = today, 0
+        if self.disabled_until is not None and today < self.disabled_until:
+            return False
+        return self.calls_today < self.daily_quota
+
+
+class KeyPool:
+    """
+    Spreads requests over several API keys. Each request takes the usable key that can send
+    soonest, so throughput grows with the number of keys. A key is rested by its own rate
+    controller after a rate-limit response, dropped until tomorrow once its daily quota is
+    used up, and dropped for good on an invalid-key response.
+    """
+    def __init__(self, keys: list, requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+                 daily_quota: int = DEFAULT_DAILY_QUOTA):
+        self.keys = [ApiKey(i, key, requests_per_second, daily_quota) for i, key in enumerate(keys)]
+
+    async def acquire(self) -> ApiKey:
+        while True:
+            usable = [key for key in self.keys if key.usable()]
+            if not usable:
+                raise RetriesExhaustedError("No usable Etherscan API keys (invalid or out of daily quota).")
+            key = min(usable, key=lambda k: k.rate_controller.available_in())
+            wait_time = key.rate_controller.try_acquire()
+            if wait_time == 0:
+                key.calls_today += 1
+                return key
+            # Sleep until the soonest key frees up, then pick again
+            key.rate_controller.record_wait(wait_time)
+            await asyncio.sleep(wait_time)
+
+    def disable(self, key: ApiKey, until: datetime.date):
+        if key.disabled_until == until:
+            return  # other requests in flight on this key already reported it
+        key.disabled_until = until
+        print(f"  -> Etherscan key #{self.keys.index(key)} removed from rotation until {until}.")
+
+
+class AsyncEtherscanClient:
+    """
+    Etherscan API client over one pooled keep-alive aiohttp session.
+    Requests are spread over a KeyPool of `api_keys`, each with a rate budget of
+    `requests_per_second`; at most `max_concurrency` are in flight. HTTP 429 /
+    "Max rate limit reached" responses slow the key's controller down and are retried with
+    exponential backoff (honouring Retry-After when present).
+
+    Usage:
+        async with AsyncEtherscanClient([api_key, ...]) as client:
+            data = await client.get_source_code(address)
+    """
+    def __init__(self, api_keys: list, api_url: str = 'https://api.etherscan.io/api',
+                 requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+                 max_concurrency: int = None, cache=None, daily_quota: int = DEFAULT_DAILY_QUOTA):
+        self.key_pool = KeyPool([api_keys] if isinstance(api_keys, str) else api_keys,
+                                requests_per_second, daily_quota)
+        self.api_url = api_url
+        self.max_concurrency = max_concurrency or DEFAULT_MAX_CONCURRENCY * len(self.key_pool.keys)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._session = None
+        self.cache = cache          # optional SourceCodeCache
+        self._in_flight = {}        # address -> Future, so concurrent lookups share one request
+        self.cache_hits = 0
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    async def request(self, params: dict) -> dict:
+        """Sends one API call and returns the decoded JSON body, retrying rate-limited responses."""
+        attempt = 0
+        while attempt <= MAX_RETRIES:
+            async with self._semaphore:
+                key = await self.key_pool.acquire()
+                started = time.monotonic()
+                status, retry_after = None, None
+                try:
+                    async with self._session.get(self.api_url, params={**params, 'apikey': key.value}) as response:
+                        status = response.status
+                        retry_after = _retry_after_seconds(response.headers.get('Retry-After'))
+                        if response.status == 429 or response.status >= 500:
+                            data = None
+                        else:
+                            response.raise_for_status()
+                            data = await response.json(content_type=None)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                    # Connection errors, and HTML or empty error pages (ValueError) instead of
+                    # JSON, are retried with backoff like a 5xx
+                    data = None
+                latency = time.monotonic() - started
+
+            # Key problems are not the request's fault: switch keys without using up a retry
+            if data is not None and _result_matches(data, INVALID_KEY_MESSAGES):
+                self.key_pool.disable(key, datetime.date.max)
+                continue
+            if data is not None and _result_matches(data, DAILY_LIMIT_MESSAGES):
+                self.key_pool.disable(key, datetime.date.today() + datetime.timedelta(days=1))
+                continue
+
+            throttled = status == 429 or (data is not None and _result_matches(data, RATE_LIMIT_MESSAGES))
+            if data is not None and not throttled:
+                key.rate_controller.on_success(latency, started)
+                return data
+            if attempt == MAX_RETRIES:
+                break
+            if throttled:
+                # The key's controller slows down and pauses its callers for Retry-After, so the
+                # retry simply queues behind it or moves to another key
+                key.rate_controller.on_throttle(retry_after, started)
+            else:
+                await asyncio.sleep(_backoff_seconds(attempt))
+            attempt += 1
+
+        raise RetriesExhaustedError(f"Still rate limited or failing after {MAX_RETRIES} retries: {params.get('address')}")
+
+    async def get_source_code(self, address: str) -> dict:
+        """
+        Returns the `getsourcecode` response for `address`, served from the cache when possible.
+        Concurrent lookups of the same address (e.g. one implementation behind many proxies)
+        wait on a single request.
+        """
+        key = address.lower()
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+
+        if key in self._in_flight:
+            return await asyncio.shield(self._in_flight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            data = await self.request({'module': 'contract', 'action': 'getsourcecode', 'address': address})
+            if self.cache is not None:
+                self.cache.put(key, data)
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved so an unshared failure is not logged
+            raise
+        finally:
+            del self._in_flight[key]
+
+
+def _result_matches(data: dict, messages: tuple) -> bool:
+    if data.get('status') != '0':
+        return False
+    result = str(data.get('result', '')).lower()
+    return any(message in result for message in messages)
+
+
+def _retry_after_seconds(retry_after: str):
+    try:
+        return float(retry_after) if retry_after else None
+    except ValueError:
+        return None
+
+
+def _backoff_seconds(attempt: int) -> float:
+    return BASE_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random())
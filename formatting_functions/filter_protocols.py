@@ -1,33 +1,41 @@
-import pandas as pd
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.tables import read_table, write_table  # noqa: E402
+from prefilter import FILTER_COLUMN, filter_counts  # noqa: E402
 
 def filter_erc20_tokens():
     """
-    Reads the final data CSV, filters out ERC20 tokens,
-    and saves the result to a new CSV file.
+    Reads the final data table, filters out ERC20 tokens,
+    and saves the result to a new table plus a CSV export for humans.
     """
-    # Define file paths
-    input_csv_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'final_combined_3.csv')
-    output_csv_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'final_combined_4.csv')
+    # Define table paths (without extension)
+    input_table = os.path.join(os.path.dirname(__file__), '..', 'data', 'final_combined_3')
+    output_table = os.path.join(os.path.dirname(__file__), '..', 'data', 'final_combined_4')
 
-    # Read the CSV file into a pandas DataFrame
+    # Read the table into a pandas DataFrame
     try:
-        df = pd.read_csv(input_csv_path)
-        print(f"Successfully loaded {input_csv_path}. Shape: {df.shape}")
+        df = read_table(input_table)
+        print(f"Successfully loaded {input_table}. Shape: {df.shape}")
     except FileNotFoundError:
-        print(f"Error: The file {input_csv_path} was not found.")
-        return
+        print(f"Error: The table {input_table} was not found.")
+        sys.exit(1)
 
-    # Filter out rows where 'contract_type' is 'ERC20 Token'
+    # Filter out rows where 'contract_type' is 'ERC20 Token', and rows pre-filtered by earlier stages
     initial_rows = len(df)
-    filtered_df = df[df['contract_type'] != 'ERC20 Token'].copy()
+    keep = df['contract_type'] != 'ERC20 Token'
+    if FILTER_COLUMN in df.columns:
+        print(f"Dropping pre-filtered rows: {filter_counts(df[FILTER_COLUMN]) or 'none'}.")
+        keep &= df[FILTER_COLUMN].isna()
+    filtered_df = df[keep].drop(columns=FILTER_COLUMN, errors='ignore')
     final_rows = len(filtered_df)
 
-    print(f"Removed {initial_rows - final_rows} rows corresponding to ERC20 tokens.")
+    print(f"Removed {initial_rows - final_rows} rows corresponding to ERC20 tokens and other non-protocol addresses.")
 
-    # Save the filtered DataFrame to a new CSV file
-    filtered_df.to_csv(output_csv_path, index=False)
-    print(f"Filtered data saved to {output_csv_path}. New shape: {filtered_df.shape}")
+    # Save the filtered DataFrame as a typed table and export the final report as CSV
+    output_path = write_table(filtered_df, output_table, export_csv=True)
+    print(f"Filtered data saved to {output_path} and {output_table}.csv. New shape: {filtered_df.shape}")
 
 if __name__ == "__main__":
     filter_erc20_tokens()
@@ -1,101 +1,73 @@
 import pandas as pd
 import os
+import sys
 import time
-import threading
+import asyncio
+import argparse
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor
 from web3 import Web3
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.addresses import checksum_address, parse_address  # noqa: E402
+from common.tables import read_table, write_table  # noqa: E402
+from common.ratelimit import RateController, get_controller, report  # noqa: E402
+from rpc import JSONRPCClient, RPCError  # noqa: E402
+from multicall import fetch_token_metadata, DEFAULT_CALLS_PER_MULTICALL  # noqa: E402
+from token_metadata import TokenCache, resolve_token_metadata, source_counts, DEFAULT_CACHE_PATH  # noqa: E402
+
 load_dotenv()
 
 # ---  CONFIGURATION  ---
-INPUT_CSV = '../data/final_combined_2.csv'
-OUTPUT_CSV = '../data/final_combined_3.csv'
+INPUT_TABLE = '../data/final_combined_2'
+OUTPUT_TABLE = '../data/final_combined_3'
 ETHEREUM_RPC_URL = os.getenv('ETHEREUM_RPC_URL')
 
 # --- OPTIMIZATION SETTINGS ---
 # Number of concurrent threads to use. Start with 10 and increase if stable.
 MAX_WORKERS = 10
-# Maximum requests per second to avoid hitting API rate limits.
-# Infura's free tier can handle more, but 10 is a safe starting point.
-REQUESTS_PER_SECOND = 10
+# Requests draw from the shared 'rpc' rate controller (common/ratelimit.py), so the web3 path
+# and the batched path share one budget; set RATE_LIMIT_RPC to match your provider's plan.
 
 # A minimal description of the 'symbol()' function for web3.py
 MINIMAL_ERC20_ABI = [{"constant":True,"inputs":[],"name":"symbol","outputs":[{"name":"","type":"string"}],"payable":False,"stateMutability":"view","type":"function"}]
 
 
-class RateLimiter:
-    """A simple token bucket rate limiter to control request frequency."""
-    def __init__(self, requests_per_second: int):
-        self.requests_per_second = requests_per_second
-        self._lock = threading.Lock()
-        self._tokens = requests_per_second
-        self._last_refill_time = time.monotonic()
-
-    def wait(self):
-        with self._lock:
-            now = time.monotonic()
-            time_since_refill = now - self._last_refill_time
-            
-            # Refill tokens based on elapsed time
-            new_tokens = time_since_refill * self.requests_per_second
-            if new_tokens > 0:
-                self._tokens = min(self._tokens + new_tokens, self.requests_per_second)
-                self._last_refill_time = now
-
-            if self._tokens >= 1:
-                self._tokens -= 1
-            else:
-                # Wait until a new token is available
-                time.sleep(1 / self.requests_per_second)
-
-
-def get_token_symbol(w3: Web3, contract_address: str, rate_limiter: RateLimiter) -> str:
+def get_token_symbol(w3: Web3, contract_address: str, rate_controller: RateController) -> str:
     """
     Calls the symbol() function of an ERC20 contract, with rate limiting.
     """
     try:
-        rate_limiter.wait() # Wait for our turn to make a request
-        checksum_address = Web3.to_checksum_address(contract_address)
-        contract = w3.eth.contract(address=checksum_address, abi=MINIMAL_ERC20_ABI)
+        rate_controller.acquire() # Wait for our turn to make a request
+        started = time.monotonic()
+        contract = w3.eth.contract(address=checksum_address(parse_address(contract_address)), abi=MINIMAL_ERC20_ABI)
         symbol = contract.functions.symbol().call()
+        rate_controller.on_success(time.monotonic() - started, started)
         return symbol
     except Exception:
         return "Symbol not found"
 
 def process_row(args):
     """Worker function for each thread to process a single row of the DataFrame."""
-    index, row, w3, rate_limiter = args
+    index, row, address_column, w3, rate_controller = args
     symbol = 'N/A'
     if row['contract_type'] == 'ERC20 Token':
-        symbol = get_token_symbol(w3, row['destination_contract'], rate_limiter)
+        symbol = get_token_symbol(w3, row[address_column], rate_controller)
     return index, symbol
 
 
-def main():
-    """
-    Main function to read a CSV, fetch token symbols concurrently, and save a new CSV.
-    """
-    if not ETHEREUM_RPC_URL:
-        print("Error: ETHEREUM_RPC_URL environment variable is not set.")
-        return
-
-    try:
-        df = pd.read_csv(INPUT_CSV)
-        print(f"Successfully read '{INPUT_CSV}' with {len(df)} rows.")
-    except FileNotFoundError:
-        print(f"Error: The input file '{INPUT_CSV}' was not found.")
-        return
-
+def fetch_symbols_web3(df, address_column: str):
+    """The original one-eth_call-per-token path through a web3.py thread pool."""
     w3 = Web3(Web3.HTTPProvider(ETHEREUM_RPC_URL))
     if not w3.is_connected():
         print(f"Error: Could not connect to Ethereum node at {ETHEREUM_RPC_URL}")
-        return
+        return None
     print(f"Successfully connected to Ethereum node. Starting concurrent processing with {MAX_WORKERS} workers.")
     
-    rate_limiter = RateLimiter(REQUESTS_PER_SECOND)
-    tasks = [(index, row, w3, rate_limiter) for index, row in df.iterrows()]
+    rate_controller = get_controller('rpc')
+    tasks = [(index, row, address_column, w3, rate_controller) for index, row in df.iterrows()]
     
     # Pre-fill the results list with placeholders
     results = [''] * len(df)
@@ -106,14 +78,110 @@ def main():
         for index, symbol in tqdm(future_results, total=len(tasks), desc="Fetching Symbols"):
             # Place the result in the correct position
             results[index] = symbol
-            
-    # Add the results as a new column
-    df['token_symbol'] = results
+    return {'token_symbol': results}
+
+
+async def _fetch_metadata(addresses: list, fields: tuple, use_multicall: bool, calls_per_multicall: int):
+    async with JSONRPCClient(ETHEREUM_RPC_URL) as rpc:
+        return await fetch_token_metadata(rpc, addresses, fields, use_multicall, calls_per_multicall)
+
+
+def fetch_symbols_batched(df, address_column: str, fields: tuple, use_multicall: bool, calls_per_multicall: int, cache_path: str = None):
+    """
+    Resolves `fields` for every ERC20 row from eth_labels/tokens.csv, then the token cache,
+    and reads only the misses over RPC, either through Multicall3 aggregate3 or as JSON-RPC
+    batches of eth_call. Returns the new columns (token_<field> and token_symbol_source),
+    or None if the RPC failed.
+    """
+    is_token = (df['contract_type'] == 'ERC20 Token').to_numpy()
+    tokens = list(dict.fromkeys(df.loc[is_token, address_column]))
+    mode = "Multicall3" if use_multicall else "JSON-RPC batches"
+
+    def fetch_remote(misses: list, fields: tuple):
+        if not ETHEREUM_RPC_URL:
+            return [{} for _ in misses], [(address, 'symbol', "no RPC URL") for address in misses]
+        print(f"Fetching {', '.join(fields)} for {len(misses)} of {len(tokens)} tokens via {mode}...")
+        return asyncio.run(_fetch_metadata(misses, fields, use_multicall, calls_per_multicall))
+
+    try:
+        if cache_path:
+            with TokenCache(cache_path) as cache:
+                by_address, sources, errors = resolve_token_metadata(tokens, fields, fetch_remote, cache)
+        else:
+            by_address, sources, errors = resolve_token_metadata(tokens, fields, fetch_remote)
+    except RPCError as e:
+        print(f"Error: {e}")
+        return None
+    print("Symbol sources: " + ", ".join(f"{count} {source}" for source, count in source_counts(sources).items()))
+
+    if errors:
+        print(f"{len(errors)} calls failed: " +
+              ", ".join(f"{count} {reason}" for reason, count in Counter(reason for _, _, reason in errors).most_common()))
+        for address, field, reason in errors[:10]:
+            print(f"  -> {field}() failed for {address}: {reason}")
+
+    columns = {}
+    for field in fields:
+        missing = "Symbol not found" if field == 'symbol' else None
+        columns[f'token_{field}'] = [
+            (by_address[address][field] if by_address[address][field] is not None else missing) if token else
+            ('N/A' if field == 'symbol' else None)
+            for address, token in zip(df[address_column], is_token)
+        ]
+    columns['token_symbol_source'] = [sources[address] if token else None
+                                      for address, token in zip(df[address_column], is_token)]
+    return columns
+
+
+def main():
+    """
+    Main function to read a CSV, fetch token symbols concurrently, and save a new CSV.
+    """
+    parser = argparse.ArgumentParser(description="Fetch ERC20 token symbols over JSON-RPC.")
+    parser.add_argument('--mode', choices=['multicall', 'batch', 'web3'], default='multicall',
+                        help="multicall: Multicall3 aggregate3; batch: JSON-RPC batch of eth_calls; "
+                             "web3: one eth_call per token (original behaviour).")
+    parser.add_argument('--fields', default='symbol',
+                        help="Comma-separated getters to read in multicall/batch mode: symbol,name,decimals.")
+    parser.add_argument('--calls-per-multicall', type=int, default=DEFAULT_CALLS_PER_MULTICALL)
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="Path of the persistent token metadata cache.")
+    parser.add_argument('--no-cache', action='store_true', help="Do not read or write the token metadata cache.")
+    args = parser.parse_args()
+    fields = tuple(field.strip() for field in args.fields.split(','))
+    if 'symbol' not in fields or not set(fields) <= {'symbol', 'name', 'decimals'}:
+        parser.error("--fields must include 'symbol' and only contain symbol, name and decimals.")
+
+    if not ETHEREUM_RPC_URL:
+        if args.mode == 'web3':
+            print("Error: ETHEREUM_RPC_URL environment variable is not set.")
+            sys.exit(1)
+        print("Warning: ETHEREUM_RPC_URL is not set; only local and cached symbols will be used.")
+
+    try:
+        df = read_table(INPUT_TABLE)
+        print(f"Successfully read '{INPUT_TABLE}' with {len(df)} rows.")
+    except FileNotFoundError:
+        print(f"Error: The input table '{INPUT_TABLE}' was not found.")
+        sys.exit(1)
+
+    address_column = 'destination_contract' if 'destination_contract' in df.columns else 'address'
+    if args.mode == 'web3':
+        columns = fetch_symbols_web3(df, address_column)
+    else:
+        columns = fetch_symbols_batched(df, address_column, fields, args.mode == 'multicall', args.calls_per_multicall,
+                                        None if args.no_cache else args.cache)
+    if columns is None:
+        sys.exit(1)
+
+    # Add the results as new columns
+    for name, values in columns.items():
+        df[name] = values
     print("\nSymbol fetching complete.")
 
-    # Save the final results to a new file
-    df.to_csv(OUTPUT_CSV, index=False)
-    print(f"Successfully saved final data to '{OUTPUT_CSV}'.")
+    # Save the final results to a new typed table
+    output_path = write_table(df, OUTPUT_TABLE)
+    print(f"Successfully saved final data to '{output_path}'.")
+    print(report())
 
 
 if __name__ == "__main__":
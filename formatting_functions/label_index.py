@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import mmap
+import hashlib
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.addresses import ADDRESS_DTYPE, address_keys  # noqa: E402
+
+# --- Prebuilt eth_labels index ---
+# The label CSVs are compiled once into a sorted binary file that is memory-mapped at lookup
+# time. Layout: MAGIC, a uint32 header length, a JSON header, then 64-byte aligned sections:
+#   keys     n x 20-byte addresses, sorted
+#   label    n x uint32 index into the string table
+#   source   n x uint8 index into SOURCES
+#   offsets  (strings + 1) x uint64 byte offsets into the blob
+#   blob     UTF-8 label strings
+# The header stores a hash of the source CSVs, so the index is rebuilt only when they change.
+ACCOUNTS_LABELS_PATH = '../eth_labels/accounts.csv'
+TOKENS_LABELS_PATH = '../eth_labels/tokens.csv'
+DEFAULT_INDEX_PATH = '../data/eth_labels.idx'
+MAGIC = b'ETHLBLX1'
+ALIGNMENT = 64
+# In priority order: an account label wins over a token label for the same address
+SOURCES = ['eth_labels/accounts', 'eth_labels/tokens']
+
+
+def source_fingerprint(paths: list) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _first_labels(path: str) -> pd.DataFrame:
+    """First row per address (like drop_duplicates(keep='first')), as 20-byte keys and labels."""
+    df = pd.read_csv(path, usecols=['address', 'label'])
+    keys = address_keys(df['address'])
+    unique_keys, first_index = np.unique(keys, return_index=True)
+    return pd.DataFrame({'key': unique_keys, 'label': df['label'].to_numpy(dtype=object)[first_index]})
+
+
+def build_index(source_paths: list = None, index_path: str = DEFAULT_INDEX_PATH) -> str:
+    """
+    Compiles the label CSVs (in priority order) into the binary index at `index_path`.
+    For each address, the first label in the highest-priority file that has a label wins.
+    """
+    source_paths = source_paths or [ACCOUNTS_LABELS_PATH, TOKENS_LABELS_PATH]
+    frames = []
+    for source_id, path in enumerate(source_paths):
+        labels = _first_labels(path)
+        labels['source'] = source_id
+        frames.append(labels[labels['label'].notna()])
+    merged = pd.concat(frames, ignore_index=True)
+    # Stable sort by key keeps the priority order within each address
+    merged = merged.iloc[np.argsort(merged['key'].to_numpy(dtype=ADDRESS_DTYPE), kind='stable')]
+    merged = merged[~merged['key'].duplicated(keep='first')]
+
+    strings, label_ids = np.unique(merged['label'].astype(str).to_numpy(), return_inverse=True)
+    encoded = [text.encode('utf-8') for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(text) for text in encoded])
+    sections = {
+        'keys': np.ascontiguousarray(merged['key'].to_numpy(dtype=ADDRESS_DTYPE)).tobytes(),
+        'label': label_ids.astype(np.uint32).tobytes(),
+        'source': merged['source'].to_numpy(dtype=np.uint8).tobytes(),
+        'offsets': offsets.tobytes(),
+        'blob': b''.join(encoded),
+    }
+
+    header = {'count': len(merged), 'strings': len(encoded), 'sources': SOURCES[:len(source_paths)],
+              'fingerprint': source_fingerprint(source_paths), 'sections': {}}
+    # Section offsets depend on the header size, so lay out with a fixed-size header slot
+    header_slot = 1024
+    position = _align(len(MAGIC) + 4 + header_slot)
+    for name, data in sections.items():
+        header['sections'][name] = [position, len(data)]
+        position = _align(position + len(data))
+    header_bytes = json.dumps(header).encode().ljust(header_slot)
+
+    tmp_path = index_path + '.tmp'
+    os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + len(header_bytes).to_bytes(4, 'little') + header_bytes)
+        for name, data in sections.items():
+            f.seek(header['sections'][name][0])
+            f.write(data)
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def _align(position: int) -> int:
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+class LabelIndex:
+    """Read-only, memory-mapped view of an index from `build_index`."""
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH):
+        with open(index_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{index_path} is not an eth_labels index")
+        header_length = int.from_bytes(self._mmap[len(MAGIC):len(MAGIC) + 4], 'little')
+        self.header = json.loads(self._mmap[len(MAGIC) + 4:len(MAGIC) + 4 + header_length])
+        self.sources = self.header['sources']
+        count = self.header['count']
+        self.keys = self._section('keys', ADDRESS_DTYPE, count)
+        self._label_ids = self._section('label', np.uint32, count)
+        self._source_ids = self._section('source', np.uint8, count)
+        self._offsets = self._section('offsets', np.uint64, self.header['strings'] + 1)
+        start, _ = self.header['sections']['blob']
+        self._blob_start = start
+
+    def _section(self, name: str, dtype, count: int) -> np.ndarray:
+        start, _ = self.header['sections'][name]
+        return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=start)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _string(self, string_id: int) -> str:
+        start, end = self._offsets[string_id], self._offsets[string_id + 1]
+        return self._mmap[self._blob_start + int(start):self._blob_start + int(end)].decode('utf-8')
+
+    def lookup(self, keys: np.ndarray) -> (np.ndarray, np.ndarray): # type: ignore
+        """
+        Vectorized binary search of 20-byte `keys`. Returns (labels, sources) as object
+        arrays with None where an address has no label.
+        """
+        labels = np.full(len(keys), None, dtype=object)
+        sources = np.full(len(keys), None, dtype=object)
+        if len(self.keys) == 0 or len(keys) == 0:
+            return labels, sources
+        positions = np.searchsorted(self.keys, keys).clip(max=len(self.keys) - 1)
+        found = np.flatnonzero(self.keys[positions] == keys)
+        strings = {}
+        for i, position in zip(found, positions[found]):
+            string_id = int(self._label_ids[position])
+            if string_id not in strings:
+                strings[string_id] = self._string(string_id)
+            labels[i] = strings[string_id]
+            sources[i] = self.sources[self._source_ids[position]]
+        return labels, sources
+
+    def close(self):
+        # The arrays are views into the mapping; release them before unmapping
+        self.keys = self._label_ids = self._source_ids = self._offsets = None
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def is_index_current(index_path: str, source_paths: list) -> bool:
+    if not os.path.exists(index_path):
+        return False
+    try:
+        with LabelIndex(index_path) as index:
+            return index.header['fingerprint'] == source_fingerprint(source_paths)
+    except (ValueError, KeyError, json.JSONDecodeError):
+        return False
+
+
+def ensure_index(source_paths: list = None, index_path: str = DEFAULT_INDEX_PATH) -> str:
+    """Builds the index unless an up-to-date one already exists. Returns its path."""
+    source_paths = source_paths or [ACCOUNTS_LABELS_PATH, TOKENS_LABELS_PATH]
+    if not is_index_current(index_path, source_paths):
+        print(f"Building eth_labels index at '{index_path}'...")
+        build_index(source_paths, index_path)
+    return index_path
+
+
+if __name__ == "__main__":
+    # Usage: python label_index.py [index_path]
+    path = ensure_index(index_path=sys.argv[1] if len(sys.argv) > 1 else DEFAULT_INDEX_PATH)
+    with LabelIndex(path) as label_index:
+        print(f"eth_labels index '{path}' has {len(label_index)} labelled addresses.")
@@ -0,0 +1,120 @@
+from eth_abi import decode, encode
+from eth_abi.exceptions import DecodingError
+
+# --- Batched token metadata reads ---
+# Token getters are read either through Multicall3's aggregate3 (hundreds of calls in one
+# eth_call) or as one eth_call per getter packed into JSON-RPC batch requests.
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+AGGREGATE3_SELECTOR = bytes.fromhex('82ad56cb')  # aggregate3((address,bool,bytes)[])
+DEFAULT_CALLS_PER_MULTICALL = 500
+
+# Getter name -> calldata
+GETTER_CALLDATA = {
+    'symbol': bytes.fromhex('95d89b41'),
+    'name': bytes.fromhex('06fdde03'),
+    'decimals': bytes.fromhex('313ce567'),
+}
+
+
+class CallFailed(Exception):
+    """A single getter call that reverted or returned data that could not be decoded."""
+
+
+def decode_text(data: bytes) -> str:
+    """
+    Decodes a `string` return value, or a `bytes32` one as used by older tokens such as MKR.
+    A 32-byte return cannot be a valid ABI string, so it is read as bytes32.
+    """
+    if not data:
+        raise CallFailed("empty return data")
+    if len(data) == 32:
+        text = data.rstrip(b'\x00').decode('utf-8', errors='replace')
+    else:
+        try:
+            text = decode(['string'], data)[0]
+        except (DecodingError, UnicodeDecodeError, OverflowError) as e:
+            raise CallFailed(f"undecodable string: {e}") from e
+    text = text.replace('\x00', '').strip()
+    if not text:
+        raise CallFailed("empty string")
+    return text
+
+
+def decode_decimals(data: bytes) -> int:
+    if len(data) < 32:
+        raise CallFailed("empty return data" if not data else f"short return data ({len(data)} bytes)")
+    value = int.from_bytes(data[:32], 'big')
+    if value > 255:
+        raise CallFailed("decimals out of uint8 range")
+    return value
+
+
+DECODERS = {'symbol': decode_text, 'name': decode_text, 'decimals': decode_decimals}
+
+
+def _decode_result(field: str, success: bool, data: bytes):
+    """Returns (value, error); exactly one of them is None."""
+    if not success:
+        return None, "reverted"
+    try:
+        return DECODERS[field](data), None
+    except CallFailed as e:
+        return None, str(e)
+
+
+def encode_aggregate3(calls: list) -> str:
+    """Encodes aggregate3 calldata for (target, calldata) pairs, each allowed to fail."""
+    return '0x' + (AGGREGATE3_SELECTOR + encode(['(address,bool,bytes)[]'],
+                                                [[(target.lower(), True, calldata) for target, calldata in calls]])).hex()
+
+
+def decode_aggregate3(result: str) -> list:
+    """Decodes aggregate3's (bool success, bytes returnData)[] result."""
+    return decode(['(bool,bytes)[]'], bytes.fromhex(result[2:]))[0]
+
+
+async def _fetch_multicall(rpc, calls: list, calls_per_multicall: int) -> list:
+    chunks = [calls[i:i + calls_per_multicall] for i in range(0, len(calls), calls_per_multicall)]
+    results = await rpc.batch([('eth_call', [{'to': MULTICALL3_ADDRESS, 'data': encode_aggregate3(chunk)}, 'latest'])
+                               for chunk in chunks], batch_size=1)  # each aggregate3 payload is already large
+    outcomes = []
+    for chunk, result in zip(chunks, results):
+        if result is None:
+            outcomes.extend([(False, b'', "multicall failed")] * len(chunk))
+        else:
+            outcomes.extend((success, data, None) for success, data in decode_aggregate3(result))
+    return outcomes
+
+
+async def _fetch_batch(rpc, calls: list) -> list:
+    results = await rpc.batch([('eth_call', [{'to': target, 'data': '0x' + calldata.hex()}, 'latest'])
+                               for target, calldata in calls])
+    # A JSON-RPC error (revert) comes back as None
+    return [(False, b'', None) if result is None else (True, bytes.fromhex(result[2:]), None) for result in results]
+
+
+async def fetch_token_metadata(rpc, addresses: list, fields: tuple = ('symbol',), use_multicall: bool = True,
+                               calls_per_multicall: int = DEFAULT_CALLS_PER_MULTICALL) -> (list, list): # type: ignore
+    """
+    Reads `fields` (any of symbol, name, decimals) for every address.
+    Returns (values, errors): one {field: value} dict per address, and a list of
+    (address, field, reason) tuples for each call that failed (its value is None).
+    """
+    calls = [(address, GETTER_CALLDATA[field]) for address in addresses for field in fields]
+    if use_multicall:
+        outcomes = await _fetch_multicall(rpc, calls, calls_per_multicall)
+    else:
+        outcomes = await _fetch_batch(rpc, calls)
+
+    values, errors = [], []
+    for i, address in enumerate(addresses):
+        row = {}
+        for j, field in enumerate(fields):
+            success, data, failure = outcomes[i * len(fields) + j]
+            value, error = _decode_result(field, success, data)
+            row[field] = value
+            if error:
+                errors.append((address, field, failure or error))
+        values.append(row)
+    return values, errors
+
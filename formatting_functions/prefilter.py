@@ -0,0 +1,76 @@
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.addresses import address_keys  # noqa: E402
+
+# --- Filter pushdown ---
+# The final report only keeps protocol contracts. Addresses that can be ruled out cheaply are
+# marked in a `filtered_reason` column as early as the data allows, and later stages skip them
+# instead of spending Etherscan and RPC calls on rows filter_protocols.py would drop anyway.
+# This step only skips Safe infrastructure and EOAs:
+#   safe_infrastructure  Safe singletons, factories and libraries (query.sql's gnosis_safe_contracts)
+#   eoa                  no runtime code (one batched eth_getCode; needs an RPC endpoint)
+# Known tokens are not skipped, so ERC20 rows still cost an Etherscan lookup each. A listing in
+# eth_labels/tokens.csv cannot tell them apart: the file also lists NFTs and protocol contracts
+# (e.g. Uniswap V3's NonfungiblePositionManager) and has no token standard column. The listing
+# only spares the symbol RPC (see token_metadata.py).
+QUERY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'query.sql')
+FILTER_COLUMN = 'filtered_reason'
+SAFE_INFRASTRUCTURE = 'safe_infrastructure'
+EOA = 'eoa'
+
+# contract_type recorded for rows that are never sent to Etherscan
+FILTERED_TYPES = {
+    SAFE_INFRASTRUCTURE: "Safe Infrastructure",
+    EOA: "EOA",
+}
+
+_VALUES_LINE = re.compile(r'\((0x[0-9a-fA-F]{40})\)\s*,?\s*(?:--\s*(.*))?')
+
+
+def load_safe_infrastructure(path: str = QUERY_PATH) -> dict:
+    """Reads the gnosis_safe_contracts VALUES list from query.sql. Returns {lowercase address: comment}."""
+    with open(path) as f:
+        sql = f.read()
+    block = re.search(r'gnosis_safe_contracts\s*\(address\)\s*AS\s*\((.*?)\n\)', sql, re.S | re.I)
+    if block is None:
+        return {}
+    return {match.group(1).lower(): (match.group(2) or '').strip() for match in _VALUES_LINE.finditer(block.group(1))}
+
+
+def safe_infrastructure_keys(safe_contracts: dict = None) -> np.ndarray:
+    """20-byte keys of the Safe infrastructure addresses, parsed once and passed to `static_filter_reasons`."""
+    if safe_contracts is None:
+        safe_contracts = load_safe_infrastructure()
+    return address_keys(list(safe_contracts))
+
+
+def static_filter_reasons(keys: np.ndarray, safe_keys: np.ndarray = None) -> np.ndarray:
+    """
+    Marks the Safe infrastructure addresses among 20-byte `keys`, the only check that needs no
+    network access (EOAs need eth_getCode). Returns one reason per key (None for addresses that stay in).
+    """
+    if safe_keys is None:
+        safe_keys = safe_infrastructure_keys()
+    reasons = np.full(len(keys), None, dtype=object)
+    reasons[np.isin(keys, safe_keys)] = SAFE_INFRASTRUCTURE
+    return reasons
+
+
+def eoa_addresses(addresses: list, codes: list) -> set:
+    """Addresses whose runtime code came back empty (None means the read failed, so they stay in)."""
+    return {address for address, code in zip(addresses, codes) if code == b''}
+
+
+def filtered_info(reason: str) -> dict:
+    """The Etherscan-style result recorded for a row that was filtered out before any lookup."""
+    return {"label": "N/A", "type": FILTERED_TYPES[reason]}
+
+
+def filter_counts(reasons) -> dict:
+    counts = pd.Series(list(reasons), dtype=object).dropna().value_counts()
+    return {reason: int(count) for reason, count in counts.items()}
@@ -0,0 +1,86 @@
+import asyncio
+
+# --- Proxy resolution ---
+# Implementations are read from the standard storage slots over batched JSON-RPC instead of
+# asking Etherscan for each proxy. Storage slot layouts:
+#   EIP-1967 implementation: bytes32(uint256(keccak256('eip1967.proxy.implementation')) - 1)
+#   EIP-1967 beacon:         bytes32(uint256(keccak256('eip1967.proxy.beacon')) - 1)
+#   EIP-1822 (UUPS):         keccak256('PROXIABLE')
+#   OpenZeppelin legacy:     keccak256('org.zeppelinos.proxy.implementation')
+EIP1967_IMPLEMENTATION_SLOT = '0x360894a13ba1a3210667c828492db98dca3e2076cc3735a920a3ca505d382bbc'
+EIP1967_BEACON_SLOT = '0xa3f0ad74e5423aebfd80d3ef4346578335a9a72aeaee59ff6cb3582b35133d50'
+EIP1822_PROXIABLE_SLOT = '0xc5f16f0fcc639fa48a6947836d9850f504798523bf8c9a3a87d5876cf622bcf7'
+ZEPPELINOS_IMPLEMENTATION_SLOT = '0x7050c9e0f4ca769c69bd3a8ef740bc37934f8e2c036e5a723fd8ee048ed3f8c3'
+IMPLEMENTATION_SLOTS = [EIP1967_IMPLEMENTATION_SLOT, EIP1822_PROXIABLE_SLOT, ZEPPELINOS_IMPLEMENTATION_SLOT]
+
+BEACON_IMPLEMENTATION_CALLDATA = '0x5c60da1b'  # implementation()
+EIP1167_PREFIX = bytes.fromhex('363d3d373d3d3d363d73')
+EIP1167_SUFFIX = bytes.fromhex('5af43d82803e903d91602b57fd5bf3')
+MAX_HOPS = 3
+
+
+def minimal_proxy_target(code: bytes):
+    """Returns the implementation of EIP-1167 minimal-proxy bytecode, or None for any other code."""
+    if (code and len(code) == len(EIP1167_PREFIX) + 20 + len(EIP1167_SUFFIX)
+            and code.startswith(EIP1167_PREFIX) and code.endswith(EIP1167_SUFFIX)):
+        return '0x' + code[len(EIP1167_PREFIX):len(EIP1167_PREFIX) + 20].hex()
+    return None
+
+
+def _word_address(word: str):
+    """Reads an address from the low 20 bytes of a 32-byte hex word (None if zero or missing)."""
+    if not word or len(word) < 42:
+        return None
+    address = '0x' + word[-40:].lower()
+    return None if int(address, 16) == 0 else address
+
+
+async def _resolve_hop(rpc, addresses: list) -> dict:
+    """Resolves one level of indirection for each address. Returns {address: target} for proxies."""
+    slot_reads = [('eth_getStorageAt', [address, slot, 'latest'])
+                  for address in addresses for slot in IMPLEMENTATION_SLOTS + [EIP1967_BEACON_SLOT]]
+    words, codes = await asyncio.gather(rpc.batch(slot_reads), rpc.get_code(addresses))
+
+    targets, beacons = {}, {}
+    per_address = len(IMPLEMENTATION_SLOTS) + 1
+    for i, address in enumerate(addresses):
+        slots = words[i * per_address:(i + 1) * per_address]
+        implementation = next(filter(None, map(_word_address, slots[:-1])), None)
+        beacon = _word_address(slots[-1])
+        if implementation:
+            targets[address] = implementation
+        elif beacon:
+            beacons[address] = beacon
+        elif codes[i] and minimal_proxy_target(codes[i]):
+            targets[address] = minimal_proxy_target(codes[i])
+
+    if beacons:
+        calls = [('eth_call', [{'to': beacon, 'data': BEACON_IMPLEMENTATION_CALLDATA}, 'latest'])
+                 for beacon in beacons.values()]
+        for address, word in zip(beacons, await rpc.batch(calls)):
+            implementation = _word_address(word)
+            if implementation:
+                targets[address] = implementation
+    return targets
+
+
+async def resolve_implementations(rpc, addresses: list, max_hops: int = MAX_HOPS) -> dict:
+    """
+    Resolves EIP-1967 (implementation and beacon), EIP-1822, OpenZeppelin legacy and EIP-1167
+    proxies with batched storage, code and beacon reads. Proxies of proxies are followed up
+    to `max_hops` levels. Returns {lowercase address: lowercase final implementation} for proxies only.
+    """
+    resolved = {}
+    current = {address.lower(): address.lower() for address in addresses}  # proxy -> current target
+    for _ in range(max_hops):
+        if not current:
+            break
+        unique_targets = list(dict.fromkeys(current.values()))
+        hops = await _resolve_hop(rpc, unique_targets)
+        next_current = {}
+        for proxy, target in current.items():
+            if target in hops and hops[target] != target:
+                resolved[proxy] = hops[target]
+                next_current[proxy] = hops[target]
+        current = next_current
+    return resolved
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import asyncio
+import itertools
+import aiohttp
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.ratelimit import get_controller  # noqa: E402
+
+# --- JSON-RPC batching ---
+# Many small reads (eth_getCode, eth_getStorageAt, eth_call) are sent as JSON-RPC batch
+# requests: one HTTP round trip carries `batch_size` calls.
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_CONCURRENCY = 4
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 0.5
+
+
+class RPCError(Exception):
+    """Raised when a whole JSON-RPC batch still fails (HTTP or malformed response) after all retries."""
+
+
+class JSONRPCClient:
+    """
+    Minimal async JSON-RPC client over one pooled aiohttp session. `batch` splits a list
+    of (method, params) calls into batch requests and returns one result per call, in order.
+    A call that returns a JSON-RPC error yields None instead of failing the batch.
+    HTTP requests draw from the shared 'rpc' rate controller; 429s slow it down and are retried.
+
+    Usage:
+        async with JSONRPCClient(rpc_url) as rpc:
+            codes = await rpc.batch([('eth_getCode', [address, 'latest']) for address in addresses])
+    """
+    def __init__(self, url: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, requests_per_second: float = None):
+        self.url = url
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._ids = itertools.count()
+        self.rate_controller = get_controller('rpc', requests_per_second)
+        self._session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    async def _send(self, calls: list) -> list:
+        payload = [{"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+                   for method, params in calls]
+        for attempt in range(MAX_RETRIES + 1):
+            async with self._semaphore:
+                await self.rate_controller.acquire_async()
+                started = time.monotonic()
+                throttled = False
+                try:
+                    async with self._session.post(self.url, json=payload) as response:
+                        throttled = response.status == 429 and attempt < MAX_RETRIES
+                        if throttled:
+                            retry_after = response.headers.get('Retry-After')
+                            self.rate_controller.on_throttle(float(retry_after) if retry_after and retry_after.isdigit() else None,
+                                                            started)
+                        else:
+                            response.raise_for_status()
+                            replies = await response.json(content_type=None)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    # ValueError: an HTML or empty error page instead of JSON. All of these are
+                    # usually transient, so they are retried like a 429
+                    if attempt == MAX_RETRIES:
+                        raise RPCError(f"JSON-RPC batch of {len(calls)} calls failed: {e}") from e
+                else:
+                    if not throttled:
+                        self.rate_controller.on_success(time.monotonic() - started, started)
+                        break
+            # A 429 backs off like any other retryable failure
+            await asyncio.sleep(BASE_BACKOFF_SECONDS * 2 ** attempt)
+
+        if not isinstance(replies, list):
+            raise RPCError(f"Expected a batch response, got: {str(replies)[:200]}")
+        by_id = {reply.get('id'): reply for reply in replies}
+        return [by_id.get(request['id'], {}).get('result') for request in payload]
+
+    async def batch(self, calls: list, batch_size: int = None) -> list:
+        batch_size = batch_size or self.batch_size
+        chunks = [calls[i:i + batch_size] for i in range(0, len(calls), batch_size)]
+        results = await asyncio.gather(*(self._send(chunk) for chunk in chunks))
+        return [result for chunk_results in results for result in chunk_results]
+
+    async def get_code(self, addresses: list, block: str = 'latest') -> list:
+        """Returns the runtime bytecode of each address as bytes (b'' for EOAs, None on error)."""
+        results = await self.batch([('eth_getCode', [address, block]) for address in addresses])
+        return [None if code is None else bytes.fromhex(code[2:]) for code in results]
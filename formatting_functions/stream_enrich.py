@@ -0,0 +1,290 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import contextlib
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from etherscan_client import AsyncEtherscanClient, DEFAULT_MAX_CONCURRENCY, DEFAULT_REQUESTS_PER_SECOND
+from etherscan_cache import SourceCodeCache, DEFAULT_CACHE_PATH as SOURCE_CACHE_PATH
+from etherscan import API_KEYS, API_URL, ETHEREUM_RPC_URL, UNVERIFIED_TYPES, get_contract_info
+from rpc import JSONRPCClient, RPCError
+from bytecode import CodeClassCache, classify_addresses
+from proxies import resolve_implementations
+from multicall import fetch_token_metadata
+from token_metadata import TokenCache, build_local_tokens, resolve_known, merge_remote, DEFAULT_CACHE_PATH as TOKEN_CACHE_PATH
+from label_index import LabelIndex, ensure_index, ACCOUNTS_LABELS_PATH, TOKENS_LABELS_PATH, DEFAULT_INDEX_PATH
+from prefilter import FILTER_COLUMN, EOA, SAFE_INFRASTRUCTURE, static_filter_reasons, eoa_addresses, filtered_info, \
+    load_safe_infrastructure, safe_infrastructure_keys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.addresses import address_keys  # noqa: E402
+from common.tables import TableWriter, read_table  # noqa: E402
+from common.ratelimit import report  # noqa: E402
+
+load_dotenv()
+
+# --- Streaming enrichment ---
+# Runs custom_label -> etherscan -> get_symbols -> filter_protocols as one asyncio pipeline.
+# Each row moves to the next stage as soon as it is ready, through bounded queues, so the
+# stages overlap and the run takes about as long as the slowest stage instead of the sum.
+# Rows are written in rank (input) order: finished rows wait in a reorder buffer until every
+# earlier row is written, and at most WINDOW_SIZE rows are in flight at once.
+# Rows ruled out by the pre-filter (see prefilter.py) skip Etherscan and RPC calls and are
+# left out of the output table.
+INPUT_TABLE = '../data/final_combined'
+ENRICHED_TABLE = '../data/final_combined_3'   # every row, like get_symbols.py's output
+OUTPUT_TABLE = '../data/final_combined_4'     # ERC20 tokens filtered out, like filter_protocols.py's
+QUEUE_SIZE = 256                # rows buffered between two stages
+WINDOW_SIZE = 2000              # rows read but not yet written
+CLASSIFY_BATCH_SIZE = 100       # addresses per on-chain proxy lookup
+SYMBOL_BATCH_SIZE = 500         # tokens per symbol lookup (one Multicall3 call)
+BATCH_LINGER_SECONDS = 0.2      # how long a batching stage waits for its batch to fill up
+WRITE_BATCH_ROWS = 1000         # rows per Parquet row group
+ERC20_TYPE = "ERC20 Token"
+
+_DONE = object()   # end-of-stream marker passed down the queues
+
+
+async def _collect(inbox: asyncio.Queue, max_size: int, linger: float) -> (list, bool): # type: ignore
+    """
+    Waits for one item, then takes whatever else arrives within `linger` seconds, up to
+    `max_size` items. Returns (batch, finished), where `finished` means the stream ended.
+    """
+    item = await inbox.get()
+    if item is _DONE:
+        return [], True
+    batch = [item]
+    deadline = time.monotonic() + linger
+    while len(batch) < max_size:
+        try:
+            item = inbox.get_nowait()
+        except asyncio.QueueEmpty:
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(0.01)
+            continue
+        if item is _DONE:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+async def read_rows(records: list, window: asyncio.Semaphore, outbox: asyncio.Queue):
+    for rank, row in enumerate(records):
+        await window.acquire()
+        await outbox.put((rank, row))
+    await outbox.put(_DONE)
+
+
+async def label_stage(label_index: LabelIndex, safe_keys: np.ndarray, address_column: str,
+                      inbox: asyncio.Queue, outbox: asyncio.Queue):
+    """custom_label.py: one vectorized index lookup and static pre-filter for whatever rows are queued."""
+    finished = False
+    while not finished:
+        batch, finished = await _collect(inbox, QUEUE_SIZE, 0)
+        if not batch:
+            continue
+        keys = address_keys([row[address_column] for _, row in batch])
+        labels, sources = label_index.lookup(keys)
+        reasons = static_filter_reasons(keys, safe_keys)
+        for (rank, row), label, source, reason in zip(batch, labels, sources, reasons):
+            row['custom_label'], row['custom_label_source'], row[FILTER_COLUMN] = label, source, reason
+            await outbox.put((rank, row))
+    await outbox.put(_DONE)
+
+
+async def classify_stage(group: asyncio.TaskGroup, client: AsyncEtherscanClient, rpc: JSONRPCClient,
+                         code_cache: CodeClassCache, safe_contracts: dict, address_column: str,
+                         inbox: asyncio.Queue, outbox: asyncio.Queue):
+    """
+    etherscan.py: sets EOAs aside and resolves proxies on-chain for each batch of rows, then
+    classifies every remaining row in its own task, so a slow lookup never holds up the rows
+    behind it. Pre-filtered rows pass straight through.
+    """
+    async def classify(rank: int, row: dict, implementation: str):
+        address = row[address_column]
+        info = await get_contract_info(client, address, implementation)
+        if rpc is not None and info['type'] in UNVERIFIED_TYPES:
+            try:
+                contract_type = (await classify_addresses(rpc, [implementation or address], code_cache))[0]
+                if contract_type not in (None, "Other Contract"):
+                    info = {**info, "type": contract_type}
+            except RPCError as e:
+                print(f"  -> Bytecode classification skipped for {address}: {e}")
+        row['label'], row['contract_type'] = info['label'], info['type']
+        await outbox.put((rank, row))
+
+    tasks = []
+    finished = False
+    while not finished:
+        batch, finished = await _collect(inbox, CLASSIFY_BATCH_SIZE, BATCH_LINGER_SECONDS)
+        addresses = list(dict.fromkeys(row[address_column] for _, row in batch if row[FILTER_COLUMN] is None))
+        implementations = {}
+        if rpc is not None and addresses:
+            try:
+                eoas = eoa_addresses(addresses, await rpc.get_code(addresses))
+                for _, row in batch:
+                    if row[address_column] in eoas:
+                        row[FILTER_COLUMN] = EOA
+                implementations = await resolve_implementations(rpc, [address for address in addresses
+                                                                      if address not in eoas])
+            except RPCError as e:
+                print(f"  -> On-chain proxy resolution skipped for {len(batch)} rows: {e}")
+        for rank, row in batch:
+            reason = row[FILTER_COLUMN]
+            if reason is not None:
+                info = filtered_info(reason)
+                if reason == SAFE_INFRASTRUCTURE:
+                    info['label'] = safe_contracts.get(row[address_column].lower()) or "N/A"
+                row['label'], row['contract_type'] = info['label'], info['type']
+                await outbox.put((rank, row))
+                continue
+            implementation = implementations.get(row[address_column].lower())
+            tasks.append(group.create_task(classify(rank, row, implementation)))
+    if tasks:
+        await asyncio.wait(tasks)
+    await outbox.put(_DONE)
+
+
+async def symbol_stage(rpc: JSONRPCClient, token_cache: TokenCache, local_tokens: dict, fields: tuple,
+                       use_multicall: bool, address_column: str, inbox: asyncio.Queue, outbox: asyncio.Queue):
+    """get_symbols.py: local dataset -> cache -> one Multicall3 (or batch) read per batch of tokens."""
+    finished = False
+    while not finished:
+        batch, finished = await _collect(inbox, SYMBOL_BATCH_SIZE, BATCH_LINGER_SECONDS)
+        tokens = list(dict.fromkeys(row[address_column] for _, row in batch if row['contract_type'] == ERC20_TYPE))
+        values, sources = {}, {}
+        if tokens:
+            values, sources, misses = resolve_known(tokens, fields, token_cache, local_tokens)
+            if misses and rpc is not None:
+                try:
+                    remote_values, _ = await fetch_token_metadata(rpc, misses, fields, use_multicall)
+                    merge_remote(values, sources, misses, remote_values, fields, token_cache)
+                except RPCError as e:
+                    print(f"  -> Symbol lookup failed for {len(misses)} tokens: {e}")
+
+        for rank, row in batch:
+            address = row[address_column]
+            is_token = row['contract_type'] == ERC20_TYPE
+            for field in fields:
+                value = values[address][field] if is_token else None
+                if field == 'symbol':
+                    value = ("Symbol not found" if value is None else value) if is_token else 'N/A'
+                row[f'token_{field}'] = value
+            row['token_symbol_source'] = sources.get(address) if is_token else None
+            await outbox.put((rank, row))
+    await outbox.put(_DONE)
+
+
+async def write_stage(window: asyncio.Semaphore, total: int, columns: list, enriched: TableWriter,
+                      output: TableWriter, inbox: asyncio.Queue):
+    """filter_protocols.py: writes rows in rank order, keeping ERC20 tokens and pre-filtered rows out of the output table."""
+    started = time.monotonic()
+    finished_rows = {}
+    next_rank = 0
+    ready = []
+
+    def flush():
+        df = pd.DataFrame(ready, columns=columns)
+        enriched.write(df)
+        output.write(df[(df['contract_type'] != ERC20_TYPE) & df[FILTER_COLUMN].isna()].drop(columns=FILTER_COLUMN))
+        ready.clear()
+        print(f"Wrote {next_rank}/{total} rows ({time.monotonic() - started:.1f}s).")
+
+    while (item := await inbox.get()) is not _DONE:
+        rank, row = item
+        finished_rows[rank] = row
+        while next_rank in finished_rows:
+            ready.append(finished_rows.pop(next_rank))
+            next_rank += 1
+            window.release()
+        if len(ready) >= WRITE_BATCH_ROWS:
+            flush()
+    if ready or enriched.rows == 0:
+        flush()
+
+
+async def enrich(df: pd.DataFrame, address_column: str, args, fields: tuple):
+    records = df.to_dict('records')
+    columns = list(df.columns) + ['custom_label', 'custom_label_source', FILTER_COLUMN, 'label', 'contract_type'] + \
+        [f'token_{field}' for field in fields] + ['token_symbol_source']
+    window = asyncio.Semaphore(WINDOW_SIZE)
+    to_label, to_classify, to_symbols, to_write = (asyncio.Queue(QUEUE_SIZE) for _ in range(4))
+
+    with contextlib.ExitStack() as stack:
+        source_cache = None if args.no_cache else stack.enter_context(SourceCodeCache(SOURCE_CACHE_PATH))
+        token_cache = None if args.no_cache else stack.enter_context(TokenCache(TOKEN_CACHE_PATH))
+        code_cache = stack.enter_context(CodeClassCache())
+        label_index = stack.enter_context(LabelIndex(args.label_index))
+        enriched = stack.enter_context(TableWriter(ENRICHED_TABLE))
+        output = stack.enter_context(TableWriter(OUTPUT_TABLE, export_csv=True))
+        # Parsed once per run and shared by every batch
+        local_tokens = build_local_tokens()
+        safe_contracts = load_safe_infrastructure()
+        safe_keys = safe_infrastructure_keys(safe_contracts)
+
+        async with contextlib.AsyncExitStack() as async_stack:
+            client = await async_stack.enter_async_context(
+                AsyncEtherscanClient(API_KEYS, API_URL, args.rps, args.concurrency, source_cache))
+            rpc = await async_stack.enter_async_context(JSONRPCClient(args.rpc_url)) if args.rpc_url else None
+            # A failure in any stage cancels the others and leaves the previous outputs in place
+            async with asyncio.TaskGroup() as group:
+                group.create_task(read_rows(records, window, to_label))
+                group.create_task(label_stage(label_index, safe_keys, address_column, to_label, to_classify))
+                group.create_task(classify_stage(group, client, rpc, code_cache, safe_contracts, address_column,
+                                                 to_classify, to_symbols))
+                group.create_task(symbol_stage(rpc, token_cache, local_tokens, fields, args.mode == 'multicall',
+                                               address_column, to_symbols, to_write))
+                group.create_task(write_stage(window, len(records), columns, enriched, output, to_write))
+    return enriched.rows, output.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Label, classify, fetch symbols and filter in one streaming pass (replaces the four enrichment scripts).")
+    parser.add_argument('--rps', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                        help="Requests per second allowed per key by your Etherscan plan.")
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help=f"Maximum number of Etherscan requests in flight (default: {DEFAULT_MAX_CONCURRENCY} per key).")
+    parser.add_argument('--rpc-url', default=ETHEREUM_RPC_URL,
+                        help="JSON-RPC endpoint for proxy resolution, bytecode classification and token symbols.")
+    parser.add_argument('--mode', choices=['multicall', 'batch'], default='multicall',
+                        help="How token getters are read: Multicall3 aggregate3 or JSON-RPC batches of eth_call.")
+    parser.add_argument('--fields', default='symbol', help="Comma-separated token getters: symbol,name,decimals.")
+    parser.add_argument('--label-index', default=DEFAULT_INDEX_PATH, help="Path of the eth_labels index.")
+    parser.add_argument('--no-cache', action='store_true', help="Do not read or write the Etherscan and token caches.")
+    parser.add_argument('--limit', type=int, default=None, help="Only process the first N rows.")
+    args = parser.parse_args()
+    fields = tuple(field.strip() for field in args.fields.split(','))
+    if 'symbol' not in fields or not set(fields) <= {'symbol', 'name', 'decimals'}:
+        parser.error("--fields must include 'symbol' and only contain symbol, name and decimals.")
+
+    if not API_KEYS:
+        print("Error: ETHERSCAN_API_KEY (or ETHERSCAN_API_KEYS) environment variable not set.")
+        sys.exit(1)
+    if not args.rpc_url:
+        print("Warning: ETHEREUM_RPC_URL is not set; proxies, unverified contracts and symbols are resolved offline only.")
+    try:
+        df = read_table(INPUT_TABLE)
+        ensure_index([ACCOUNTS_LABELS_PATH, TOKENS_LABELS_PATH], args.label_index)
+    except FileNotFoundError as e:
+        print(f"Error: Could not find a file. Please check your paths. Details: {e}")
+        sys.exit(1)
+
+    address_column = 'destination_contract' if 'destination_contract' in df.columns else 'address'
+    if args.limit is not None:
+        df = df.iloc[:args.limit].copy()
+    print(f"Streaming {len(df)} rows through label -> classify -> symbols -> filter...")
+
+    started = time.monotonic()
+    enriched_rows, output_rows = asyncio.run(enrich(df, address_column, args, fields))
+    print(f"\nProcessing complete in {time.monotonic() - started:.1f}s! {enriched_rows} rows saved to "
+          f"'{ENRICHED_TABLE}.parquet'; {output_rows} non-token rows to '{OUTPUT_TABLE}.parquet' and '.csv'.")
+    print(report())
+
+
+if __name__ == "__main__":
+    main()
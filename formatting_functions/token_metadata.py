@@ -0,0 +1,171 @@
+import os
+import sys
+import time
+import sqlite3
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.addresses import address_keys, build_lookup, lookup  # noqa: E402
+
+# --- Local-first token metadata ---
+# Symbols and names are answered from eth_labels/tokens.csv first, then from a persistent
+# cache of earlier RPC answers; only the remaining misses go to the network. Every answer
+# records its source. A token listed in tokens.csv takes its symbol and name from there only,
+# so it reaches the network only for getters the file does not have (decimals).
+TOKENS_LABELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'eth_labels', 'tokens.csv')
+DEFAULT_CACHE_PATH = '../data/token_cache.sqlite'
+MAINNET_CHAIN_ID = 1
+
+SOURCE_LOCAL = 'eth_labels'
+SOURCE_CACHE = 'cache'
+SOURCE_RPC = 'rpc'
+LOCAL_FIELDS = ('symbol', 'name')
+
+
+def load_local_tokens(path: str = TOKENS_LABELS_PATH, chain_id: int = MAINNET_CHAIN_ID) -> pd.DataFrame:
+    """Loads the mainnet rows of tokens.csv (address, label, name, symbol)."""
+    tokens_df = pd.read_csv(path, usecols=['address', 'chainId', 'label', 'name', 'symbol'])
+    return tokens_df[tokens_df['chainId'] == chain_id].drop(columns='chainId').reset_index(drop=True)
+
+
+def build_field_lookup(keys: np.ndarray, tokens_df: pd.DataFrame, field: str) -> tuple:
+    """Lookup table for one column, keeping the first non-empty value per address."""
+    present = (tokens_df[field].notna() & (tokens_df[field].astype(str).str.strip() != '')).to_numpy()
+    return build_lookup(keys[present], tokens_df[field].to_numpy(dtype=object)[present])
+
+
+def build_local_tokens(tokens_df: pd.DataFrame = None) -> dict:
+    """
+    Parses the addresses of `tokens_df` (default: load_local_tokens()) once into lookup tables:
+    {'keys': sorted listed keys, 'symbol': lookup table, 'name': lookup table}.
+    """
+    if tokens_df is None:
+        tokens_df = load_local_tokens()
+    keys = address_keys(tokens_df['address'])
+    local_tokens = {'keys': np.unique(keys)}
+    for field in LOCAL_FIELDS:
+        local_tokens[field] = build_field_lookup(keys, tokens_df, field)
+    return local_tokens
+
+
+class TokenCache:
+    """Persistent SQLite cache of token getters answered over RPC, keyed by lowercase address."""
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS token_metadata ("
+            "address TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, fetched_at REAL NOT NULL, "
+            "PRIMARY KEY (address, field))"
+        )
+        self._conn.commit()
+
+    def get_many(self, addresses: list, field: str) -> dict:
+        found = {}
+        for i in range(0, len(addresses), 500):
+            chunk = [address.lower() for address in addresses[i:i + 500]]
+            rows = self._conn.execute(
+                f"SELECT address, value FROM token_metadata WHERE field = ? AND address IN ({','.join('?' * len(chunk))})",
+                [field, *chunk]
+            )
+            found.update(rows)
+        return found
+
+    def put_many(self, values: dict, field: str):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO token_metadata VALUES (?, ?, ?, ?)",
+            [(address.lower(), field, str(value), now) for address, value in values.items() if value is not None]
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def resolve_known(addresses: list, fields: tuple, cache: TokenCache = None,
+                  local_tokens: dict = None) -> (dict, dict, list): # type: ignore
+    """
+    Resolves `fields` for unique `addresses` from the local dataset (`build_local_tokens`),
+    then the cache. Returns ({address: {field: value}}, {address: source}, misses), where
+    `misses` are the addresses with a field still unknown that the network can answer.
+    """
+    if local_tokens is None:
+        local_tokens = build_local_tokens()
+    keys = address_keys(addresses)
+    values = {address: {field: None for field in fields} for address in addresses}
+    sources = dict.fromkeys(addresses)
+
+    # 1. Local dataset (decimals are not in tokens.csv)
+    for field in fields:
+        if field in LOCAL_FIELDS:
+            local = lookup(keys, local_tokens[field])
+            for address, value in zip(addresses, local):
+                if value is not None:
+                    values[address][field] = value
+    for address in addresses:
+        if values[address].get('symbol') is not None:
+            sources[address] = SOURCE_LOCAL
+
+    # 2. Persistent cache of earlier RPC answers
+    if cache is not None:
+        for field in fields:
+            missing = [address for address in addresses if values[address][field] is None]
+            cached = cache.get_many(missing, field)
+            for address in missing:
+                value = cached.get(address.lower())
+                if value is not None:
+                    values[address][field] = int(value) if field == 'decimals' else value
+                    if field == 'symbol':
+                        sources[address] = SOURCE_CACHE
+
+    listed = np.isin(keys, local_tokens['keys'])
+    misses = [address for address, is_listed in zip(addresses, listed)
+              if any(value is None for field, value in values[address].items()
+                     if not (is_listed and field in LOCAL_FIELDS))]
+    return values, sources, misses
+
+
+def merge_remote(values: dict, sources: dict, misses: list, remote_values: list, fields: tuple,
+                 cache: TokenCache = None):
+    """Fills the gaps left by `resolve_known` with RPC answers (in `misses` order) and caches them."""
+    for address, remote in zip(misses, remote_values):
+        for field in fields:
+            if values[address][field] is None and remote.get(field) is not None:
+                values[address][field] = remote[field]
+                if field == 'symbol':
+                    sources[address] = SOURCE_RPC
+    if cache is not None:
+        for field in fields:
+            cache.put_many({address: remote.get(field) for address, remote in zip(misses, remote_values)}, field)
+
+
+def resolve_token_metadata(addresses: list, fields: tuple, fetch_remote, cache: TokenCache = None,
+                           local_tokens: dict = None) -> (dict, dict, list): # type: ignore
+    """
+    Resolves `fields` for unique `addresses` through the chain local dataset -> cache -> RPC.
+    `fetch_remote(addresses, fields)` is called once with only the misses and returns
+    (values, errors) like multicall.fetch_token_metadata. Returns ({address: {field: value}},
+    {address: source}, errors), where the source is where the symbol came from.
+    """
+    values, sources, misses = resolve_known(addresses, fields, cache, local_tokens)
+
+    # 3. RPC for whatever is still missing
+    errors = []
+    if misses:
+        remote_values, errors = fetch_remote(misses, fields)
+        merge_remote(values, sources, misses, remote_values, fields, cache)
+    return values, sources, errors
+
+
+def source_counts(sources: dict) -> dict:
+    counts = pd.Series(list(sources.values()), dtype=object).fillna('missing').value_counts()
+    return {source: int(count) for source, count in counts.items()}
+
@@ -1,9 +1,11 @@
 import os
+import sys
 import pandas as pd
-from dune_client.client import DuneClient
-from dune_client.query import QueryBase 
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.dune import DuneJob, run_jobs  # noqa: E402
+
 load_dotenv()
 
 # --- Environment variables ---
@@ -12,26 +14,16 @@ QUERY_ID = os.environ.get("ALL_SAFES_QUERY")
 if not DUNE_API_KEY and not QUERY_ID:
     raise ValueError("DUNE_API_KEY and QUERY_ID not found. Please set it as an environment variable.")
 
-# --- Define the query using QueryBase ---
-wallet_count_query = QueryBase(
-    query_id=QUERY_ID,
-)
-
-# Initialize the Dune client
-dune = DuneClient(DUNE_API_KEY)
-
-try:
-    # --- Execute query and get results as a Pandas DataFrame ---
-    print("Executing query on Dune...")
-    results_df = dune.run_query_dataframe(query=wallet_count_query)
+output_filename = '../data/safe_wallet_count.csv'
+# The Safe count moves slowly; a result up to a day old is reused instead of re-executing
+MAX_AGE_HOURS = 24
 
-    # --- Save the DataFrame to a CSV file ---
-    output_filename = '../data/safe_wallet_count.csv'
-    results_df.to_csv(output_filename, index=False)
-    
-    print(f"✅ Successfully saved query results to {output_filename}")
-    print("\nFile content:")
-    print(results_df.to_string(index=False))
+# --- Execute the query (unless a recent result exists) and save its result straight to CSV ---
+print("Executing query on Dune...")
+outcomes = run_jobs(DUNE_API_KEY, [DuneJob('safe_wallets', QUERY_ID, output_filename, max_age_hours=MAX_AGE_HOURS)])
 
-except Exception as e:
-    print(f"An error occurred: {e}")
\ No newline at end of file
+if isinstance(outcomes['safe_wallets'], Exception):
+    sys.exit(1)
+print(f"✅ Successfully saved query results to {output_filename}")
+print("\nFile content:")
+print(pd.read_csv(output_filename).to_string(index=False))
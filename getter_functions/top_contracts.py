@@ -1,9 +1,11 @@
 import os
+import sys
 import pandas as pd
-from dune_client.client import DuneClient
-from dune_client.query import QueryBase 
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.dune import DuneJob, run_jobs  # noqa: E402
+
 load_dotenv()
 
 # --- Setup ---
@@ -13,24 +15,14 @@ QUERY_ID = os.environ.get("TOP_CONTRACTS_QUERY")
 if not DUNE_API_KEY and not QUERY_ID:
     raise ValueError("DUNE_API_KEY and QUERY_ID not found. Please set it as an environment variable.")
 
-top_10_query = QueryBase(
-    query_id=QUERY_ID
-)
-
-dune = DuneClient(DUNE_API_KEY)
-
-try:
-    # --- Fetch the final results from Dune ---
-    print("Executing query on Dune to find top contracts...")
-    results_df = dune.get_latest_result_dataframe(query=top_10_query)
+output_filename = '../data/top_interacted_contracts.csv'
 
-    # --- Save the final list to a new CSV file ---
-    output_filename = '../data/top_interacted_contracts.csv'
-    results_df.to_csv(output_filename, index=False)
-    
-    print(f"✅ Success! The Top list has been saved to {output_filename}")
-    print("\nFile content:")
-    print(results_df.to_string(index=False))
+# --- Fetch the latest stored results from Dune (no new execution; skipped if already cached) ---
+print("Executing query on Dune to find top contracts...")
+outcomes = run_jobs(DUNE_API_KEY, [DuneJob('top_contracts', QUERY_ID, output_filename, latest=True)])
 
-except Exception as e:
-    print(f"An error occurred: {e}")
\ No newline at end of file
+if isinstance(outcomes['top_contracts'], Exception):
+    sys.exit(1)
+print(f"✅ Success! The Top list has been saved to {output_filename}")
+print("\nFile content:")
+print(pd.read_csv(output_filename).to_string(index=False))
@@ -0,0 +1,16 @@
+-- Per-day input for the incremental aggregate store (scripts/aggregate.py): the number of
+-- successful execTransaction calls per day, direct destination and Safe.
+-- Parameters: start_date and end_date (YYYY-MM-DD, inclusive).
+SELECT
+    block_date,
+    BYTEARRAY_SUBSTRING(input, 17, 20) AS destination_contract,
+    address AS safe_wallet,
+    COUNT(*) AS interactions
+FROM safe_ethereum.transactions
+WHERE method = 'execTransaction'
+  AND success = true
+  AND BYTEARRAY_LENGTH(input) >= 36
+  AND input IS NOT NULL
+  AND block_date >= DATE '{{start_date}}'
+  AND block_date <= DATE '{{end_date}}'
+GROUP BY 1, 2, 3
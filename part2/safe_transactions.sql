@@ -0,0 +1,17 @@
+-- Raw export of every successful Safe execTransaction from the last 30 days.
+-- decode.py --raw extracts the direct destination and expands multiSend batches locally,
+-- so this single scan replaces all_contracts.sql, multisend_transactions.sql and
+-- all_contracts_excluding_multisends.sql. It is also the snapshot local_run.py runs those
+-- queries against offline.
+SELECT
+    tx_hash,
+    address,
+    block_date,
+    block_time,
+    input
+FROM safe_ethereum.transactions
+WHERE method = 'execTransaction'
+  AND success = true
+  AND BYTEARRAY_LENGTH(input) >= 36
+  AND input IS NOT NULL
+  AND block_time >= NOW() - INTERVAL '30' DAY
@@ -0,0 +1,137 @@
+import os
+import sys
+import argparse
+from datetime import date, datetime, timedelta, timezone
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.daily_aggregates import DEFAULT_STORE_DIR, DailyAggregateStore  # noqa: E402
+from common.dune import DuneJob, run_jobs  # noqa: E402
+from common.local_sql import LocalDune  # noqa: E402
+from formatting_functions.prefilter import load_safe_infrastructure  # noqa: E402
+from decode import MULTISEND_CONTRACTS  # noqa: E402
+
+load_dotenv()
+
+# --- Configuration ---
+# `refresh` fetches ../daily_destinations.sql for the days after the last complete day in the
+# store, from Dune (DAILY_DESTINATIONS query id) or offline from a local snapshot (local_sql.py).
+# `window` answers a query from the stored partials. The presets reproduce the Dune queries,
+# with unique_safe_wallets as a HyperLogLog estimate and windows in whole days
+# (all_contracts_excluding_multisends.sql filters on block_time).
+DUNE_API_KEY = os.environ.get("DUNE_KEY")
+QUERY_ID_DAILY_DESTINATIONS = os.environ.get("DAILY_DESTINATIONS")
+DAILY_SQL_PATH = '../daily_destinations.sql'
+DAILY_ROWS_PATH = '../data/daily_destinations-{start}.parquet'
+DEFAULT_BACKFILL_DAYS = 30
+CHUNK_DAYS = 31          # days per Dune execution / local query during a refresh
+
+EXCLUSIONS = {
+    'safe_infrastructure': lambda: list(load_safe_infrastructure()),
+    'multisend': lambda: ['0x' + contract.hex() for contract in MULTISEND_CONTRACTS],
+}
+PRESETS = {
+    'top_contracts': {'days': None, 'exclude': ['safe_infrastructure'], 'limit': 100,
+                      'output': '../../data/top_interacted_contracts.csv'},
+    'all_contracts': {'days': 30, 'exclude': [], 'limit': 100, 'output': '../data/all_contracts.csv'},
+    'all_contracts_excluding_multisends': {'days': 30, 'exclude': ['multisend'], 'limit': None,
+                                           'output': '../data/all_contracts_excluding_multisends.csv'},
+}
+
+
+def chunks(start: date, end: date) -> list:
+    return [(chunk_start, min(end, chunk_start + timedelta(days=CHUNK_DAYS - 1)))
+            for chunk_start in (start + timedelta(days=offset) for offset in range(0, (end - start).days + 1, CHUNK_DAYS))]
+
+
+def refresh_from_dune(store: DailyAggregateStore, start: date, end: date, complete_before: date) -> bool:
+    if not DUNE_API_KEY or not QUERY_ID_DAILY_DESTINATIONS:
+        raise ValueError("Set DUNE_KEY and DAILY_DESTINATIONS (the query id of daily_destinations.sql).")
+    jobs = [DuneJob(f'daily_destinations {chunk_start}', QUERY_ID_DAILY_DESTINATIONS,
+                    DAILY_ROWS_PATH.format(start=chunk_start), format='parquet', max_age_hours=1,
+                    parameters={'start_date': chunk_start.isoformat(), 'end_date': chunk_end.isoformat()})
+            for chunk_start, chunk_end in chunks(start, end)]
+    outcomes = run_jobs(DUNE_API_KEY, jobs)
+    # Chunks are stored in day order, stopping at the first failure so the store has no gaps
+    for job, (chunk_start, chunk_end) in zip(jobs, chunks(start, end)):
+        if isinstance(outcomes[job.name], Exception):
+            return False
+        days = store.add_rows(pd.read_parquet(job.output_path), chunk_start, chunk_end, complete_before)
+        os.remove(job.output_path)
+        print(f"  -> Stored {days} day(s) from {chunk_start} to {chunk_end}.")
+    return True
+
+
+def refresh_from_snapshot(store: DailyAggregateStore, snapshot: str, since: date = None) -> bool:
+    with LocalDune(snapshot) as local, open(DAILY_SQL_PATH) as f:
+        sql = f.read()
+        as_of = datetime.fromisoformat(local.as_of).date()
+        start = since or store.refresh_start(as_of - timedelta(days=DEFAULT_BACKFILL_DAYS))
+        print(f"Aggregating {start} to {as_of} from {snapshot}...")
+        for chunk_start, chunk_end in chunks(start, as_of):
+            rows = local.dune_result(sql, {'start_date': chunk_start, 'end_date': chunk_end}).df()
+            # The snapshot ends during its last day, so that day stays incomplete
+            days = store.add_rows(rows, chunk_start, chunk_end, complete_before=as_of)
+            print(f"  -> Stored {days} day(s) from {chunk_start} to {chunk_end} ({len(rows)} rows).")
+    return True
+
+
+def answer_window(store: DailyAggregateStore, days: int, exclude: list, limit: int, output: str):
+    stored = store.days()
+    if not stored:
+        raise SystemExit("The aggregate store is empty. Run `python aggregate.py refresh` first.")
+    # Like `block_date >= CURRENT_DATE - INTERVAL 'N' DAY` with CURRENT_DATE the last stored day
+    end = stored[-1]
+    start = end - timedelta(days=days) if days else None
+    excluded = [address for name in exclude for address in EXCLUSIONS[name]()]
+    result = store.window(start, end, excluded)
+    if limit:
+        result = result.head(limit)
+    print(f"Window {start or stored[0]} to {end}: {len(result)} destinations.")
+    if output:
+        result.to_csv(output, index=False)
+        print(f"✅ Saved to {output}")
+    else:
+        print(result.to_string(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental per-day aggregates of Safe transaction destinations.")
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    refresh = commands.add_parser('refresh', help="Fetch the days after the last complete stored day.")
+    refresh.add_argument('--snapshot', help="Aggregate a local transactions snapshot instead of querying Dune.")
+    refresh.add_argument('--since', type=date.fromisoformat,
+                         help=f"First day to (re)fetch (default: after the last complete day, or {DEFAULT_BACKFILL_DAYS} days back).")
+    window = commands.add_parser('window', help="Answer a query from the stored partials.")
+    window.add_argument('--preset', choices=sorted(PRESETS), help="Reproduce a Dune query and write its output file.")
+    window.add_argument('--days', type=int, help="Window length in days (default: all stored days).")
+    window.add_argument('--exclude', action='append', default=[], choices=sorted(EXCLUSIONS))
+    window.add_argument('--limit', type=int)
+    window.add_argument('--output', help="Save the result as CSV instead of printing it.")
+    args = parser.parse_args()
+
+    store = DailyAggregateStore(args.store)
+    if args.command == 'window':
+        options = dict(PRESETS[args.preset]) if args.preset else {'days': None, 'exclude': [], 'limit': None, 'output': None}
+        for name in ('days', 'limit', 'output'):
+            if getattr(args, name) is not None:
+                options[name] = getattr(args, name)
+        answer_window(store, options['days'], options['exclude'] + args.exclude, options['limit'], options['output'])
+        return
+
+    if args.snapshot:
+        ok = refresh_from_snapshot(store, args.snapshot, args.since)
+    else:
+        today = datetime.now(timezone.utc).date()
+        start = args.since or store.refresh_start(today - timedelta(days=DEFAULT_BACKFILL_DAYS))
+        print(f"Fetching {start} to {today} from Dune...")
+        ok = refresh_from_dune(store, start, today, complete_before=today)
+    if not ok:
+        raise SystemExit("❌ Refresh stopped at a failed chunk; re-run to continue from there.")
+    print("✅ Aggregate store is up to date.")
+
+
+if __name__ == "__main__":
+    main()
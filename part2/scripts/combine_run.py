@@ -1,79 +1,106 @@
 import os
+import sys
+import argparse
+import numpy as np
 import pandas as pd
+from decode import MULTISEND_CONTRACTS
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.addresses import ADDRESS_DTYPE, address_keys, count_addresses, hex_addresses  # noqa: E402
+from common.tables import write_table  # noqa: E402
 
 # --- Configuration ---
 DIRECT_TXS_PATH = '../data/all_contracts_excluding_multisends.csv'
 MULTISEND_TXS_PATH = '../data/decoded.csv'
-OUTPUT_CSV_PATH = '../data/final_combined.csv'
+TARGETS_PATH = '../data/targets.csv'
+OUTPUT_TABLE = '../data/final_combined'
+
+EXCLUDED_DIRECT_KEYS = np.array(sorted(MULTISEND_CONTRACTS) + [b'\x00' * 20], dtype=ADDRESS_DTYPE)
+
+
+def _report(keys: np.ndarray, totals: np.ndarray) -> pd.DataFrame:
+    """Formats grouped address keys as the final report, sorted by total count."""
+    final_df = pd.DataFrame({
+        'address': hex_addresses(keys),
+        'amount_of_times_interacted_with': totals
+    })
+    final_df.sort_values(by='amount_of_times_interacted_with', ascending=False, inplace=True)
+    return final_df
+
+
+def combine_targets() -> pd.DataFrame:
+    """
+    Builds the same report from the normalized (tx_hash, safe, depth, target) stream
+    written by `decode.py --raw`. Direct calls (depth 0) are counted unless they go to a
+    MultiSend contract or the zero address, matching all_contracts_excluding_multisends.sql;
+    the top-level calls of each multiSend batch (depth 1) are counted, matching decoded.csv.
+    Calls inside nested batches (depth >= 2) stay in targets.csv but are not counted, so the
+    totals equal those of the three-query path.
+    """
+    print(f"Reading normalized targets from {TARGETS_PATH}...")
+    df_targets = pd.read_csv(TARGETS_PATH, usecols=['depth', 'target'])
+    target_keys = address_keys(df_targets['target'])
+
+    depths = df_targets['depth'].to_numpy()
+    counted = (depths == 1) | ((depths == 0) & ~np.isin(target_keys, EXCLUDED_DIRECT_KEYS))
+    return _report(*count_addresses(target_keys[counted]))
+
 
 def main():
     """
     Combines direct interaction counts with multisend interaction counts
     to create a final, aggregated report with just the address and total count.
     """
+    parser = argparse.ArgumentParser(description="Combine direct and multiSend interaction counts.")
+    parser.add_argument('--raw', action='store_true',
+                        help=f"Aggregate the single-pass output of `decode.py --raw` ({TARGETS_PATH}) instead.")
+    args = parser.parse_args()
+
+    if args.raw:
+        if not os.path.exists(TARGETS_PATH):
+            print(f"Error: {TARGETS_PATH} not found. Run `decode.py --raw` first.")
+            sys.exit(1)
+        final_df = combine_targets()
+        _save_report(final_df)
+        return
+
     print("Reading source CSV files...")
     if not os.path.exists(DIRECT_TXS_PATH) or not os.path.exists(MULTISEND_TXS_PATH):
         print("Error: Ensure both input files exist:")
         print(f"1. {DIRECT_TXS_PATH}")
         print(f"2. {MULTISEND_TXS_PATH}")
-        return
+        sys.exit(1)
 
-    df_direct = pd.read_csv(DIRECT_TXS_PATH)
-    df_multisend = pd.read_csv(MULTISEND_TXS_PATH)
-
-    # --- CHANGE: Normalize all address columns to lowercase right after loading ---
-    print("Normalizing addresses to lowercase...")
-    # Check if the column exists before trying to modify it
-    if 'destination_contract' in df_direct.columns:
-        df_direct['destination_contract'] = df_direct['destination_contract'].str.lower()
-    
-    if 'forwarded_to_address' in df_multisend.columns:
-        df_multisend['forwarded_to_address'] = df_multisend['forwarded_to_address'].str.lower()
-    # --- END OF CHANGE ---
-
-    print("Aggregating decoded multisend transaction counts...")
-    
-    # 1. Count the occurrences of each forwarded address from the multisend data
-    multisend_counts = df_multisend['forwarded_to_address'].value_counts().reset_index()
-    multisend_counts.columns = ['destination_contract', 'multisend_interaction_count']
+    df_direct = pd.read_csv(DIRECT_TXS_PATH, usecols=['destination_contract', 'interaction_count'])
+    df_multisend = pd.read_csv(MULTISEND_TXS_PATH, usecols=['forwarded_to_address'])
 
-    print("Merging direct and multisend interaction data...")
+    # Parse every address once into a 20-byte key; no lowercasing or string joins needed
+    print("Parsing addresses into 20-byte keys...")
+    direct_keys = address_keys(df_direct['destination_contract'])
+    multisend_keys = address_keys(df_multisend['forwarded_to_address'])
 
-    # 2. Merge the two dataframes using an 'outer' join
-    # This will now work correctly because the 'destination_contract' key is lowercase in both.
-    df_merged = pd.merge(
-        df_direct,
-        multisend_counts,
-        on='destination_contract',
-        how='outer'
-    )
-
-    # 3. Fill NaN values with 0 for counts
-    df_merged['interaction_count'] = df_merged['interaction_count'].fillna(0).astype(int)
-    df_merged['multisend_interaction_count'] = df_merged['multisend_interaction_count'].fillna(0).astype(int)
-    
-    print("Calculating final totals...")
+    print("Merging direct and multisend interaction data...")
 
-    # 4. Calculate the new total interaction count
-    df_merged['total_interaction_count'] = df_merged['interaction_count'] + df_merged['multisend_interaction_count']
+    # Each direct row carries its aggregated count, each decoded multisend row counts once.
+    # Grouping the concatenated keys is the outer merge and the sum in one step.
+    keys = np.concatenate([direct_keys, multisend_keys])
+    weights = np.concatenate([
+        df_direct['interaction_count'].fillna(0).to_numpy(dtype=np.int64),
+        np.ones(len(multisend_keys), dtype=np.int64)
+    ])
 
-    # 5. Finalize the dataframe for the report
-    final_df = df_merged[['destination_contract', 'total_interaction_count']].copy()
+    print("Calculating final totals...")
+    final_df = _report(*count_addresses(keys, weights))
 
-    final_df.rename(columns={
-        'destination_contract': 'address',
-        'total_interaction_count': 'amount_of_times_interacted_with'
-    }, inplace=True)
+    _save_report(final_df)
 
-    # Sort by the new total count
-    final_df.sort_values(by='amount_of_times_interacted_with', ascending=False, inplace=True)
 
-    # Ensure parent directory exists and save to CSV
-    os.makedirs(os.path.dirname(OUTPUT_CSV_PATH), exist_ok=True)
-    final_df.to_csv(OUTPUT_CSV_PATH, index=False)
+def _save_report(final_df: pd.DataFrame):
+    # Save as a typed table, with a CSV export for humans
+    output_path = write_table(final_df, OUTPUT_TABLE, export_csv=True)
 
     print(f"\n✅ Success! Final combined report has been created.")
-    print(f"Results saved to {OUTPUT_CSV_PATH}")
+    print(f"Results saved to {output_path} and {OUTPUT_TABLE}.csv")
     print("\n--- Sample of Final Combined Data ---")
     print(final_df.head(10).to_string(index=False))
 
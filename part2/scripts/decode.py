@@ -1,11 +1,26 @@
 import os
+import sys
+import argparse
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import pandas as pd
-from eth_abi import decode
-from eth_utils import to_checksum_address, keccak
+import pyarrow.parquet as pq
+from eth_utils import keccak
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.addresses import checksum_address  # noqa: E402
 
 # --- Configuration ---
 INPUT_CSV_PATH = '../data/multisend_transactions.csv'
 OUTPUT_CSV_PATH = '../data/decoded.csv'
+SKIPPED_CSV_PATH = '../data/decoded_skipped.csv'
+RAW_INPUT_CSV_PATH = '../data/safe_transactions.csv'
+TARGETS_CSV_PATH = '../data/targets.csv'
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_MAX_DEPTH = 4
+TARGET_COLUMNS = ['tx_hash', 'safe', 'depth', 'target', 'operation', 'value', 'selector']
 
 # --- Function Signatures and Selectors ---
 EXEC_TX_SIGNATURE = 'execTransaction(address,uint256,bytes,uint8,uint256,uint256,uint256,address,address,bytes)'
@@ -13,65 +28,202 @@ MULTISEND_SIGNATURE = 'multiSend(bytes)'
 
 EXEC_TX_SELECTOR = "0x" + keccak(text=EXEC_TX_SIGNATURE)[:4].hex()
 NESTED_MULTISEND_SELECTOR = "0x" + keccak(text=MULTISEND_SIGNATURE)[:4].hex()
+NESTED_MULTISEND_SELECTOR_BYTES = keccak(text=MULTISEND_SIGNATURE)[:4]
 
+# --- MultiSend contracts (same list as the part2 Dune queries) ---
+MULTISEND_CONTRACTS = {
+    bytes.fromhex('8D29bE29923b68abfDD21e541b9374737B49cdAD'), # v1.1.1
+    bytes.fromhex('A238CBeb142c10Ef7Ad8442C6D1f9E89e07e7761'), # v1.3.0
+    bytes.fromhex('40A2aCCbd92BCA938b02010E17A5b8929b49130D'), # v1.3.0 multisend callonly
+    bytes.fromhex('38869bf66a61cF6bDB996A6aE40D5853Fd43B526'), # v1.4.1
+    bytes.fromhex('9641d764fc13c8B624c04430C7356C1C7C8102e2'), # v1.4.1 multisend callonly
+}
 
-def decode_multisend_from_exec_tx(exec_tx_input: str) -> (list, str): # type: ignore
+# --- Packed multiSend layout: operation (1) + to (20) + value (32) + dataLength (32) + data ---
+PACKED_TX_HEADER_SIZE = 1 + 20 + 32 + 32
+
+
+def _read_word(view: memoryview, pos: int, end: int) -> int:
+    """Reads a 32-byte big-endian word at `pos`, failing like eth_abi does on short data."""
+    word = view[pos:min(pos + 32, end)]
+    if len(word) != 32:
+        raise ValueError(f"Tried to read 32 bytes, only got {len(word)} bytes.")
+    return int.from_bytes(word, 'big')
+
+
+def _locate_bytes_arg(view: memoryview, base: int, end: int, head_words: int, arg_index: int) -> (int, int): # type: ignore
     """
-    Decodes a multiSend call nested inside an execTransaction call.
+    Finds the `bytes` argument at head slot `arg_index` of an ABI tuple that starts at `base`.
+    Applies the same strict pointer, length and padding checks as `eth_abi.decode`
+    and returns the absolute (start, end) of the value without copying it.
+    """
+    head_pos = base + 32 * arg_index
+    offset = _read_word(view, head_pos, end)
+    if offset < 32 * head_words or base + offset >= end:
+        raise ValueError(f"Invalid pointer in tuple at location {32 * arg_index} in payload")
+
+    length_pos = base + offset
+    data_length = _read_word(view, length_pos, end)
+    padded_length = (data_length + 31) // 32 * 32
+    if padded_length > sys.maxsize:
+        raise OverflowError("cannot fit 'int' into an index-sized integer")
+    data_start = length_pos + 32
+    available = max(0, min(padded_length, end - data_start))
+    if available < padded_length:
+        raise ValueError(f"Tried to read {padded_length} bytes, only got {available} bytes")
+
+    data_end = data_start + data_length
+    padding = view[data_end:data_start + padded_length]
+    if any(padding):
+        raise ValueError(f"Padding bytes were not empty: {bytes(padding)!r}")
+    return data_start, data_end
+
+
+def _locate_exec_tx_data(raw: bytes, view: memoryview) -> (int, int): # type: ignore
+    """
+    Validates the head of decoded execTransaction arguments `raw` and locates `data`.
+    execTransaction(address to, uint256 value, bytes data, ...) is checked the way eth_abi
+    checks (address, uint256, bytes), so malformed encodings raise the same messages.
+    """
+    end = len(raw)
+    _read_word(view, 0, end)
+    if any(view[:12]):
+        raise ValueError(f"Padding bytes were not empty: {bytes(view[:12])!r}")
+    _read_word(view, 32, end)
+    return _locate_bytes_arg(view, 0, end, 3, 2)
+
+
+def _iter_packed_calls(raw: bytes, view: memoryview, packed_start: int, packed_end: int):
+    """
+    Walks tightly packed multiSend transactions in [packed_start, packed_end) and yields
+    (cursor, data_start, data_length) per call, where `cursor` points at its operation byte.
+    A record too short to hold its `to` raises like to_checksum_address would.
+    """
+    cursor = packed_start
+    while cursor < packed_end:
+        if cursor + 21 > packed_end:
+            partial_to = raw[cursor + 1:packed_end]
+            raise ValueError(f"Unknown format {partial_to!r}, attempted to normalize to '0x{partial_to.hex()}'")
+        data_len = int.from_bytes(view[cursor + 53:min(cursor + 85, packed_end)], 'big')
+        data_start = cursor + PACKED_TX_HEADER_SIZE
+        yield cursor, data_start, data_len
+        cursor = data_start + data_len
+
+
+def _multisend_targets(raw: bytes, view: memoryview) -> (list, str): # type: ignore
+    """
+    Expands the multiSend batch carried in the `data` argument of decoded execTransaction
+    arguments `raw`. Returns raw 20-byte targets, or a reason if `data` is not a multiSend.
+    """
+    nested_start, nested_end = _locate_exec_tx_data(raw, view)
+
+    # Check if the nested data is a multiSend call with a raw 4-byte compare
+    if not raw.startswith(NESTED_MULTISEND_SELECTOR_BYTES, nested_start, nested_end):
+        actual_selector = "0x" + raw[nested_start:min(nested_start + 4, nested_end)].hex()
+        return [], f"Nested call is not a multiSend. Actual selector: {actual_selector}"
+
+    # multiSend(bytes transactions): the argument tuple starts right after the selector
+    packed_start, packed_end = _locate_bytes_arg(view, nested_start + 4, nested_end, 1, 0)
+    return [raw[cursor + 1:cursor + 21] for cursor, _, _ in _iter_packed_calls(raw, view, packed_start, packed_end)], None
+
+
+def _expand_multisend(raw: bytes, view: memoryview, call_start: int, call_end: int, depth: int,
+                      max_depth: int, records: list, reasons: list):
+    """
+    Appends a (depth, operation, target, value, selector) record for every call in the multiSend
+    call data at [call_start, call_end), recursing into nested multiSend calls up to `max_depth`.
+    Everything is read from offsets into `raw`; no inner call data is copied or re-hexed.
+    A malformed batch is dropped as a whole and its error added to `reasons`.
+    """
+    first_record = len(records)
+    try:
+        packed_start, packed_end = _locate_bytes_arg(view, call_start + 4, call_end, 1, 0)
+        for cursor, data_start, data_len in _iter_packed_calls(raw, view, packed_start, packed_end):
+            data_end = min(data_start + data_len, packed_end)
+            selector = raw[data_start:data_start + 4] if data_end - data_start >= 4 else b''
+            value = int.from_bytes(view[cursor + 21:min(cursor + 53, packed_end)], 'big')
+            records.append((depth, raw[cursor], raw[cursor + 1:cursor + 21], value, selector))
+
+            if selector == NESTED_MULTISEND_SELECTOR_BYTES:
+                if depth < max_depth:
+                    _expand_multisend(raw, view, data_start, data_end, depth + 1, max_depth, records, reasons)
+                else:
+                    reasons.append(f"Nested multiSend at depth {depth} was not expanded (max depth {max_depth}).")
+    except Exception as e:
+        del records[first_record:]
+        reasons.append(f"A decoding error occurred at depth {depth}: {e}")
+
+
+def decode_multisend_targets(exec_tx_input: str) -> (list, str): # type: ignore
+    """
+    Fast path for `decode_multisend_from_exec_tx`.
+    Walks the execTransaction and multiSend encodings in place over a memoryview and
+    returns the inner targets as raw 20-byte values (checksum them at output time).
     """
     if not isinstance(exec_tx_input, str) or not exec_tx_input.startswith(EXEC_TX_SELECTOR):
-        # This case shouldn't happen with your data, but it's good practice.
         return [], "Input is not a valid execTransaction call."
 
     try:
-        # Decode the outer execTransaction call
-        exec_tx_abi_types = ['address', 'uint256', 'bytes']
-        exec_tx_data_bytes = bytes.fromhex(exec_tx_input[10:])
-        _, _, nested_data_bytes = decode(exec_tx_abi_types, exec_tx_data_bytes)
-
-        # Check if the nested data is a multiSend call
-        nested_data_hex = nested_data_bytes.hex()
-        if not nested_data_hex.startswith(NESTED_MULTISEND_SELECTOR[2:]):
-            actual_selector = "0x" + nested_data_hex[:8]
-            return [], f"Nested call is not a multiSend. Actual selector: {actual_selector}"
-
-        # Decode the multiSend(bytes) call
-        multisend_data_bytes = nested_data_bytes[4:]
-        packed_txs_bytes, = decode(['bytes'], multisend_data_bytes)
-
-        # Loop through the tightly packed inner transactions
-        forwarded_addresses = []
-        cursor = 0
-        while cursor < len(packed_txs_bytes):
-            to_bytes = packed_txs_bytes[cursor + 1 : cursor + 21]
-            data_len_bytes = packed_txs_bytes[cursor + 53 : cursor + 85]
-            data_len = int.from_bytes(data_len_bytes, 'big')
-            forwarded_addresses.append(to_checksum_address(to_bytes))
-            cursor += (1 + 20 + 32 + 32 + data_len)
-        
-        # On success, return the list of addresses and None for the reason
-        return forwarded_addresses, None
+        raw = bytes.fromhex(exec_tx_input[10:])
+        return _multisend_targets(raw, memoryview(raw))
+    except Exception as e:
+        return [], f"A decoding error occurred: {e}"
 
+
+def decode_exec_tx_targets(exec_tx_input: str, max_depth: int = DEFAULT_MAX_DEPTH) -> (list, str): # type: ignore
+    """
+    Decodes any execTransaction input into (depth, operation, raw 20-byte target, value, selector)
+    records. Depth 0 is the Safe's direct `to`, read from the same bytes as the Dune queries
+    (BYTEARRAY_SUBSTRING(input, 17, 20)). When `to` is a MultiSend contract the batch is
+    expanded in the same pass, recursing into nested multiSend calls up to `max_depth`.
+    """
+    if not isinstance(exec_tx_input, str) or not exec_tx_input.startswith(EXEC_TX_SELECTOR):
+        return [], "Input is not a valid execTransaction call."
+
+    try:
+        raw = bytes.fromhex(exec_tx_input[10:])
     except Exception as e:
         return [], f"A decoding error occurred: {e}"
+    if len(raw) < 32:
+        return [], "Input is too short to contain a destination address."
 
-def main():
-    """Main function that now prints the reason for skipping."""
-    print("--- Focused Decoder for execTransaction Calls ---")
-    
-    print(f"Reading transactions from {INPUT_CSV_PATH}...")
-    df = pd.read_csv(INPUT_CSV_PATH)
-    print("Decoding transactions...")
-    
+    view = memoryview(raw)
+    direct_target = raw[12:32]
+    try:
+        data_start, data_end = _locate_exec_tx_data(raw, view)
+        value = _read_word(view, 32, len(raw))
+        operation = _read_word(view, 96, len(raw))
+    except Exception as e:
+        return [(0, None, direct_target, None, None)], f"A decoding error occurred: {e}"
+
+    selector = raw[data_start:data_start + 4] if data_end - data_start >= 4 else b''
+    records = [(0, operation, direct_target, value, selector)]
+    if direct_target not in MULTISEND_CONTRACTS:
+        return records, None
+    if selector != NESTED_MULTISEND_SELECTOR_BYTES:
+        return records, f"Nested call is not a multiSend. Actual selector: 0x{selector.hex()}"
+
+    reasons = []
+    _expand_multisend(raw, view, data_start, data_end, 1, max_depth, records, reasons)
+    return records, "; ".join(reasons) or None
+
+
+def decode_multisend_from_exec_tx(exec_tx_input: str) -> (list, str): # type: ignore
+    """
+    Decodes a multiSend call nested inside an execTransaction call.
+    """
+    targets, reason = decode_multisend_targets(exec_tx_input)
+    return [checksum_address(target) for target in targets], reason
+
+
+def decode_chunk(chunk: pd.DataFrame) -> (list, list): # type: ignore
+    """Decodes a batch of multiSend transactions into forwarded-address records and skip reasons."""
     decoded_records = []
     skipped_txs = []
-    
-    for _, row in df.iterrows():
-        tx_hash = row['tx_hash']
-        input_data = row['input']
-        
+
+    for tx_hash, input_data in zip(chunk['tx_hash'], chunk['input']):
         addresses, reason = decode_multisend_from_exec_tx(input_data)
-        
+
         if addresses:
             for addr in addresses:
                 decoded_records.append({
@@ -81,6 +233,131 @@ def main():
         else:
             skipped_txs.append({'hash': tx_hash, 'reason': reason})
 
+    return decoded_records, skipped_txs
+
+
+def decode_raw_chunk(chunk: pd.DataFrame, max_depth: int = DEFAULT_MAX_DEPTH) -> (list, list): # type: ignore
+    """
+    Decodes a batch of raw execTransaction rows into normalized (tx_hash, safe, depth, target)
+    records, with each call's operation, value and 4-byte selector.
+    """
+    target_records = []
+    skipped_txs = []
+
+    for tx_hash, safe, input_data in zip(chunk['tx_hash'], chunk['address'], chunk['input']):
+        calls, reason = decode_exec_tx_targets(input_data, max_depth)
+
+        for depth, operation, target, value, selector in calls:
+            target_records.append({
+                'tx_hash': tx_hash,
+                'safe': safe,
+                'depth': depth,
+                'target': checksum_address(target),
+                'operation': operation,
+                'value': value,
+                'selector': '0x' + selector.hex() if selector else None
+            })
+        if reason:
+            skipped_txs.append({'hash': tx_hash, 'reason': reason})
+
+    return target_records, skipped_txs
+
+
+def resolve_input_path(csv_path: str) -> str:
+    """Prefers a Parquet export next to `csv_path` (run.py saves large Dune results as Parquet)."""
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    return parquet_path if os.path.exists(parquet_path) else csv_path
+
+
+def read_chunks(path: str, columns: list, chunk_size: int):
+    """Yields `columns` of a CSV or Parquet file as DataFrames of at most `chunk_size` rows."""
+    if path.endswith('.parquet'):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+
+
+def run_streaming(decode_fn, input_path: str, input_columns: list, output_path: str, output_columns: list,
+                  workers: int, chunk_size: int):
+    """
+    Streams `input_path` in chunks of `chunk_size` rows through `decode_fn`, in a process pool
+    when `workers` > 0. At most `2 * workers` chunks are in flight, and results are appended to
+    the output files in input order as they complete, so memory stays flat regardless of input size.
+    """
+    input_path = resolve_input_path(input_path)
+    print(f"Streaming transactions from {input_path} in chunks of {chunk_size} rows across {max(workers, 1)} worker(s)...")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    decoded_count = 0
+    skipped_count = 0
+    chunks = read_chunks(input_path, input_columns, chunk_size)
+
+    with open(output_path, 'w', newline='') as decoded_file, \
+         open(SKIPPED_CSV_PATH, 'w', newline='') as skipped_file, \
+         (ProcessPoolExecutor(max_workers=workers) if workers > 0 else nullcontext()) as executor:
+        pd.DataFrame(columns=output_columns).to_csv(decoded_file, index=False)
+        pd.DataFrame(columns=['hash', 'reason']).to_csv(skipped_file, index=False)
+
+        in_flight = deque()
+        for chunk in chunks:
+            if executor is None:
+                decoded_count, skipped_count = _write_chunk_result(decode_fn(chunk), decoded_file, skipped_file, decoded_count, skipped_count)
+                continue
+            in_flight.append(executor.submit(decode_fn, chunk))
+            while len(in_flight) >= 2 * workers:
+                decoded_count, skipped_count = _write_chunk_result(in_flight.popleft().result(), decoded_file, skipped_file, decoded_count, skipped_count)
+        while in_flight:
+            decoded_count, skipped_count = _write_chunk_result(in_flight.popleft().result(), decoded_file, skipped_file, decoded_count, skipped_count)
+
+    print(f"\n✅ Success! Decoding complete.")
+    print(f"   - Wrote {decoded_count} decoded rows.")
+    print(f"   Results saved to {output_path}")
+    if skipped_count:
+        print(f"   - Skipped {skipped_count} transaction(s). Reasons saved to {SKIPPED_CSV_PATH}")
+
+
+def _write_chunk_result(result: tuple, decoded_file, skipped_file, decoded_count: int, skipped_count: int) -> (int, int): # type: ignore
+    decoded_records, skipped_txs = result
+    if decoded_records:
+        pd.DataFrame(decoded_records).to_csv(decoded_file, header=False, index=False)
+    if skipped_txs:
+        pd.DataFrame(skipped_txs).to_csv(skipped_file, header=False, index=False)
+    return decoded_count + len(decoded_records), skipped_count + len(skipped_txs)
+
+
+def main():
+    """Main function that now prints the reason for skipping."""
+    parser = argparse.ArgumentParser(description="Decode multiSend targets from execTransaction inputs.")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Decode in parallel with this many processes, streaming the CSV in chunks.")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows per chunk in parallel mode.")
+    parser.add_argument('--raw', action='store_true',
+                        help=f"Decode every execTransaction in {RAW_INPUT_CSV_PATH} into {TARGETS_CSV_PATH}.")
+    parser.add_argument('--max-depth', type=int, default=DEFAULT_MAX_DEPTH,
+                        help="Deepest level of nested multiSend batches to expand in --raw mode.")
+    args = parser.parse_args()
+
+    print("--- Focused Decoder for execTransaction Calls ---")
+
+    if args.raw:
+        run_streaming(partial(decode_raw_chunk, max_depth=args.max_depth), RAW_INPUT_CSV_PATH, ['tx_hash', 'address', 'input'],
+                      TARGETS_CSV_PATH, TARGET_COLUMNS, args.workers, args.chunk_size)
+        return
+
+    if args.workers > 0:
+        run_streaming(decode_chunk, INPUT_CSV_PATH, ['tx_hash', 'input'],
+                      OUTPUT_CSV_PATH, ['tx_hash', 'forwarded_to_address'], args.workers, args.chunk_size)
+        return
+
+    input_path = resolve_input_path(INPUT_CSV_PATH)
+    print(f"Reading transactions from {input_path}...")
+    df = pd.read_parquet(input_path) if input_path.endswith('.parquet') else pd.read_csv(input_path)
+    print("Decoding transactions...")
+
+    decoded_records, skipped_txs = decode_chunk(df)
+
     output_df = pd.DataFrame(decoded_records)
     if not output_df.empty:
         os.makedirs(os.path.dirname(OUTPUT_CSV_PATH), exist_ok=True)
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.local_sql import DEFAULT_SNAPSHOT_PATH, LocalDune  # noqa: E402
+
+# --- Offline twin of run.py ---
+# Runs the same queries against a local snapshot of safe_ethereum.transactions instead of Dune
+# and writes the same files, so decode.py and combine_run.py work unchanged downstream.
+# The snapshot is the raw export of ../safe_transactions.sql (`run.py --raw`).
+# It keeps only the columns the pipeline uses, so `SELECT *` queries return a narrower table than
+# on Dune: multisend_transactions has tx_hash, address, block_date, block_time and input (plus
+# the implied method and success), not every column of safe_ethereum.transactions. decode.py
+# only reads tx_hash and input; the aggregate queries return the same columns as on Dune.
+# Edit a .sql file and re-run this script to re-rank with a different exclusion list or window.
+QUERIES = [
+    ('all_contracts', '../all_contracts.sql', '../data/all_contracts.csv'),
+    ('multisend_transactions', '../multisend_transactions.sql', '../data/multisend_transactions.parquet'),
+    ('all_contracts_excluding_multisends', '../all_contracts_excluding_multisends.sql',
+     '../data/all_contracts_excluding_multisends.csv'),
+]
+# query.sql ranks all Safe destinations; over a snapshot it covers the snapshot's time span
+TOP_CONTRACTS_QUERY = ('top_contracts', '../../query.sql', '../../data/top_interacted_contracts.csv')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Dune queries locally against a transactions snapshot.")
+    parser.add_argument('--snapshot', default=DEFAULT_SNAPSHOT_PATH,
+                        help="Parquet snapshot of safe_ethereum.transactions (a file or a glob).")
+    parser.add_argument('--as-of', help="UTC time NOW()/CURRENT_DATE refer to (default: the snapshot's latest block_time).")
+    parser.add_argument('--top', action='store_true', help=f"Run {TOP_CONTRACTS_QUERY[1]} instead of the part2 queries.")
+    parser.add_argument('--query', help="Run this .sql file instead and print its result (or save it with --output).")
+    parser.add_argument('--output', help="Where to save the result of --query (.csv or .parquet).")
+    args = parser.parse_args()
+
+    with LocalDune(args.snapshot, as_of=args.as_of) as local:
+        print(f"Running queries locally against {args.snapshot} as of {local.as_of} UTC...")
+        if args.query and not args.output:
+            with open(args.query) as f:
+                print(local.dune_result(f.read()).df().to_string(index=False))
+            return
+
+        queries = [(os.path.basename(args.query), args.query, args.output)] if args.query else \
+            [TOP_CONTRACTS_QUERY] if args.top else QUERIES
+        for name, sql_path, output_path in queries:
+            started = time.monotonic()
+            with open(sql_path) as f:
+                rows = local.export(f.read(), output_path)
+            print(f"  -> '{name}': saved {rows} rows to {output_path} in {time.monotonic() - started:.2f}s")
+    print("✅ Success! The results have been saved.")
+
+
+if __name__ == "__main__":
+    main()
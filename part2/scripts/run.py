@@ -1,8 +1,10 @@
 import os
-from dune_client.client import DuneClient
-from dune_client.query import QueryBase 
+import sys
+import argparse
 from dotenv import load_dotenv
-import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.dune import DuneJob, run_jobs  # noqa: E402
 
 load_dotenv()
 
@@ -11,7 +13,33 @@ DUNE_API_KEY = os.environ.get("DUNE_KEY")
 QUERY_ID_ALL_TOTALS = os.environ.get("ALL_CONTRACTS")
 QUERY_ID_MULTISEND_TOTALS = os.environ.get("MULTISEND_TRANSACTIONS")
 QUERY_ID_TOTALS_WITHOUT_MULTISEND = os.environ.get("ALL_CONTRACTS_EXCLUDING_MULTISENDS")
+# With --raw: a single raw export (safe_transactions.sql) that replaces the three queries above.
+# Decode it locally with `decode.py --raw` and aggregate with `combine_run.py --raw`.
+QUERY_ID_SAFE_TRANSACTIONS = os.environ.get("SAFE_TRANSACTIONS")
+# The queries cover the last 30 days, so a result from earlier today is reused instead of
+# re-executing (DUNE_MAX_AGE_HOURS=0 forces fresh executions).
+MAX_AGE_HOURS = 12
+
+parser = argparse.ArgumentParser(description="Run the part2 Dune queries and save their results.")
+parser.add_argument('--raw', action='store_true',
+                    help="Fetch the single raw export (SAFE_TRANSACTIONS) instead of the three queries.")
+args = parser.parse_args()
 print(DUNE_API_KEY, QUERY_ID_ALL_TOTALS, QUERY_ID_MULTISEND_TOTALS, QUERY_ID_TOTALS_WITHOUT_MULTISEND)
+if args.raw:
+    if not DUNE_API_KEY or not QUERY_ID_SAFE_TRANSACTIONS:
+        print(f"DUNE_API_KEY: {DUNE_API_KEY}")
+        print(f"QUERY_ID_SAFE_TRANSACTIONS: {QUERY_ID_SAFE_TRANSACTIONS}")
+        raise ValueError("Please fix these environment variables:")
+    print("Executing raw Safe transactions query on Dune...")
+    outcomes = run_jobs(DUNE_API_KEY, [
+        DuneJob('safe_transactions', QUERY_ID_SAFE_TRANSACTIONS, '../data/safe_transactions.parquet', format='parquet',
+                max_age_hours=MAX_AGE_HOURS),
+    ])
+    if isinstance(outcomes['safe_transactions'], Exception):
+        sys.exit(1)
+    print("✅ Success! The raw transactions have been saved to ../data/safe_transactions.parquet")
+    sys.exit(0)
+
 if not DUNE_API_KEY or not QUERY_ID_ALL_TOTALS or not QUERY_ID_MULTISEND_TOTALS or not QUERY_ID_TOTALS_WITHOUT_MULTISEND:
     print(f"DUNE_API_KEY: {DUNE_API_KEY}")
     print(f"QUERY_ID_ALL_TOTALS: {QUERY_ID_ALL_TOTALS}")
@@ -19,44 +47,25 @@ if not DUNE_API_KEY or not QUERY_ID_ALL_TOTALS or not QUERY_ID_MULTISEND_TOTALS
     print(f"QUERY_ID_TOTALS_WITHOUT_MULTISEND: {QUERY_ID_TOTALS_WITHOUT_MULTISEND}")
 
     raise ValueError("Please fix these environment variables:")
-  
-
-# Gets all contracts (multisend and non-multisend)
-query_all = QueryBase(
-    query_id=QUERY_ID_ALL_TOTALS
-)
-
-# Gets all multisend TRANSCATIONS
-query_multisend = QueryBase(
-    query_id=QUERY_ID_MULTISEND_TOTALS
-)
-
-# Gets all contracts that are not multisend contracts
-query_totals_without_multisend = QueryBase(
-    query_id=QUERY_ID_TOTALS_WITHOUT_MULTISEND
-)
-
-dune = DuneClient(DUNE_API_KEY)
-
-try:
-    # --- Execute the query and fetch the results ---
-    print("Executing queries on Dune...")
-    results_df = dune.run_query_dataframe(query=query_all)
-
-    results_df_multisend = dune.run_query_dataframe(query=query_multisend)
-
-    results_df_totals_without_multisend = dune.run_query_dataframe(query=query_totals_without_multisend)
-
-    output_filename = '../data/all_contracts.csv'
-    results_df.to_csv(output_filename, index=False)
 
-    output_filename_multisend = '../data/multisend_transactions.csv'
-    results_df_multisend.to_csv(output_filename_multisend, index=False)
 
-    output_filename_totals_without_multisend = '../data/all_contracts_excluding_multisends.csv'
-    results_df_totals_without_multisend.to_csv(output_filename_totals_without_multisend, index=False)
-    
-    print(f"✅ Success! The results have been saved.")
+jobs = [
+    # Gets all contracts (multisend and non-multisend)
+    DuneJob('all_contracts', QUERY_ID_ALL_TOTALS, '../data/all_contracts.csv', max_age_hours=MAX_AGE_HOURS),
+    # Gets all multisend TRANSCATIONS. Full calldata makes this result large, so it is paged
+    # straight to Parquet (decode.py reads it from there) and resumed if interrupted.
+    DuneJob('multisend_transactions', QUERY_ID_MULTISEND_TOTALS, '../data/multisend_transactions.parquet',
+            format='parquet', max_age_hours=MAX_AGE_HOURS),
+    # Gets all contracts that are not multisend contracts
+    DuneJob('all_contracts_excluding_multisends', QUERY_ID_TOTALS_WITHOUT_MULTISEND,
+            '../data/all_contracts_excluding_multisends.csv', max_age_hours=MAX_AGE_HOURS),
+]
 
-except Exception as e:
-    print(f"An error occurred: {e}")
\ No newline at end of file
+# --- Submit all queries at once; each result is saved as soon as its execution finishes ---
+# Recent stored results are reused, and results already in ../data/dune_cache are not downloaded again
+print("Executing queries on Dune...")
+outcomes = run_jobs(DUNE_API_KEY, jobs)
+# A failed query leaves its previous file in place, so the exit code tells pipeline.py it is stale
+if any(isinstance(outcome, Exception) for outcome in outcomes.values()):
+    sys.exit(1)
+print("✅ Success! The results have been saved.")
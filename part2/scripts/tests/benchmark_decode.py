@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import random
+import pandas as pd
+from eth_abi import decode, encode as encode_abi
+from eth_utils import to_checksum_address, to_bytes
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from decode import (  # noqa: E402
+    EXEC_TX_SELECTOR,
+    NESTED_MULTISEND_SELECTOR,
+    decode_multisend_from_exec_tx,
+)
+
+# --- Configuration ---
+INPUT_CSV_PATH = '../../data/multisend_transactions.csv'
+SYNTHETIC_TX_COUNT = 5000
+ROUNDS = 3
+
+EXEC_TX_ABI_TYPES = [
+    'address', 'uint256', 'bytes', 'uint8', 'uint256',
+    'uint256', 'uint256', 'address', 'address', 'bytes'
+]
+
+
+# --- Reference: the original eth_abi based decoder ---
+def decode_multisend_reference(exec_tx_input: str) -> (list, str): # type: ignore
+    """The eth_abi implementation the fast decoder replaced, kept verbatim for comparison."""
+    if not isinstance(exec_tx_input, str) or not exec_tx_input.startswith(EXEC_TX_SELECTOR):
+        return [], "Input is not a valid execTransaction call."
+
+    try:
+        exec_tx_abi_types = ['address', 'uint256', 'bytes']
+        exec_tx_data_bytes = bytes.fromhex(exec_tx_input[10:])
+        _, _, nested_data_bytes = decode(exec_tx_abi_types, exec_tx_data_bytes)
+
+        nested_data_hex = nested_data_bytes.hex()
+        if not nested_data_hex.startswith(NESTED_MULTISEND_SELECTOR[2:]):
+            actual_selector = "0x" + nested_data_hex[:8]
+            return [], f"Nested call is not a multiSend. Actual selector: {actual_selector}"
+
+        multisend_data_bytes = nested_data_bytes[4:]
+        packed_txs_bytes, = decode(['bytes'], multisend_data_bytes)
+
+        forwarded_addresses = []
+        cursor = 0
+        while cursor < len(packed_txs_bytes):
+            to_bytes_ = packed_txs_bytes[cursor + 1 : cursor + 21]
+            data_len_bytes = packed_txs_bytes[cursor + 53 : cursor + 85]
+            data_len = int.from_bytes(data_len_bytes, 'big')
+            forwarded_addresses.append(to_checksum_address(to_bytes_))
+            cursor += (1 + 20 + 32 + 32 + data_len)
+
+        return forwarded_addresses, None
+
+    except Exception as e:
+        return [], f"A decoding error occurred: {e}"
+
+
+# --- Synthetic input generation (same layout as reencode.py) ---
+def encode_single_transaction(to_address: bytes, value_in_wei: int, data: bytes) -> bytes:
+    return b'\x00' + to_address + value_in_wei.to_bytes(32, 'big') + len(data).to_bytes(32, 'big') + data
+
+def build_exec_tx_input(rng: random.Random, address_pool: list) -> str:
+    """Builds one execTransaction input wrapping a multiSend with a random number of inner calls."""
+    packed = b''.join(
+        encode_single_transaction(rng.choice(address_pool), rng.randrange(10**18), rng.randbytes(rng.choice([0, 4, 68, 260])))
+        for _ in range(rng.randint(1, 12))
+    )
+    multisend_payload = to_bytes(hexstr=NESTED_MULTISEND_SELECTOR) + encode_abi(['bytes'], [packed])
+    args = [
+        '0xA238CBeb142c10Ef7Ad8442C6D1f9E89e07e7761', 0, multisend_payload, 1,
+        0, 0, 0, '0x' + '00' * 20, '0x' + '00' * 20, rng.randbytes(65),
+    ]
+    return EXEC_TX_SELECTOR + encode_abi(EXEC_TX_ABI_TYPES, args).hex()
+
+def build_edge_cases(valid_input: str) -> list:
+    """Inputs that exercise every skip reason, so outputs are compared on failures too."""
+    not_multisend = EXEC_TX_SELECTOR + encode_abi(
+        EXEC_TX_ABI_TYPES,
+        ['0x' + '11' * 20, 0, bytes.fromhex('a9059cbb') + b'\x00' * 64, 0, 0, 0, 0, '0x' + '00' * 20, '0x' + '00' * 20, b''],
+    ).hex()
+    return [
+        None,
+        float('nan'),
+        '0xdeadbeef',
+        not_multisend,
+        valid_input[:11],
+        valid_input[:200],
+        valid_input[:len(valid_input) // 2],
+        valid_input[:10] + 'ff' + valid_input[12:],
+    ]
+
+def load_inputs() -> list:
+    if os.path.exists(INPUT_CSV_PATH):
+        print(f"Reading real inputs from {INPUT_CSV_PATH}...")
+        return pd.read_csv(INPUT_CSV_PATH, usecols=['input'])['input'].tolist()
+
+    print(f"{INPUT_CSV_PATH} not found, generating {SYNTHETIC_TX_COUNT} synthetic execTransaction inputs...")
+    rng = random.Random(0)
+    address_pool = [rng.randbytes(20) for _ in range(300)]
+    inputs = [build_exec_tx_input(rng, address_pool) for _ in range(SYNTHETIC_TX_COUNT)]
+    return inputs + build_edge_cases(inputs[0])
+
+
+def time_decoder(decoder, inputs: list) -> float:
+    best = float('inf')
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for exec_tx_input in inputs:
+            decoder(exec_tx_input)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print("--- multiSend Decoder Benchmark ---")
+    inputs = load_inputs()
+
+    # 1. Verify both decoders produce identical output
+    mismatches = 0
+    for exec_tx_input in inputs:
+        if decode_multisend_from_exec_tx(exec_tx_input) != decode_multisend_reference(exec_tx_input):
+            mismatches += 1
+    if mismatches:
+        print(f"❌ {mismatches} of {len(inputs)} inputs decoded differently!")
+        return
+    print(f"✅ Outputs match on all {len(inputs)} inputs.")
+
+    # 2. Time both decoders (best of ROUNDS)
+    reference_time = time_decoder(decode_multisend_reference, inputs)
+    fast_time = time_decoder(decode_multisend_from_exec_tx, inputs)
+
+    print(f"\n   - eth_abi decoder:    {reference_time:.3f}s ({len(inputs) / reference_time:,.0f} tx/s)")
+    print(f"   - memoryview decoder: {fast_time:.3f}s ({len(inputs) / fast_time:,.0f} tx/s)")
+    print(f"   - Speedup: {reference_time / fast_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import subprocess
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+
+# The stage scripts read .env themselves; load it here too so env fingerprints and the
+# --raw check see the same values
+load_dotenv()
+
+# --- Configuration ---
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.path.join(ROOT, '.pipeline_state.json')
+COMMON_CODE = ['common/addresses.py', 'common/tables.py', 'common/ratelimit.py']
+
+
+@dataclass
+class Stage:
+    """
+    One step of the pipeline. `inputs`, `outputs` and `code` are paths relative to the repo root.
+    Dependencies are derived from files: a stage depends on whichever stage writes its inputs.
+    """
+    name: str
+    script: str = None            # run as `python <script> <args>` from the script's directory
+    args: list = field(default_factory=list)
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+    code: list = field(default_factory=list)
+    env: list = field(default_factory=list)   # environment variables that change the result
+    fetches: bool = False         # pulls remote data: only re-run on --refresh or when code/env change
+
+
+STAGES = [
+    # --- Dune fetches ---
+    Stage('top_contracts', 'getter_functions/top_contracts.py',
+          outputs=['data/top_interacted_contracts.csv'],
+          code=['common/dune.py', 'common/dune_cache.py'],
+          env=['TOP_CONTRACTS_QUERY', 'DUNE_MAX_AGE_HOURS'], fetches=True),
+    Stage('run', 'part2/scripts/run.py',
+          outputs=['part2/data/all_contracts.csv', 'part2/data/multisend_transactions.parquet',
+                   'part2/data/all_contracts_excluding_multisends.csv'],
+          code=['common/dune.py', 'common/dune_cache.py'],
+          env=['ALL_CONTRACTS', 'MULTISEND_TRANSACTIONS', 'ALL_CONTRACTS_EXCLUDING_MULTISENDS', 'DUNE_MAX_AGE_HOURS'],
+          fetches=True),
+
+    # --- part2: decode and combine ---
+    Stage('decode', 'part2/scripts/decode.py', args=['--workers', str(os.cpu_count() or 1)],
+          inputs=['part2/data/multisend_transactions.parquet'],
+          outputs=['part2/data/decoded.csv']),
+    Stage('combine', 'part2/scripts/combine_run.py',
+          inputs=['part2/data/all_contracts_excluding_multisends.csv', 'part2/data/decoded.csv'],
+          outputs=['part2/data/final_combined.parquet', 'part2/data/final_combined.csv'],
+          code=['part2/scripts/decode.py']),
+    Stage('publish_combined',
+          inputs=['part2/data/final_combined.parquet', 'part2/data/final_combined.csv'],
+          outputs=['data/final_combined.parquet', 'data/final_combined.csv']),
+
+    # --- Enrichment ---
+    Stage('custom_label', 'formatting_functions/custom_label.py',
+          inputs=['data/final_combined.parquet', 'eth_labels/accounts.csv', 'eth_labels/tokens.csv', 'query.sql'],
+          outputs=['data/final_combined_1.parquet'],
+          code=['formatting_functions/label_index.py', 'formatting_functions/prefilter.py']),
+    Stage('etherscan', 'formatting_functions/etherscan.py', args=['--resume'],
+          inputs=['data/final_combined_1.parquet', 'query.sql'],
+          outputs=['data/final_combined_2.parquet'],
+          code=['formatting_functions/etherscan_client.py', 'formatting_functions/etherscan_cache.py',
+                'formatting_functions/rpc.py', 'formatting_functions/bytecode.py', 'formatting_functions/proxies.py',
+                'formatting_functions/code_groups.py', 'formatting_functions/prefilter.py'],
+          env=['ETHEREUM_RPC_URL']),
+    Stage('get_symbols', 'formatting_functions/get_symbols.py',
+          inputs=['data/final_combined_2.parquet', 'eth_labels/tokens.csv'],
+          outputs=['data/final_combined_3.parquet'],
+          code=['formatting_functions/rpc.py', 'formatting_functions/multicall.py',
+                'formatting_functions/token_metadata.py'],
+          env=['ETHEREUM_RPC_URL']),
+    Stage('filter_protocols', 'formatting_functions/filter_protocols.py',
+          inputs=['data/final_combined_3.parquet'],
+          outputs=['data/final_combined_4.parquet', 'data/final_combined_4.csv'],
+          code=['formatting_functions/prefilter.py']),
+]
+
+# --stream replaces the four enrichment stages with one pass that overlaps them per row
+STREAMED_STAGES = {'custom_label', 'etherscan', 'get_symbols', 'filter_protocols'}
+STREAM_STAGE = Stage('stream_enrich', 'formatting_functions/stream_enrich.py',
+                     inputs=['data/final_combined.parquet', 'eth_labels/accounts.csv', 'eth_labels/tokens.csv',
+                             'query.sql'],
+                     outputs=['data/final_combined_3.parquet', 'data/final_combined_4.parquet',
+                              'data/final_combined_4.csv'],
+                     code=['formatting_functions/label_index.py', 'formatting_functions/etherscan.py',
+                           'formatting_functions/etherscan_client.py', 'formatting_functions/etherscan_cache.py',
+                           'formatting_functions/rpc.py', 'formatting_functions/bytecode.py',
+                           'formatting_functions/proxies.py', 'formatting_functions/multicall.py',
+                           'formatting_functions/token_metadata.py', 'formatting_functions/prefilter.py'],
+                     env=['ETHEREUM_RPC_URL'])
+
+# --local runs the Dune queries offline with DuckDB against a snapshot of safe_ethereum.transactions
+LOCAL_SNAPSHOT = 'part2/data/safe_transactions.parquet'
+LOCAL_STAGES = {
+    'top_contracts': Stage('top_contracts_local', 'part2/scripts/local_run.py', args=['--top'],
+                           inputs=[LOCAL_SNAPSHOT, 'query.sql'],
+                           outputs=['data/top_interacted_contracts.csv'],
+                           code=['common/local_sql.py']),
+    'run': Stage('run_local', 'part2/scripts/local_run.py',
+                 inputs=[LOCAL_SNAPSHOT, 'part2/all_contracts.sql', 'part2/multisend_transactions.sql',
+                         'part2/all_contracts_excluding_multisends.sql'],
+                 outputs=['part2/data/all_contracts.csv', 'part2/data/multisend_transactions.parquet',
+                          'part2/data/all_contracts_excluding_multisends.csv'],
+                 code=['common/local_sql.py']),
+}
+
+# --raw replaces the three part2 queries with the single raw export of safe_transactions.sql
+# (SAFE_TRANSACTIONS query id), decoded with `decode.py --raw` and counted with `combine_run.py --raw`
+RAW_EXPORT = 'part2/data/safe_transactions.parquet'
+RAW_STAGES = {
+    'run': Stage('run_raw', 'part2/scripts/run.py', args=['--raw'],
+                 outputs=[RAW_EXPORT],
+                 code=['common/dune.py', 'common/dune_cache.py'],
+                 env=['SAFE_TRANSACTIONS', 'DUNE_MAX_AGE_HOURS'], fetches=True),
+    'decode': Stage('decode_raw', 'part2/scripts/decode.py', args=['--raw', '--workers', str(os.cpu_count() or 1)],
+                    inputs=[RAW_EXPORT],
+                    outputs=['part2/data/targets.csv']),
+    'combine': Stage('combine_raw', 'part2/scripts/combine_run.py', args=['--raw'],
+                     inputs=['part2/data/targets.csv'],
+                     outputs=['part2/data/final_combined.parquet', 'part2/data/final_combined.csv'],
+                     code=['part2/scripts/decode.py']),
+}
+
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(stage: Stage) -> str:
+    """Hashes everything a stage's result depends on: its code, its input files and its env vars."""
+    digest = hashlib.sha256(stage.name.encode())
+    code = ([stage.script] if stage.script else []) + stage.code + (COMMON_CODE if stage.script else [])
+    for rel_path in code + stage.inputs:
+        path = os.path.join(ROOT, rel_path)
+        digest.update(rel_path.encode())
+        digest.update(_hash_file(path).encode() if os.path.exists(path) else b'missing')
+    digest.update(json.dumps(stage.args).encode())
+    for name in stage.env:
+        digest.update(f"{name}={hashlib.sha256(os.environ.get(name, '').encode()).hexdigest()}".encode())
+    return digest.hexdigest()
+
+
+def build_graph(stages: list) -> dict:
+    """Maps each stage name to the names of the stages that write its inputs."""
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    return {stage.name: {producers[path] for path in stage.inputs if path in producers} for stage in stages}
+
+
+def load_state() -> dict:
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state: dict):
+    tmp_path = STATE_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def is_up_to_date(stage: Stage, state: dict, forced: set) -> bool:
+    if stage.name in forced:
+        return False
+    recorded = state.get(stage.name)
+    if not recorded or recorded['fingerprint'] != fingerprint(stage):
+        return False
+    # Outputs must still exist and be the files this stage wrote
+    for rel_path in stage.outputs:
+        path = os.path.join(ROOT, rel_path)
+        if not os.path.exists(path) or recorded['outputs'].get(rel_path) != _hash_file(path):
+            return False
+    return True
+
+
+def _output_stamps(stage: Stage) -> dict:
+    """The mtime of each declared output (None if missing), to tell rewritten files from stale ones."""
+    stamps = {}
+    for rel_path in stage.outputs:
+        path = os.path.join(ROOT, rel_path)
+        stamps[rel_path] = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+    return stamps
+
+
+def run_stage(stage: Stage) -> bool:
+    """
+    Runs one stage and reports whether it succeeded: it exited with 0 and wrote every declared
+    output during this run. Outputs left over from an earlier run do not count, so a script
+    that fails without a non-zero exit code does not get stale files recorded as its result.
+    """
+    before = _output_stamps(stage)
+    if stage.script is None:
+        for src, dst in zip(stage.inputs, stage.outputs):
+            shutil.copyfile(os.path.join(ROOT, src), os.path.join(ROOT, dst))
+    else:
+        script_path = os.path.join(ROOT, stage.script)
+        result = subprocess.run([sys.executable, os.path.basename(script_path), *stage.args],
+                                cwd=os.path.dirname(script_path))
+        if result.returncode != 0:
+            print(f"❌ Stage '{stage.name}' exited with code {result.returncode}.")
+            return False
+
+    after = _output_stamps(stage)
+    missing = [path for path in stage.outputs if after[path] is None]
+    if missing:
+        print(f"❌ Stage '{stage.name}' did not produce: {', '.join(missing)}")
+        return False
+    stale = [path for path in stage.outputs if after[path] == before[path]]
+    if stale:
+        print(f"❌ Stage '{stage.name}' did not rewrite: {', '.join(stale)}")
+        return False
+    return True
+
+
+def run_pipeline(stages: list, forced: set, dry_run: bool = False, max_parallel: int = 4) -> bool:
+    """
+    Runs stages in dependency order, up to `max_parallel` at a time. A stage is skipped when
+    its fingerprint matches the last successful run and its outputs are untouched. Because
+    fingerprints hash input contents, a re-run upstream stage that writes identical output
+    does not invalidate anything downstream.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    graph = build_graph(stages)
+    state = load_state()
+    done, failed = set(), set()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        while len(done) + len(failed) < len(stages):
+            for name, deps in graph.items():
+                if name in done or name in failed or name in running.values():
+                    continue
+                if deps & failed:
+                    print(f"⏭️  Skipping '{name}': an upstream stage failed.")
+                    failed.add(name)
+                    continue
+                if not deps <= done:
+                    continue
+
+                stage = by_name[name]
+                if is_up_to_date(stage, state, forced):
+                    print(f"✅ '{name}' is up to date.")
+                    done.add(name)
+                elif dry_run:
+                    print(f"▶️  Would run '{name}'.")
+                    done.add(name)
+                else:
+                    print(f"▶️  Running '{name}'...")
+                    running[executor.submit(run_stage, stage)] = name
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                stage = by_name[name]
+                if future.result():
+                    state[name] = {
+                        'fingerprint': fingerprint(stage),
+                        'outputs': {path: _hash_file(os.path.join(ROOT, path)) for path in stage.outputs}
+                    }
+                    save_state(state)
+                    done.add(name)
+                else:
+                    failed.add(name)
+
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the pipeline, skipping stages whose inputs and code are unchanged.")
+    parser.add_argument('--refresh', action='store_true', help="Re-fetch remote data (re-run all Dune stages; recent Dune results are still reused).")
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE', help="Always re-run this stage.")
+    parser.add_argument('--dry-run', action='store_true', help="Only print which stages would run.")
+    parser.add_argument('--parallel', type=int, default=4, help="Maximum number of stages to run at once.")
+    parser.add_argument('--stream', action='store_true',
+                        help="Run the enrichment stages as one streaming pass (stream_enrich.py).")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--local', action='store_true',
+                        help=f"Run the Dune queries offline against {LOCAL_SNAPSHOT} (local_run.py).")
+    source.add_argument('--raw', action='store_true',
+                        help=f"Fetch the raw SAFE_TRANSACTIONS export into {RAW_EXPORT} and decode it in one pass.")
+    args = parser.parse_args()
+    stages = [stage for stage in STAGES if stage.name not in STREAMED_STAGES] + [STREAM_STAGE] if args.stream else STAGES
+    if args.local:
+        stages = [LOCAL_STAGES.get(stage.name, stage) for stage in stages]
+    if args.raw:
+        if not os.environ.get('SAFE_TRANSACTIONS'):
+            parser.error("--raw needs SAFE_TRANSACTIONS (the query id of part2/safe_transactions.sql).")
+        stages = [RAW_STAGES.get(stage.name, stage) for stage in stages]
+
+    unknown = set(args.force) - {stage.name for stage in stages}
+    if unknown:
+        parser.error(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+
+    forced = set(args.force) | ({stage.name for stage in stages if stage.fetches} if args.refresh else set())
+    if run_pipeline(stages, forced, args.dry_run, args.parallel):
+        print("\n✅ Pipeline complete.")
+    else:
+        print("\n❌ Pipeline finished with failures.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
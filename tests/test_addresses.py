@@ -0,0 +1,73 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.addresses import (  # noqa: E402
+    ADDRESS_DTYPE, address_keys, build_lookup, checksum_address, count_addresses, hex_address, hex_addresses,
+    lookup, parse_address,
+)
+
+# --- 20-byte address keys (common/addresses.py) ---
+USDT = '0xdAC17F958D2ee523a2206206994597C13D831ec7'
+TRAILING_ZERO = '0x' + 'ab' * 19 + '00'     # NumPy 'S20' drops trailing NUL bytes
+ZERO = '0x' + '00' * 20
+
+
+@pytest.mark.parametrize('address', [USDT, USDT.lower(), USDT.upper().replace('0X', '0x'), USDT[2:], '0X' + USDT[2:]])
+def test_parse_address_accepts_any_hex_form(address):
+    assert parse_address(address) == bytes.fromhex(USDT[2:])
+
+
+def test_parse_address_accepts_raw_bytes():
+    raw = bytes.fromhex(USDT[2:])
+    assert parse_address(raw) == raw
+    assert parse_address(bytearray(raw)) == raw
+    assert parse_address(memoryview(raw)) == raw
+
+
+@pytest.mark.parametrize('address', ['0x1234', USDT + '00', b'\x01' * 19])
+def test_parse_address_rejects_wrong_lengths(address):
+    with pytest.raises(ValueError):
+        parse_address(address)
+
+
+@pytest.mark.parametrize('address', [USDT, TRAILING_ZERO, ZERO])
+def test_single_key_round_trips(address):
+    key = parse_address(address)
+    assert hex_address(key) == address.lower()
+    assert checksum_address(key) == checksum_address(parse_address(address.lower()))
+
+
+def test_checksum_address_is_eip55():
+    assert checksum_address(parse_address(USDT.lower())) == USDT
+
+
+def test_address_keys_round_trip_through_hex_addresses():
+    addresses = [USDT, TRAILING_ZERO, ZERO, USDT.lower()]
+    keys = address_keys(addresses)
+    assert keys.dtype == ADDRESS_DTYPE
+    assert hex_addresses(keys) == [address.lower() for address in addresses]
+    assert [hex_address(key) for key in keys] == hex_addresses(keys)
+
+
+def test_address_keys_mixed_inputs_match_the_fast_path():
+    hex_only = address_keys([USDT, TRAILING_ZERO])
+    mixed = address_keys([bytes.fromhex(USDT[2:]), TRAILING_ZERO[2:]])
+    assert np.array_equal(hex_only, mixed)
+    assert len(address_keys([])) == 0
+
+
+def test_count_addresses_groups_case_insensitively():
+    keys, totals = count_addresses(address_keys([USDT, USDT.lower(), ZERO]))
+    assert hex_addresses(keys) == [ZERO, USDT.lower()]
+    assert totals.tolist() == [1, 2]
+    _, weighted = count_addresses(address_keys([USDT, USDT.lower()]), weights=np.array([3, 4]))
+    assert weighted.tolist() == [7]
+
+
+def test_lookup_keeps_the_first_value_per_key():
+    table = build_lookup(address_keys([USDT, TRAILING_ZERO, USDT.lower()]), ['first', 'other', 'second'])
+    result = lookup(address_keys([USDT, ZERO, TRAILING_ZERO]), table, default='missing')
+    assert result.tolist() == ['first', 'missing', 'other']
@@ -0,0 +1,29 @@
+import os
+import sys
+import json
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'formatting_functions'))
+from bytecode import FIXTURES_PATH, classify_code, extract_selectors  # noqa: E402
+
+# --- Selector classification fixtures (formatting_functions/fixtures/bytecode.json) ---
+with open(FIXTURES_PATH) as f:
+    FIXTURES = json.load(f)
+
+
+@pytest.mark.parametrize('name', sorted(FIXTURES))
+def test_fixture_classification(name):
+    fixture = FIXTURES[name]
+    assert classify_code(bytes.fromhex(fixture['code'].removeprefix('0x'))) == fixture['expected']
+
+
+@pytest.mark.parametrize('name', sorted(name for name, fixture in FIXTURES.items() if 'dispatched' in fixture))
+def test_dispatcher_selectors_of_compiled_code_are_found(name):
+    """Real solc output: every function in the ABI is found (PUSH4s of external calls may be found too)."""
+    fixture = FIXTURES[name]
+    dispatched = {bytes.fromhex(selector.removeprefix('0x')) for selector in fixture['dispatched']}
+    assert dispatched <= extract_selectors(bytes.fromhex(fixture['code'].removeprefix('0x')))
+
+
+def test_no_code_is_an_eoa():
+    assert classify_code(b'') == "EOA"
@@ -0,0 +1,86 @@
+import os
+import sys
+from datetime import date
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import hyperloglog as hll  # noqa: E402
+from common.daily_aggregates import RESULT_COLUMNS, DailyAggregateStore, build_partials  # noqa: E402
+
+# --- Per-day partial aggregates (common/daily_aggregates.py) ---
+ROUTER = '0x' + 'aa' * 20
+TOKEN = '0x' + 'bb' * 20
+ZERO = '0x' + '00' * 20
+SAFES = ['0x' + f'{i:040x}' for i in range(1, 6)]
+DAY_1, DAY_2, DAY_3 = date(2024, 3, 1), date(2024, 3, 2), date(2024, 3, 3)
+
+
+def rows(*entries) -> pd.DataFrame:
+    """(day, destination, safe) entries as the daily_destinations.sql result."""
+    return pd.DataFrame(entries, columns=['block_date', 'destination_contract', 'safe_wallet'])
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DailyAggregateStore(str(tmp_path / 'daily_aggregates'))
+    store.add_rows(rows(
+        (DAY_1, ROUTER, SAFES[0]), (DAY_1, ROUTER, SAFES[0]), (DAY_1, ROUTER, SAFES[1]), (DAY_1, TOKEN, SAFES[2]),
+        (DAY_2, ROUTER, SAFES[1]), (DAY_2, ROUTER, SAFES[3]),
+        (DAY_3, TOKEN, SAFES[4]), (DAY_3, ZERO, SAFES[4]),
+    ), DAY_1, DAY_3, complete_before=DAY_3)
+    return store
+
+
+def test_build_partials_groups_by_day_and_destination():
+    partials = build_partials(rows(
+        ('2024-03-01', ROUTER, SAFES[0]), ('2024-03-01', ROUTER, SAFES[0]), ('2024-03-01', ROUTER.upper().replace('0X', '0x'), SAFES[1]),
+        ('2024-03-01', ZERO, SAFES[1]), ('2024-03-02', TOKEN, SAFES[2]),
+    ))
+    assert sorted(partials) == [DAY_1, DAY_2]
+    day_1 = partials[DAY_1].to_pydict()
+    assert day_1['destination_contract'] == [bytes.fromhex('aa' * 20)]       # the zero address is dropped
+    assert day_1['interaction_count'] == [3]
+    assert day_1['first_interaction_date'] == day_1['last_interaction_date'] == [DAY_1]
+    sketches = partials[DAY_1].column('safe_sketch').combine_chunks()
+    assert hll.estimate(sketches.offsets.to_numpy(), sketches.values.to_numpy()).tolist() == [2]
+    assert build_partials(rows()) == {}
+
+
+def test_build_partials_sums_interactions_when_given():
+    df = rows((DAY_1, ROUTER, SAFES[0]), (DAY_1, ROUTER, SAFES[1]))
+    df['interactions'] = [4, 5]
+    assert build_partials(df)[DAY_1].column('interaction_count').to_pylist() == [9]
+
+
+def test_refresh_start_is_the_day_after_the_last_complete_day(store, tmp_path):
+    assert store.days() == [DAY_1, DAY_2, DAY_3]
+    assert [store.is_complete(day) for day in store.days()] == [True, True, False]
+    assert store.refresh_start(date(2024, 1, 1)) == DAY_3          # the incomplete day is fetched again
+    assert DailyAggregateStore(str(tmp_path / 'empty')).refresh_start(date(2024, 1, 1)) == date(2024, 1, 1)
+
+
+def test_refresh_replaces_the_incomplete_day(store):
+    store.add_rows(rows((DAY_3, ROUTER, SAFES[2])), DAY_3, date(2024, 3, 4), complete_before=date(2024, 3, 4))
+    assert store.refresh_start(date(2024, 1, 1)) == date(2024, 3, 4)
+    assert store.is_complete(DAY_3)
+    assert len(store.read(DAY_3, DAY_3)) == 1                       # TOKEN's old partial row is gone
+    assert len(store.read(date(2024, 3, 4))) == 0                   # a day without rows is stored empty
+
+
+def test_window_merges_days_per_destination(store):
+    result = store.window()
+    assert list(result.columns) == RESULT_COLUMNS
+    assert result.to_dict('records') == [
+        {'destination_contract': '0x' + 'AA' * 20, 'interaction_count': 5, 'unique_safe_wallets': 3,
+         'first_interaction_date': '2024-03-01', 'last_interaction_date': '2024-03-02'},
+        {'destination_contract': '0x' + 'BB' * 20, 'interaction_count': 2, 'unique_safe_wallets': 2,
+         'first_interaction_date': '2024-03-01', 'last_interaction_date': '2024-03-03'},
+    ]
+
+
+def test_window_bounds_and_exclusions(store):
+    assert store.window(start=DAY_2)['interaction_count'].tolist() == [2, 1]
+    assert store.window(end=DAY_1)['unique_safe_wallets'].tolist() == [2, 1]
+    assert store.window(exclude=[ROUTER])['destination_contract'].tolist() == ['0x' + 'BB' * 20]
+    assert store.window(start=date(2025, 1, 1)).empty
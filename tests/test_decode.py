@@ -0,0 +1,127 @@
+import os
+import sys
+import random
+import pytest
+from eth_abi import decode, encode as encode_abi
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'part2', 'scripts', 'tests'))
+from benchmark_decode import (  # noqa: E402
+    EXEC_TX_ABI_TYPES, build_edge_cases, build_exec_tx_input, decode_multisend_reference,
+)
+from decode import (  # noqa: E402
+    EXEC_TX_SELECTOR, NESTED_MULTISEND_SELECTOR_BYTES, decode_exec_tx_targets, decode_multisend_from_exec_tx,
+)
+
+# --- The memoryview decoders against the eth_abi reference (part2/scripts/tests/benchmark_decode.py) ---
+MULTISEND = bytes.fromhex('A238CBeb142c10Ef7Ad8442C6D1f9E89e07e7761')
+ZERO = bytes(20)
+TOKEN = bytes.fromhex('11' * 20)
+SPENDER = bytes.fromhex('22' * 20)
+TRANSFER = bytes.fromhex('a9059cbb') + bytes(64)
+
+
+def packed_call(to: bytes, data: bytes = b'', operation: int = 0, value: int = 0) -> bytes:
+    return bytes([operation]) + to + value.to_bytes(32, 'big') + len(data).to_bytes(32, 'big') + data
+
+
+def multisend_call(*calls: bytes) -> bytes:
+    return NESTED_MULTISEND_SELECTOR_BYTES + encode_abi(['bytes'], [b''.join(calls)])
+
+
+def exec_tx_input(to: bytes, data: bytes) -> str:
+    args = ['0x' + to.hex(), 0, data, 1, 0, 0, 0, '0x' + '00' * 20, '0x' + '00' * 20, b'']
+    return EXEC_TX_SELECTOR + encode_abi(EXEC_TX_ABI_TYPES, args).hex()
+
+
+def reference_targets(call_data: bytes, depth: int, max_depth: int) -> list:
+    """(depth, target) of every call in multiSend `call_data`, expanded with eth_abi like the original decoder."""
+    packed, = decode(['bytes'], call_data[4:])
+    targets = []
+    cursor = 0
+    while cursor < len(packed):
+        to = packed[cursor + 1:cursor + 21]
+        data_len = int.from_bytes(packed[cursor + 53:cursor + 85], 'big')
+        data = packed[cursor + 85:cursor + 85 + data_len]
+        targets.append((depth, to))
+        if data[:4] == NESTED_MULTISEND_SELECTOR_BYTES and depth < max_depth:
+            targets += reference_targets(data, depth + 1, max_depth)
+        cursor += 85 + data_len
+    return targets
+
+
+def batch_targets(exec_input: str, max_depth: int = 4) -> (list, str): # type: ignore
+    records, reason = decode_exec_tx_targets(exec_input, max_depth)
+    return [(depth, target) for depth, _, target, _, _ in records if depth > 0], reason
+
+
+NESTED_BATCH = multisend_call(
+    packed_call(TOKEN, TRANSFER),
+    packed_call(MULTISEND, multisend_call(
+        packed_call(SPENDER),
+        packed_call(MULTISEND, multisend_call(packed_call(TOKEN, TRANSFER)), operation=1),
+    ), operation=1),
+    packed_call(SPENDER, value=10**18),
+)
+
+
+def test_top_level_targets_match_the_reference():
+    rng = random.Random(0)
+    address_pool = [rng.randbytes(20) for _ in range(50)]
+    inputs = [build_exec_tx_input(rng, address_pool) for _ in range(200)]
+    for exec_input in inputs + build_edge_cases(inputs[0]):
+        assert decode_multisend_from_exec_tx(exec_input) == decode_multisend_reference(exec_input)
+
+
+def test_nested_batches_are_expanded_like_the_reference():
+    targets, reason = batch_targets(exec_tx_input(MULTISEND, NESTED_BATCH))
+    assert reason is None
+    assert targets == reference_targets(NESTED_BATCH, 1, 4)
+    assert [depth for depth, _ in targets] == [1, 1, 2, 2, 3, 1]
+    # The old decoder only reads the top level, which is exactly the depth 1 records
+    top_level, _ = decode_multisend_reference(exec_tx_input(MULTISEND, NESTED_BATCH))
+    assert [target for depth, target in targets if depth == 1] == [bytes.fromhex(a[2:]) for a in top_level]
+
+
+@pytest.mark.parametrize('max_depth', [1, 2])
+def test_max_depth_stops_expansion(max_depth):
+    targets, reason = batch_targets(exec_tx_input(MULTISEND, NESTED_BATCH), max_depth)
+    assert targets == reference_targets(NESTED_BATCH, 1, max_depth)
+    assert max(depth for depth, _ in targets) == max_depth
+    assert reason == f"Nested multiSend at depth {max_depth} was not expanded (max depth {max_depth})."
+
+
+def test_direct_call_is_a_single_depth_zero_record():
+    records, reason = decode_exec_tx_targets(exec_tx_input(TOKEN, TRANSFER))
+    assert reason is None
+    assert records == [(0, 1, TOKEN, 0, TRANSFER[:4])]
+
+
+def test_zero_targets_are_kept():
+    batch = multisend_call(packed_call(ZERO), packed_call(TOKEN, TRANSFER))
+    exec_input = exec_tx_input(MULTISEND, batch)
+    targets, reason = batch_targets(exec_input)
+    assert reason is None
+    assert targets == [(1, ZERO), (1, TOKEN)]
+    assert decode_multisend_from_exec_tx(exec_input) == decode_multisend_reference(exec_input)
+    records, _ = decode_exec_tx_targets(exec_tx_input(ZERO, b''))
+    assert [(depth, target) for depth, _, target, _, _ in records] == [(0, ZERO)]
+
+
+@pytest.mark.parametrize('cut', [0.25, 0.5, 0.75, 0.95])
+def test_truncated_calldata_is_skipped_like_the_reference(cut):
+    full = exec_tx_input(MULTISEND, NESTED_BATCH)
+    truncated = full[:10 + int((len(full) - 10) * cut) // 2 * 2]
+    targets, reason = batch_targets(truncated)
+    reference, reference_reason = decode_multisend_reference(truncated)
+    assert reference == [] and reference_reason is not None
+    assert decode_multisend_from_exec_tx(truncated) == (reference, reference_reason)
+    assert targets == [] and reason is not None
+
+
+def test_malformed_nested_batch_drops_only_that_batch():
+    inner = multisend_call(packed_call(SPENDER))
+    broken = inner[:-40]    # cuts into the padded bytes argument
+    batch = multisend_call(packed_call(TOKEN, TRANSFER), packed_call(MULTISEND, broken, operation=1))
+    targets, reason = batch_targets(exec_tx_input(MULTISEND, batch))
+    assert targets == [(1, TOKEN), (1, MULTISEND)]
+    assert reason.startswith("A decoding error occurred at depth 2")
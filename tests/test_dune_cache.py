@@ -0,0 +1,153 @@
+import os
+import sys
+import asyncio
+import pytest
+import pyarrow.parquet as pq
+from aiohttp import web
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.dune import AsyncDuneClient, DuneError, DuneJob, load_manifest, run_jobs_async  # noqa: E402
+from common.dune_cache import DuneResultCache  # noqa: E402
+from common.fake_dune import FakeDune  # noqa: E402
+
+# --- Dune result cache and resumed downloads against the local fake Dune API ---
+RECENT, STALE, NEVER_RUN = 101, 102, 103
+ROWS = 25
+
+
+class FlakyDune(FakeDune):
+    """FakeDune whose JSON result pages fail with HTTP 400 at the offsets in `failing_offsets`."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failing_offsets = set()
+        self.requested_offsets = []
+
+    async def execution_results(self, request: web.Request) -> web.Response:
+        _, offset = self._page(request)
+        self.requested_offsets.append(offset)
+        if offset in self.failing_offsets:
+            raise web.HTTPBadRequest(text='{"error": "page unavailable"}', content_type='application/json')
+        return await super().execution_results(request)
+
+
+@pytest.fixture(autouse=True)
+def no_max_age_override(monkeypatch):
+    monkeypatch.delenv('DUNE_MAX_AGE_HOURS', raising=False)
+
+
+@pytest.fixture
+def fake():
+    server = FlakyDune({RECENT: ROWS, STALE: ROWS, NEVER_RUN: 3}, duration=0.2)
+    server.seed_result(RECENT, age_hours=2)
+    server.seed_result(STALE, age_hours=48)
+    return server
+
+
+def run(fake: FakeDune, jobs: list, cache: DuneResultCache) -> dict:
+    """Runs `jobs` against a freshly started `fake`; returns the outcomes and resets fake.calls first."""
+    async def main():
+        runner = await fake.start(port=0)
+        try:
+            async with AsyncDuneClient('fake-key', fake.base_url, requests_per_second=100) as dune:
+                fake.calls.clear()
+                return await run_jobs_async(dune, jobs, cache)
+        finally:
+            await runner.cleanup()
+    return asyncio.run(main())
+
+
+def read_csv_rows(path: str) -> list:
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def expected_csv_rows(fake: FakeDune, execution_id: str) -> list:
+    return fake._csv(fake.executions[execution_id], ROWS, 0).decode().splitlines()
+
+
+def test_recent_result_is_downloaded_without_executing(fake, tmp_path):
+    job = DuneJob('recent', RECENT, str(tmp_path / 'recent.csv'), max_age_hours=24)
+    with DuneResultCache(str(tmp_path / 'cache')) as cache:
+        outcomes = run(fake, [job], cache)
+    assert outcomes == {'recent': ROWS}
+    assert fake.calls['execute'] == 0
+    assert fake.calls['download'] == 1
+    seeded = next(iter(fake.executions))
+    assert read_csv_rows(job.output_path) == expected_csv_rows(fake, seeded)
+
+
+def test_stale_result_is_re_executed(fake, tmp_path):
+    job = DuneJob('stale', STALE, str(tmp_path / 'stale.parquet'), format='parquet', max_age_hours=24)
+    with DuneResultCache(str(tmp_path / 'cache')) as cache:
+        outcomes = run(fake, [job], cache)
+    assert outcomes == {'stale': ROWS}
+    assert fake.calls['execute'] == 1
+    assert fake.calls['download'] == 1
+    new_execution = fake.executions[list(fake.executions)[-1]]
+    assert pq.read_table(job.output_path).to_pylist() == fake._rows(new_execution)
+
+
+def test_latest_job_without_a_result_is_executed(fake, tmp_path):
+    job = DuneJob('never_run', NEVER_RUN, str(tmp_path / 'never_run.csv'), latest=True)
+    with DuneResultCache(str(tmp_path / 'cache')) as cache:
+        outcomes = run(fake, [job], cache)
+    assert outcomes == {'never_run': 3}
+    assert fake.calls['execute'] == 1
+
+
+def test_cached_execution_is_restored_not_downloaded(fake, tmp_path):
+    csv_job = DuneJob('recent', RECENT, str(tmp_path / 'recent.csv'), max_age_hours=24)
+    parquet_job = DuneJob('stale', STALE, str(tmp_path / 'stale.parquet'), format='parquet', max_age_hours=24)
+    with DuneResultCache(str(tmp_path / 'cache')) as cache:
+        run(fake, [csv_job, parquet_job], cache)
+        with open(csv_job.output_path, 'rb') as f:
+            csv_original = f.read()
+        parquet_original = pq.read_table(parquet_job.output_path)
+        os.remove(csv_job.output_path)
+        os.remove(parquet_job.output_path)
+
+        outcomes = run(fake, [csv_job, parquet_job], cache)
+    assert outcomes == {'recent': ROWS, 'stale': ROWS}
+    assert fake.calls['execute'] == 0
+    assert fake.calls['download'] == 0
+    with open(csv_job.output_path, 'rb') as f:
+        assert f.read() == csv_original
+    assert pq.read_table(parquet_job.output_path).equals(parquet_original)
+
+
+def test_max_age_zero_re_executes_all_but_latest_jobs(fake, tmp_path):
+    jobs = [DuneJob('recent', RECENT, str(tmp_path / 'recent.csv'), max_age_hours=0),
+            DuneJob('never_run', NEVER_RUN, str(tmp_path / 'never_run.csv'), latest=True)]
+    with DuneResultCache(str(tmp_path / 'cache')) as cache:
+        run(fake, jobs, cache)
+        outcomes = run(fake, jobs, cache)
+    assert outcomes == {'recent': ROWS, 'never_run': 3}
+    # `recent` is executed again; the `latest` job reuses the result of the first run
+    assert fake.calls['execute'] == 1
+    assert fake.calls['download'] == 1
+
+
+def test_interrupted_parquet_download_resumes_missing_pages(fake, tmp_path):
+    execution_id = fake.seed_result(RECENT, age_hours=0)
+    output_path = str(tmp_path / 'paged.parquet')
+
+    async def download():
+        runner = await fake.start(port=0)
+        try:
+            async with AsyncDuneClient('fake-key', fake.base_url, requests_per_second=100) as dune:
+                return await dune.download_parquet(execution_id, output_path, page_size=10)
+        finally:
+            await runner.cleanup()
+
+    fake.failing_offsets = {20}
+    with pytest.raises(DuneError):
+        asyncio.run(download())
+    assert not os.path.exists(output_path)
+    assert load_manifest(output_path)['execution_id'] == execution_id
+
+    fake.failing_offsets.clear()
+    fake.requested_offsets.clear()
+    assert asyncio.run(download()) == ROWS
+    assert fake.requested_offsets == [20]
+    assert load_manifest(output_path) is None
+    assert pq.read_table(output_path).to_pylist() == fake._rows(fake.executions[execution_id])
@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'formatting_functions'))
+from etherscan import ResultJournal  # noqa: E402
+
+# --- Resumable Etherscan result journal (formatting_functions/etherscan.py) ---
+DONE = '0x' + '11' * 20
+FAILED = '0x' + '22' * 20
+TODO = '0x' + '33' * 20
+
+
+@pytest.fixture
+def interrupted_journal(tmp_path):
+    """The journal of a run that recorded two results and crashed mid-line."""
+    path = str(tmp_path / 'final_combined_2.journal.jsonl')
+    with ResultJournal(path, flush_every=1) as journal:
+        journal.record(DONE, {"label": "Uniswap", "type": "Other Contract"})
+        journal.record(FAILED, {"label": "N/A", "type": "API Request Error"})
+    with open(path, 'a') as f:
+        f.write('{"address": "0x33')
+    return path
+
+
+def test_resume_skips_recorded_addresses(interrupted_journal):
+    with ResultJournal(interrupted_journal, resume=True) as journal:
+        pending = [address for address in (DONE, FAILED, TODO) if address not in journal.results]
+        assert journal.results == {DONE: {"label": "Uniswap", "type": "Other Contract"}}
+        # Transient errors are retried, like addresses that were never reached
+        assert pending == [FAILED, TODO]
+        journal.record(TODO, {"label": "N/A", "type": "ERC20 Token"})
+    with open(interrupted_journal) as f:
+        entries = [json.loads(line) for line in f]
+    assert [entry['address'] for entry in entries] == [DONE, FAILED, TODO]
+    assert set(ResultJournal.load(interrupted_journal)) == {DONE, TODO}
+
+
+def test_existing_journal_is_not_overwritten(interrupted_journal):
+    with open(interrupted_journal) as f:
+        before = f.read()
+    with pytest.raises(FileExistsError):
+        ResultJournal(interrupted_journal)
+    with open(interrupted_journal) as f:
+        assert f.read() == before
+
+
+def test_overwrite_starts_a_new_journal(interrupted_journal):
+    with ResultJournal(interrupted_journal, overwrite=True) as journal:
+        assert journal.results == {}
+    assert os.path.getsize(interrupted_journal) == 0
+    # An empty journal holds nothing to lose, so a plain run may reuse it
+    ResultJournal(interrupted_journal).close()
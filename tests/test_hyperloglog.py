@@ -0,0 +1,61 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import hyperloglog as hll  # noqa: E402
+from common.addresses import ADDRESS_DTYPE  # noqa: E402
+
+# --- HyperLogLog sketches (common/hyperloglog.py) ---
+
+
+def random_keys(n: int, seed: int = 0) -> np.ndarray:
+    return np.frombuffer(np.random.default_rng(seed).bytes(20 * n), dtype=ADDRESS_DTYPE)
+
+
+def sketch(keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    return hll.sketch_groups(np.zeros(len(keys), dtype=np.int64), hll.hash_values(keys), 1)
+
+
+def test_bit_length_is_exact_around_powers_of_two():
+    values = [0, 1, 2, 3] + [v for shift in range(2, 64) for v in ((1 << shift) - 1, 1 << shift, (1 << shift) + 1)]
+    values = [v for v in values if v < 1 << 64]
+    assert hll._bit_length(np.array(values, dtype=np.uint64)).tolist() == [v.bit_length() for v in values]
+
+
+@pytest.mark.parametrize('n', [1, 10, 1_000, 20_000, 200_000])
+def test_estimate_is_within_the_standard_error(n):
+    estimate = hll.estimate(*sketch(random_keys(n)))[0]
+    # Linear counting is near exact for small counts; above that allow 3 standard errors (~2.4%)
+    assert abs(estimate - n) <= max(1, 0.024 * n)
+
+
+def test_duplicates_do_not_change_the_estimate():
+    keys = random_keys(5_000)
+    assert hll.estimate(*sketch(np.concatenate([keys, keys[::2], keys])))[0] == hll.estimate(*sketch(keys))[0]
+
+
+def test_merged_split_sketches_equal_a_single_sketch():
+    keys = random_keys(30_000)
+    parts = np.random.default_rng(1).integers(0, 7, len(keys))     # 7 disjoint groups
+    offsets, packed = hll.sketch_groups(parts, hll.hash_values(keys), 7)
+    merged_offsets, merged_packed = hll.merge(np.zeros(7, dtype=np.int64), offsets, packed, 1)
+    single_offsets, single_packed = sketch(keys)
+    assert merged_offsets.tolist() == single_offsets.tolist()
+    assert merged_packed.tolist() == single_packed.tolist()
+
+
+def test_overlapping_sketches_union():
+    keys = random_keys(4_000)
+    groups = np.repeat([0, 1], [3_000, 3_000])
+    values = np.concatenate([keys[:3_000], keys[1_000:]])
+    offsets, packed = hll.sketch_groups(groups, hll.hash_values(values), 2)
+    merged = hll.merge(np.array([0, 0]), offsets, packed, 1)
+    assert abs(hll.estimate(*merged)[0] - 4_000) <= 0.024 * 4_000
+
+
+def test_empty_groups_estimate_zero():
+    offsets, packed = hll.sketch_groups(np.array([2], dtype=np.int64), hll.hash_values(random_keys(1)), 3)
+    assert offsets.tolist() == [0, 0, 0, 1]
+    assert hll.estimate(offsets, packed).tolist() == [0, 0, 1]
@@ -0,0 +1,81 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'formatting_functions'))
+from label_index import LabelIndex, build_index, ensure_index, is_index_current  # noqa: E402
+from common.addresses import address_keys  # noqa: E402
+
+# --- Memory-mapped eth_labels index (formatting_functions/label_index.py) ---
+ACCOUNT = '0x' + '22' * 20
+BOTH = '0x' + '44' * 20
+TOKEN = '0x' + '66' * 20
+UNLABELLED_ACCOUNT = '0x' + '88' * 20
+MISSING_LOW = '0x' + '00' * 20
+MISSING_MID = '0x' + '55' * 20
+MISSING_HIGH = '0x' + 'ff' * 20
+
+
+@pytest.fixture
+def sources(tmp_path):
+    accounts = str(tmp_path / 'accounts.csv')
+    tokens = str(tmp_path / 'tokens.csv')
+    pd.DataFrame({
+        'address': [ACCOUNT, BOTH.upper().replace('0X', '0x'), ACCOUNT, UNLABELLED_ACCOUNT],
+        'label': ['uniswap', 'safe', 'later-duplicate', None],
+    }).to_csv(accounts, index=False)
+    pd.DataFrame({
+        'address': [BOTH, TOKEN, UNLABELLED_ACCOUNT],
+        'label': ['token-label', 'tether', 'ünïcode'],
+    }).to_csv(tokens, index=False)
+    return [accounts, tokens]
+
+
+def lookup(index_path: str, addresses: list) -> list:
+    with LabelIndex(index_path) as index:
+        labels, sources = index.lookup(address_keys(addresses))
+    return list(zip(labels, sources))
+
+
+def test_lookup_hits_follow_source_priority(sources, tmp_path):
+    index_path = build_index(sources, str(tmp_path / 'eth_labels.idx'))
+    assert lookup(index_path, [ACCOUNT, BOTH, TOKEN, UNLABELLED_ACCOUNT]) == [
+        ('uniswap', 'eth_labels/accounts'),      # first row per address wins
+        ('safe', 'eth_labels/accounts'),         # accounts beat tokens
+        ('tether', 'eth_labels/tokens'),
+        ('ünïcode', 'eth_labels/tokens'),        # an empty account label falls through to tokens
+    ]
+
+
+def test_lookup_misses_return_none(sources, tmp_path):
+    index_path = build_index(sources, str(tmp_path / 'eth_labels.idx'))
+    with LabelIndex(index_path) as index:
+        assert len(index) == 4
+    assert lookup(index_path, [MISSING_LOW, MISSING_MID, MISSING_HIGH]) == [(None, None)] * 3
+    assert lookup(index_path, []) == []
+
+
+def test_stale_index_is_rebuilt(sources, tmp_path):
+    index_path = str(tmp_path / 'eth_labels.idx')
+    ensure_index(sources, index_path)
+    built_at = os.stat(index_path).st_mtime_ns
+    ensure_index(sources, index_path)
+    assert os.stat(index_path).st_mtime_ns == built_at      # up to date: not rebuilt
+
+    with open(sources[1], 'a') as f:
+        f.write(f'{MISSING_MID},new-token\n')
+    assert not is_index_current(index_path, sources)
+    ensure_index(sources, index_path)
+    assert is_index_current(index_path, sources)
+    assert lookup(index_path, [MISSING_MID]) == [('new-token', 'eth_labels/tokens')]
+
+
+def test_corrupt_index_is_rebuilt(sources, tmp_path):
+    index_path = str(tmp_path / 'eth_labels.idx')
+    with open(index_path, 'wb') as f:
+        f.write(b'not an index')
+    assert not is_index_current(index_path, sources)
+    ensure_index(sources, index_path)
+    assert lookup(index_path, [TOKEN]) == [('tether', 'eth_labels/tokens')]
@@ -0,0 +1,90 @@
+import os
+import sys
+import asyncio
+import pytest
+from aiohttp import web
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'formatting_functions'))
+import rpc  # noqa: E402
+from rpc import JSONRPCClient, RPCError  # noqa: E402
+
+# --- JSON-RPC retries (formatting_functions/rpc.py) against a local aiohttp server ---
+
+
+def serve_then_call(responses: list, calls: list) -> (list, list): # type: ignore
+    """
+    Serves `responses` (callables returning a web.Response) in order, one per request, and sends
+    `calls` as one batch. Returns (results or the raised exception, backoff sleeps).
+    """
+    sleeps = []
+    original_sleep = asyncio.sleep
+
+    async def recording_sleep(delay, *args, **kwargs):
+        if sys._getframe(1).f_code is JSONRPCClient._send.__code__:    # not the rate controller's waits
+            sleeps.append(delay)
+            delay = 0
+        return await original_sleep(delay, *args, **kwargs)
+
+    async def handle(request):
+        body = await request.json()
+        return responses.pop(0)(body)
+
+    async def main():
+        app = web.Application()
+        app.router.add_post('/', handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with JSONRPCClient(f'http://127.0.0.1:{port}/', requests_per_second=1000) as client:
+                return await client.batch(calls)
+        except RPCError as e:
+            return e
+        finally:
+            await runner.cleanup()
+
+    rpc.asyncio.sleep = recording_sleep
+    try:
+        return asyncio.run(main()), sleeps
+    finally:
+        rpc.asyncio.sleep = original_sleep
+
+
+def throttled(body):
+    return web.Response(status=429, text='Too Many Requests')
+
+
+def html_error(body):
+    return web.Response(status=200, text='<html>Bad Gateway</html>', content_type='text/html')
+
+
+def ok(body):
+    return web.json_response([{'jsonrpc': '2.0', 'id': call['id'], 'result': '0x'} for call in body])
+
+
+@pytest.fixture(autouse=True)
+def quick_backoff(monkeypatch):
+    monkeypatch.setattr(rpc, 'BASE_BACKOFF_SECONDS', 0.01)
+
+
+def test_throttled_batches_back_off_before_retrying():
+    results, sleeps = serve_then_call([throttled, throttled, ok], [('eth_getCode', ['0x' + '11' * 20, 'latest'])])
+    assert results == ['0x']
+    assert sleeps == [0.01, 0.02]
+
+
+def test_non_json_error_pages_are_retried():
+    results, sleeps = serve_then_call([html_error, ok], [('eth_chainId', [])])
+    assert results == ['0x']
+    assert sleeps == [0.01]
+
+
+def test_persistent_throttling_raises_after_the_last_retry():
+    responses = [throttled] * (rpc.MAX_RETRIES + 1)
+    error, sleeps = serve_then_call(responses, [('eth_chainId', [])])
+    assert isinstance(error, RPCError)
+    assert '429' in str(error)
+    assert len(sleeps) == rpc.MAX_RETRIES
+    assert responses == []
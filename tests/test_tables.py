@@ -0,0 +1,91 @@
+import os
+import sys
+from datetime import date
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.tables import ADDRESS_TYPE, LABEL_TYPE, TableWriter, read_table, table_exists, write_table  # noqa: E402
+
+# --- Typed Parquet tables (common/tables.py) ---
+USDT = '0xdAC17F958D2ee523a2206206994597C13D831ec7'
+TRAILING_ZERO = '0x' + 'ab' * 19 + '00'
+
+
+def chain_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'address': [USDT, TRAILING_ZERO, '0x' + '00' * 20],
+        'amount_of_times_interacted_with': [30, 20, 10],
+        'first_interaction_date': ['2024-01-02', '2024-02-29', '2024-12-31'],
+        'custom_label': ['Tether', None, 'Tether'],
+        'contract_type': ['ERC20 Token', 'Protocol', 'EOA'],
+        'token_symbol': ['USDT', None, 'N/A'],
+        'notes': ['a', 'b', 'c'],
+    })
+
+
+def test_write_table_uses_the_pipeline_schema(tmp_path):
+    path = write_table(chain_frame(), str(tmp_path / 'final_combined_2'))
+    schema = pq.read_schema(path)
+    assert schema.field('address').type == ADDRESS_TYPE
+    assert schema.field('amount_of_times_interacted_with').type == pa.int64()
+    assert schema.field('first_interaction_date').type == pa.date32()
+    assert schema.field('custom_label').type == LABEL_TYPE
+    assert schema.field('contract_type').type == LABEL_TYPE
+    assert schema.field('token_symbol').type == pa.string()
+
+
+def test_read_table_restores_hex_addresses_labels_and_dates(tmp_path):
+    stem = str(tmp_path / 'final_combined_2')
+    write_table(chain_frame(), stem)
+    df = read_table(stem)
+    assert df['address'].tolist() == [USDT.lower(), TRAILING_ZERO, '0x' + '00' * 20]
+    assert df['amount_of_times_interacted_with'].tolist() == [30, 20, 10]
+    assert df['first_interaction_date'].tolist() == [date(2024, 1, 2), date(2024, 2, 29), date(2024, 12, 31)]
+    # Dictionary-encoded labels come back as plain strings, not categoricals
+    for name in ('custom_label', 'contract_type'):
+        assert df[name].dtype == object
+    assert df['custom_label'].tolist() == ['Tether', None, 'Tether']
+    assert df['custom_label'].fillna('N/A').tolist() == ['Tether', 'N/A', 'Tether']
+    assert df['notes'].tolist() == ['a', 'b', 'c']
+
+
+def test_read_table_loads_only_requested_columns(tmp_path):
+    stem = str(tmp_path / 'final_combined_2')
+    write_table(chain_frame(), stem)
+    df = read_table(stem, columns=['address', 'contract_type'])
+    assert list(df.columns) == ['address', 'contract_type']
+    assert df['contract_type'].tolist() == ['ERC20 Token', 'Protocol', 'EOA']
+
+
+def test_read_table_falls_back_to_csv(tmp_path):
+    stem = str(tmp_path / 'final_combined')
+    chain_frame().to_csv(stem + '.csv', index=False)
+    assert table_exists(stem)
+    assert read_table(stem)['address'].tolist() == chain_frame()['address'].tolist()
+    write_table(read_table(stem), stem)
+    assert read_table(stem)['address'].tolist()[0] == USDT.lower()     # the Parquet file wins
+
+
+def test_table_writer_appends_batches_and_moves_files_into_place(tmp_path):
+    stem = str(tmp_path / 'final_combined_4')
+    frame = chain_frame()
+    with TableWriter(stem, export_csv=True) as writer:
+        writer.write(frame.iloc[:2])
+        writer.write(frame.iloc[2:])
+        assert not table_exists(stem)
+    assert writer.rows == 3
+    assert read_table(stem)['address'].tolist() == [USDT.lower(), TRAILING_ZERO, '0x' + '00' * 20]
+    assert pd.read_csv(stem + '.csv')['address'].tolist() == frame['address'].tolist()
+
+
+def test_table_writer_discards_files_on_error(tmp_path):
+    stem = str(tmp_path / 'final_combined_4')
+    with pytest.raises(RuntimeError):
+        with TableWriter(stem, export_csv=True) as writer:
+            writer.write(chain_frame())
+            raise RuntimeError("stage failed")
+    assert not table_exists(stem)
+    assert os.listdir(tmp_path) == []